@@ -1,10 +1,21 @@
 import random
 import math
+import sys
+from pathlib import Path
 
 # -------------------- User settings --------------------
 TRIALS = 5000       # Trials
 N_STEPS = 30000     # Steps per trial
 SEED = 1            # Set seed
+METHOD = "ssa"      # "ssa" (Monte Carlo trials), "fsp" (finite state projection) or "splitting" (rare C1/C2)
+FSP_BOUNDS = {"x1": (0, 160), "x2": (0, 200), "x3": (0, 200)}  # Truncation box for FSP
+FSP_TOLERANCE = 1e-3  # Widest [lower, upper] gap that FSP reports as a result
+SPLIT_LEVELS = {    # Intermediate thresholds for multilevel splitting (last one is the event)
+    "C1": list(range(112, 151, 2)),   # score x1, event x1 >= 150
+    "C2": list(range(-24, -8)),       # score -x2, event x2 < 10 (-x2 >= -9)
+}
+SPLIT_N = 200           # Trajectories per level
+SPLIT_REPLICATES = 5    # Independent replicates (for the standard error)
 # -------------------------------------------------------
 
 # Reaction rate constants
@@ -71,7 +82,76 @@ def one_trial():
     return hit_c1, hit_c2, hit_c3
 
 
+def crn_model():
+    # The three reactions as a crnsim Model (for the fsp and splitting methods)
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for crnsim
+    from crnsim import Model
+
+    return Model([
+        ({"x1": 2, "x2": 1}, {"x3": 4}, k1),  # R1: 2X1 + X2 -> 4X3
+        ({"x1": 1, "x3": 2}, {"x2": 3}, k2),  # R2: X1 + 2X3 -> 3X2
+        ({"x2": 1, "x3": 1}, {"x1": 2}, k3),  # R3: X2 + X3 -> 2X1
+    ], species=["x1", "x2", "x3"])
+
+
+def fsp_main():
+    # Exact hitting probabilities within N_STEPS on the truncated lattice (crnsim/fsp.py)
+    model = crn_model()
+    from crnsim.fsp import hitting_probability
+
+    conditions = [
+        ("Pr(C1: x1 >= 150)", lambda x, idx: x[0] >= 150),
+        ("Pr(C2: x2 < 10)  ", lambda x, idx: x[1] < 10),
+        ("Pr(C3: x3 > 100) ", lambda x, idx: x[2] > 100),
+    ]
+
+    print(f"FSP, N_STEPS={N_STEPS}, bounds={FSP_BOUNDS}")
+    print(f"Start state S0 = [{x1_0}, {x2_0}, {x3_0}]")
+    print()
+    print("Probabilities (event hit at least once within N_STEPS), [lower, upper]:")
+    unresolved = False
+    for label, cond in conditions:
+        res = hitting_probability(model, [x1_0, x2_0, x3_0], cond, FSP_BOUNDS, steps=N_STEPS)
+        lower, upper = res.probability, res.probability + res.error_bound
+        if upper - lower <= FSP_TOLERANCE:
+            print(f"{label} in [{lower:.5f}, {upper:.5f}]   ({res.n_states} states, sink mass {res.error_bound:.1e})")
+        else:
+            unresolved = True
+            print(f"{label} not resolved: sink mass {res.error_bound:.5f} left FSP_BOUNDS"
+                  f" (only [{lower:.5f}, {upper:.5f}], {res.n_states} states)")
+    if unresolved:
+        # Nothing is conserved and R1 adds a molecule, so x2 keeps growing and no finite box holds the mass
+        print()
+        print(f"warning: the [lower, upper] gap is above FSP_TOLERANCE={FSP_TOLERANCE:g}; widen FSP_BOUNDS,")
+        print('         or use METHOD = "splitting" (C1, C2) or "ssa"')
+
+
+def splitting_main():
+    # Rare C1/C2 probabilities within N_STEPS by multilevel splitting (crnsim/splitting.py)
+    model = crn_model()
+    from crnsim.splitting import multilevel_splitting
+
+    scores = {
+        "C1": ("Pr(C1: x1 >= 150)", lambda x, idx: x[0]),
+        "C2": ("Pr(C2: x2 < 10)  ", lambda x, idx: -x[1]),
+    }
+    init = {"x1": x1_0, "x2": x2_0, "x3": x3_0}
+
+    print(f"Multilevel splitting, N_STEPS={N_STEPS}, {SPLIT_N}/level x {SPLIT_REPLICATES} replicates, SEED={SEED}")
+    print(f"Start state S0 = [{x1_0}, {x2_0}, {x3_0}]")
+    print()
+    for c, (label, score) in scores.items():
+        res = multilevel_splitting(model, init, score, SPLIT_LEVELS[c], n_per_level=SPLIT_N,
+                                   replicates=SPLIT_REPLICATES, max_steps=N_STEPS, seed=SEED)
+        print(f"{label} = {res.probability:.3e} +/- {res.std_error:.1e}   ({res.events} events)")
+
+
 def main():
+    if METHOD == "fsp":
+        return fsp_main()
+    if METHOD == "splitting":
+        return splitting_main()
+
     if SEED is not None:
         random.seed(SEED)
 
@@ -1,5 +1,9 @@
 import random
-import numpy as np
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for crnsim
+from crnsim.stats import Aggregate
 
 # -------------------- Settings --------------------
 TRIALS = 200000   # Number of trials
@@ -48,13 +52,14 @@ def main():
     if SEED is not None:
         random.seed(SEED)
 
-    finals = np.zeros((TRIALS, 3), dtype=np.int64)
+    agg = Aggregate()  # streaming mean/variance, constant memory in TRIALS
 
-    for i in range(TRIALS):
-        finals[i, :] = run_one()
+    for _ in range(TRIALS):
+        x1, x2, x3 = run_one()
+        agg.add({"X1": x1, "X2": x2, "X3": x3})
 
-    means = finals.mean(axis=0)
-    vars_ = finals.var(axis=0, ddof=0)  # population variance estimate
+    means = [agg.mean(sp) for sp in ("X1", "X2", "X3")]
+    vars_ = [agg.variance(sp, ddof=0) for sp in ("X1", "X2", "X3")]  # population variance estimate
 
     print(f"Start: {list(x0)}, Steps: {STEPS}, Trials: {TRIALS}, Seed: {SEED}\n")
 
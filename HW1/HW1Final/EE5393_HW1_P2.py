@@ -1,4 +1,5 @@
 # EE5393 HW1 P2 - Lambda stochastic simulation (Gillespie SSA)
+# The SSA engines and reaction-file parsing live in crnsim/ at the repo root.
 # Assumes the following 3 files are in the SAME folder as this .py file:
 #   1) lambda_r.txt   (reactions: "reactants : products : rate")
 #   2) lambda_in.txt  (initial counts: "Species  Value  ...")
@@ -6,11 +7,17 @@
 
 from __future__ import annotations
 
-import math
-import random
-from dataclasses import dataclass
+import sys
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for crnsim
+from crnsim import Model, Profile, Result, Simulator, load_initial_counts, load_reactions
+from crnsim.validate import validate
+# The optional features (splitting, sensitivities, cache, cluster, conservation) are imported where they are used
+if TYPE_CHECKING:
+    from crnsim.cache import ResultCache
+    from crnsim.sensitivity import SensitivityResult
 
 
 # -------------------- User settings --------------------
@@ -20,100 +27,35 @@ MOI_VALUES = range(1, 11)
 MAX_TIME  = 5000.0
 MAX_STEPS = 5_000_000
 SEED = 1
+ENGINE = "direct"  # "direct", "nrm", "tau-leap", "ode" or "auto" (pilot runs pick one; see chosen_engine)
 
-STEALTH_THRESHOLD = 145  # stealth when cI2 > 145
-HIJACK_THRESHOLD = 55    # hijack when Cro2 > 55
-
-REACTIONS_FILENAME = "lambda_r.txt"
-INIT_FILENAME = "lambda_in.txt"
-# ------------------------------------------------------
+SPLIT_FATE = None  # "stealth" or "hijack": estimate P(fate first) per MOI by multilevel splitting
+SPLIT_LEVELS = {   # cI2 / Cro2 thresholds for splitting; the last one is the fate threshold + 1
+    "stealth": [20, 40, 60, 80, 100, 120, 146],
+    "hijack": [10, 20, 30, 40, 50, 56],
+}
+SPLIT_N = 50            # Trajectories per level
+SPLIT_REPLICATES = 4    # Independent replicates (for the standard error)
 
+REDUCE_CONSERVED = False  # Drop species fixed by conservation laws (OR pool, promoters, ...) from the SSA state
+SENSITIVITY_RATES = []  # e.g. ["0.014", "R12"]: also estimate d P(stealth_first) / d rate per MOI
+SENSITIVITY_METHOD = "lr"  # "lr" (likelihood ratio, one pass) or "crp" (common-reaction-path finite differences)
 
-Stoich = Dict[str, int]
-Reaction = Tuple[Stoich, Stoich, float]  # (reactants, products, rate)
+CACHE_FILENAME = None  # e.g. "lambda_runs.sqlite": seed each trial and reuse trials already run (see run_one)
 
+CLUSTER_PORT = None        # e.g. 5393: hand the MOI x trial loop to crnsim.cluster workers (cluster_main)
+CLUSTER_LOCAL_WORKERS = 0  # Worker processes to start on this machine as well
+CLUSTER_HOST = "127.0.0.1"  # "0.0.0.0" accepts workers from other machines (needs CRNSIM_CLUSTER_KEY set)
 
-def nCk(n: int, k: int) -> int:
-    """Compute binomial coefficient C(n,k) for integers n>=0."""
-    if k < 0 or k > n:
-        return 0
-    if k == 0 or k == n:
-        return 1
-    k = min(k, n - k)
-    out = 1
-    for i in range(1, k + 1):
-        out = out * (n - (k - i)) // i
-    return out
+PROFILE = False  # Collect per-reaction firing counts and SSA phase timings (direct engine)
+PROFILE_FILENAME = "lambda_profile.json"
 
+STEALTH_THRESHOLD = 145  # stealth when cI2 > 145
+HIJACK_THRESHOLD = 55    # hijack when Cro2 > 55
 
-def parse_stoich(side: str) -> Stoich:
-    side = side.strip() # Remove leading and trailing spaces
-    if not side: # If line is empty return blank
-        return {}
-    
-    toks = side.split() # Split each part of the line at spaces (create tokens)
-    if len(toks) % 2 != 0: # If spaces does not come in a pair of specie and amount then fail program
-        raise ValueError(f"Bad stoichiometry side (odd token count): {side!r}")
-
-    d: Stoich = {}
-    for i in range(0, len(toks), 2): # Loop over tokens two at a time (gather the specie and number values togethersdfasd)
-        sp = toks[i]
-        m = int(toks[i + 1])
-        d[sp] = d.get(sp, 0) + m
-    return d
-
-
-def load_reactions(path: Path) -> List[Reaction]:
-    rxns: List[Reaction] = []
-    with path.open("r", encoding="utf-8", errors="replace") as f: # Open path, UTF-8 encoding, replace characters with placeholder
-        for raw in f: # Each line in the reaction file is saved under raw, this goes until there is not another line to save (f has been through)
-            line = raw.strip() # Remove leading and trailing spaces and newline characters
-            
-            if not line or line.startswith("#"): # Ignore blank lines
-                continue
-            
-            parts = [p.strip() for p in line.split(":")] # Isolate the parts of each line (reactants:products:rate)
-            if len(parts) != 3: # If there are not 3 parts in the line indicate that something is wrong
-                raise ValueError(f"Bad reaction line (need 2 colons): {line}")
-            
-            reactants = parse_stoich(parts[0])
-            products = parse_stoich(parts[1])
-            rate = float(parts[2])
-            rxns.append((reactants, products, rate))
-
-    if not rxns:
-        raise ValueError(f"No reactions loaded from {path}")
-    return rxns
-
-
-def load_initial_counts(path: Path) -> Dict[str, int]:
-    counts: Dict[str, int] = {}
-    with path.open("r", encoding="utf-8", errors="replace") as f:
-        for raw in f:
-            line = raw.strip()
-            if not line or line.startswith("#"):
-                continue
-            toks = line.split()
-            if len(toks) < 2:
-                continue
-            sp = toks[0]
-            val = int(toks[1])
-            counts[sp] = val
-
-    if not counts:
-        raise ValueError(f"No initial values loaded from {path}")
-    return counts
-
-
-def propensity(counts: Dict[str, int], reactants: Stoich, rate: float) -> float:
-    a = rate
-    for sp, m in reactants.items():
-        n = counts.get(sp, 0)
-        c = nCk(n, m)
-        if c == 0:
-            return 0.0
-        a *= c
-    return float(a)
+REACTIONS_FILENAME = "lambda_r.txt"
+INIT_FILENAME = "lambda_in.txt"
+# ------------------------------------------------------
 
 
 def classify(counts: Dict[str, int]) -> str | None:
@@ -130,85 +72,160 @@ def classify(counts: Dict[str, int]) -> str | None:
     return None
 
 
-def run_one(rxns: List[Reaction], init_counts: Dict[str, int], moi_value: int) -> str:
+def stop_on_fate(x: List[int], index: Dict[str, int]) -> str | None:
+    # SSA stop callback: same test as classify() on the simulator's state vector
+    return classify({"cI2": x[index["cI2"]], "Cro2": x[index["Cro2"]]})
+
+
+def fate_score(x: List[int], index: Dict[str, int]) -> int:
+    # Progress toward SPLIT_FATE: the dimer count its threshold is on
+    return x[index["cI2" if SPLIT_FATE == "stealth" else "Cro2"]]
+
+
+def chosen_engine(model: Model, init_counts: Dict[str, int]) -> str:
+    """
+    ENGINE, with "auto" resolved by pilot runs (crnsim.autoselect) at the
+    first MOI. Profiling needs the direct engine and REDUCE_CONSERVED
+    direct or nrm, so the choice is limited to those when they are set.
+    """
+    if ENGINE != "auto":
+        return ENGINE
+    from crnsim.autoselect import resolve_engine
+
+    candidates = ["direct", "nrm", "tau-leap", "ode"]
+    if PROFILE:
+        candidates = ["direct"]
+    elif REDUCE_CONSERVED:
+        candidates = ["direct", "nrm"]
+    return resolve_engine(ENGINE, model, dict(init_counts, MOI=MOI_VALUES[0]), MAX_TIME, MAX_STEPS, stop_on_fate,
+                          candidates=candidates)
+
+
+def split_main(model: Model, init_counts: Dict[str, int], engine: str) -> None:
+    from crnsim.splitting import multilevel_splitting
+
+    print(f"P({SPLIT_FATE} first) by multilevel splitting: {SPLIT_N}/level x {SPLIT_REPLICATES} replicates, "
+          f"MAX_TIME={MAX_TIME}, SEED={SEED}")
+    print("MOI   probability   std error     events")
+    print("----  -----------   ---------   ----------")
+
+    for moi in MOI_VALUES:
+        counts = dict(init_counts)
+        counts["MOI"] = moi
+        res = multilevel_splitting(model, counts, fate_score, SPLIT_LEVELS[SPLIT_FATE], n_per_level=SPLIT_N,
+                                   replicates=SPLIT_REPLICATES, t_end=MAX_TIME, max_steps=MAX_STEPS,
+                                   stop=stop_on_fate, engine=engine, seed=SEED)
+        print(f"{moi:>3d}   {res.probability:>11.3e}   {res.std_error:>9.1e}   {res.events:>10d}")
+
+
+def run_one(sim: Simulator, init_counts: Dict[str, int], moi_value: int, profile: Profile | None = None,
+            cache: ResultCache | None = None, seed: int | None = None) -> str:
     """
     Run one SSA trajectory until:
       - stealth/hijack/tie reached, or
       - MAX_TIME reached, or
       - MAX_STEPS reached, or
       - no reactions can fire
+    With a cache the trajectory is seeded with seed and read from the cache
+    when it was run before with the same reactions, counts and thresholds;
+    the profile then only covers the trials that are simulated.
     """
     counts = dict(init_counts) # Copy the initial counts dictionary (number of molecules of each specie)
     counts["MOI"] = moi_value  # Override MOI from init file
-    t = 0.0 # Reset time
-
-    out0 = classify(counts) # Run clasify on counts
-    if out0 is not None: # If lambda is in a terminal fate state then give that state
-        return out0
-
-    for _step in range(MAX_STEPS): 
-        if t >= MAX_TIME: # End if max time has been reached
-            break
-
-        props: List[float] = [] # Create props as a list of float variables
-        a0 = 0.0 # Intialize a0
-        for reactants, products, rate in rxns: # Loop through each reactiong
-            a = propensity(counts, reactants, rate) # Get the propensity for each reaction
-            props.append(a) # Assign the propensity for each reaction
-            a0 += a # Create a running total of reaction rates (TOTAL REACTION RATE)
-
-        if a0 <= 0.0: # Break if no reaction can fire
-            break
-
-        # sample time increment using Gillespie algorithm
-        r1 = random.random() # Make r1 a random number between 0 and 1
-        dt = -math.log(max(r1, 1e-300)) / a0 # Timestep according to Gillespie algorithm
-        t += dt # Increment time by time step
-
-        # Choose which reaction fires
-        r2 = random.random() * a0 # Make r2 a random 0 to 1 a0
-        s = 0.0 # Accumulates propensities
-        idx = 0 # Stores chosen reaction index
-        for i, a in enumerate(props): # Loop through reaction propensities; i - reaction index, a - reactions propensity
-            s += a # Add propensities to s
-            if r2 <= s: # Go until the random r2 is less than the accumulated propensities
-                idx = i # Assign index of breaking reaction to be the reaction that fires
-                break
-
-        reactants, products, _rate = rxns[idx]
-
-        # Apply stoichiometry (reactants consumed, products produced) for each reaction
-        for sp, m in reactants.items(): 
-            counts[sp] = counts.get(sp, 0) - m 
-        for sp, m in products.items():
-            counts[sp] = counts.get(sp, 0) + m
-
-        out = classify(counts) # Return the current state of lambda
-        if out is not None:
-            return out
 
+    if cache is not None:
+        res = cache.run(sim, counts, seed, t_end=MAX_TIME, max_steps=MAX_STEPS, stop=stop_on_fate, profile=profile)
+    else:
+        res = sim.run(counts, t_end=MAX_TIME, max_steps=MAX_STEPS, stop=stop_on_fate, profile=profile)
+    if res.reason in ("stealth", "hijack", "tie"): # Terminal fate reached
+        return res.reason
     return "neither"
 
 
-def main() -> None:
-    if SEED is not None:
-        random.seed(SEED)
+def stealth_first(res: Result) -> float:
+    """Output for the sensitivities: 1 when stealth was reached first."""
+    return 1.0 if res.reason == "stealth" else 0.0
+
+
+def sensitivity_trials(model: Model, init_counts: Dict[str, int], moi: int) -> SensitivityResult:
+    """The TRIALS_PER_MOI trials of one MOI, run by crnsim.sensitivity for d P(stealth_first) / d rate."""
+    from crnsim.sensitivity import sensitivities
+
+    return sensitivities(model, dict(init_counts, MOI=moi), stealth_first, SENSITIVITY_RATES,
+                         method=SENSITIVITY_METHOD, trials=TRIALS_PER_MOI, seed=SEED + moi * TRIALS_PER_MOI,
+                         t_end=MAX_TIME, max_steps=MAX_STEPS, stop=stop_on_fate)
+
 
+def cluster_main() -> List[Dict[str, int]]:
+    """
+    Fate counts per MOI from crnsim.cluster workers. Trial i of MOI m uses
+    seed SEED + m * TRIALS_PER_MOI + i, as with CACHE_FILENAME, so the
+    counts match a cached serial run. Workers load this file's settings
+    themselves (REDUCE_CONSERVED, SENSITIVITY_RATES and PROFILE are not used).
+    Start them with: python -m crnsim.cluster worker --connect <this host>:<CLUSTER_PORT>, with
+    CLUSTER_HOST = "0.0.0.0" and the same CRNSIM_CLUSTER_KEY set on every host.
+    """
+    from crnsim.cluster import Coordinator
+
+    mois = list(MOI_VALUES)
+    spec = {"workload": "lambda", "points": [{"MOI": m} for m in mois], "trials": TRIALS_PER_MOI,
+            "base_seed": SEED, "point_seeds": [SEED + m * TRIALS_PER_MOI for m in mois], "species": ["cI2", "Cro2"]}
+    aggs = Coordinator(spec, (CLUSTER_HOST, CLUSTER_PORT),
+                       progress=lambda done, total: print(f"  {done}/{total} trials", flush=True)
+                       ).run(local_workers=CLUSTER_LOCAL_WORKERS)
+    return [agg.reasons for agg in aggs]
+
+
+def main() -> None:
     here = Path(__file__).resolve().parent
     reactions_path = here / REACTIONS_FILENAME
     init_path = here / INIT_FILENAME
 
     rxns = load_reactions(reactions_path) # Read reactions file
     init_counts = load_initial_counts(init_path) # Read input file
-
+    # Normalize and check species; nothing is dropped as dead, since MOI is overridden per trial
+    rxns, names, report = validate(rxns, init_counts, drop_dead=False)
+    for line in report.lines():
+        print(f"Validation: {line}")
+    model = Model(rxns, species=list(init_counts), names=names) # Compile reactions into index form
+    engine = chosen_engine(model, init_counts)
+    if SPLIT_FATE is not None:
+        return split_main(model, init_counts, engine)
+
+    if REDUCE_CONSERVED:
+        from crnsim.conservation import ReducedModel, reduce
+        if engine not in ReducedModel.engines:
+            raise ValueError(f"REDUCE_CONSERVED needs ENGINE in {ReducedModel.engines}, not {engine!r}")
+
+    sim = Simulator(model, engine=engine, seed=SEED)
+    profile = Profile(model) if PROFILE else None
+    # Cached trials need their own seeds: trial i of MOI m uses SEED + m * TRIALS_PER_MOI + i
+    cache = None
+    if CACHE_FILENAME:
+        from crnsim.cache import ResultCache
+        cache = ResultCache(here / CACHE_FILENAME)
+
+    fates = cluster_main() if CLUSTER_PORT else None
     print(f"Trials/MOI={TRIALS_PER_MOI}, MAX_TIME={MAX_TIME}, MAX_STEPS={MAX_STEPS}, SEED={SEED}")
     print("MOI   P(stealth_first)   P(hijack_first)   P(tie)   P(neither)")
     print("----  -----------------  ---------------   ------   ---------")
 
-    for moi in MOI_VALUES: # Run through MOI values 1 to 10
+    sens_rows = []
+    for k, moi in enumerate(MOI_VALUES): # Run through MOI values 1 to 10
         nS = nH = nT = nN = 0 # 
-        for _ in range(TRIALS_PER_MOI):
-            out = run_one(rxns, init_counts, moi) 
+        outs = None
+        if fates is not None: # Already run on the cluster: expand the fate counts
+            outs = [fate for fate, n in fates[k].items() for _ in range(n)]
+        elif SENSITIVITY_RATES: # The trials come from the sensitivity runs
+            res = sensitivity_trials(model, init_counts, moi)
+            outs = [r.reason if r.reason in ("stealth", "hijack", "tie") else "neither" for r in res.results]
+            sens_rows.append((moi, res))
+        moi_sim = sim
+        if REDUCE_CONSERVED: # Same trajectories with a smaller state; the totals depend on MOI
+            reduced = reduce(model, dict(init_counts, MOI=moi), keep=("cI2", "Cro2"))
+            moi_sim = Simulator(reduced, engine=engine, pool=sim.pool)
+        for i in range(TRIALS_PER_MOI):
+            out = outs[i] if outs else run_one(moi_sim, init_counts, moi, profile, cache, SEED + moi * TRIALS_PER_MOI + i)
             if out == "stealth":
                 nS += 1
             elif out == "hijack":
@@ -225,6 +242,23 @@ def main() -> None:
 
         print(f"{moi:>3d}   {pS:>16.4f}     {pH:>13.4f}   {pT:>6.4f}   {pN:>8.4f}")
 
+    if cache is not None:
+        print(f"\nCache: {cache.hits} trials reused, {cache.misses} simulated")
+
+    if sens_rows:
+        print(f"\nd P(stealth_first) / d rate ({SENSITIVITY_METHOD}, +/- standard error)")
+        print("MOI   " + "   ".join(f"{name:>20}" for name in SENSITIVITY_RATES))
+        for moi, res in sens_rows:
+            print(f"{moi:>3d}   " + "   ".join(
+                f"{res.sensitivity[name]:>10.4g} +/- {res.sensitivity_error[name]:<6.2g}" for name in SENSITIVITY_RATES))
+
+    if profile is not None: # Where the step budget went
+        profile.to_json(here / PROFILE_FILENAME)
+        scope = f" ({cache.misses} simulated trials; cached ones are not profiled)" if cache is not None else ""
+        print(f"\nProfile over {profile.steps} steps{scope} written to {PROFILE_FILENAME}. Most-fired reactions:")
+        for label, n, share in profile.top(10):
+            print(f"  {share:>6.1%}  {n:>10d}  {label}")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,21 @@
 """
 EE5393 HW1 P3A — Gillespie SSA for the original CRN.
 Runs NUM_RUNS trials and reports mean/std of final (w,z).
+The SSA engines live in crnsim/ at the repo root.
 """
 
-import math, random, statistics
+import math, sys
+from functools import lru_cache
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))  # repo root, for crnsim
+from crnsim import Model, Simulator
+from crnsim.autoselect import resolve_engine
+from crnsim.cache import ResultCache
+from crnsim.checkpoint import run_trials
+from crnsim.cluster import Coordinator
+from crnsim.sensitivity import sensitivities
+from crnsim.stats import Aggregate
 
 # ---- SETTINGS ----
 NUM_RUNS = 100
@@ -11,6 +23,15 @@ BASE_SEED = 100
 PRINT_EVERY = 10 # Print outcomes of every PRINT_EVERY trials for monitoring of the simulation
 T_END = 200000.0
 MAX_STEPS = 10_000_000
+ENGINE = "direct" # "direct", "nrm", "tau-leap", "ode" or "auto" (pilot runs pick the fastest accurate engine)
+CHECKPOINT_FILENAME = None # e.g. "p3a.ckpt": save progress (direct engine) and resume from it after a restart
+CHECKPOINT_SECONDS = 60.0 # Seconds between checkpoint writes
+CACHE_FILENAME = None # e.g. "p3a_runs.sqlite": reuse runs already done with the same model, rates and seed
+CLUSTER_PORT = None # e.g. 5393: run the trials on crnsim.cluster workers (python -m crnsim.cluster worker --connect <host>:5393)
+CLUSTER_LOCAL_WORKERS = 0 # Worker processes to start on this machine as well
+CLUSTER_HOST = "127.0.0.1" # "0.0.0.0" accepts workers from other machines (needs CRNSIM_CLUSTER_KEY set)
+SENSITIVITY_RATES = [] # e.g. ["r7", "r5"]: also estimate d mean(z) / d rate from the same runs
+SENSITIVITY_METHOD = "lr" # "lr" (likelihood ratio, one pass) or "crp" (common-reaction-path finite differences)
 
 # initial counts
 INIT = {"a": 0, "b": 1, "c": 0, "y": 8192, "yP": 0, "w": 0, "wP": 0, "x": 200, "d": 0, "z": 0}
@@ -33,26 +54,9 @@ RXNS = [ # Dictionary of reactions
     ("r9", {"wP": 1},        {"w": 1},                      "r9"),
 ]
 
-def nCk(n, r): # Compute binomial coefficient
-    if r < 0 or r > n: return 0
-    r = min(r, n - r)
-    num = den = 1
-    for i in range(1, r + 1):
-        num *= n - (r - i)
-        den *= i
-    return num // den
-
-def propensity(c, R, rate): # Compute propensity of reaction
-    a = rate
-    for sp, m in R.items():
-        n = c.get(sp, 0)
-        if n < m: return 0.0
-        a *= nCk(n, m)
-    return float(a)
-
-def fire(c, R, P): # Perform stoichiometry after a reaction
-    for sp, m in R.items(): c[sp] -= m
-    for sp, m in P.items(): c[sp] = c.get(sp, 0) + m
+MODEL = Model( # Compiled form of RXNS
+    [(R, P, rk) for _, R, P, rk in RXNS], species=list(INIT), params=k, names=[n for n, _, _, _ in RXNS]
+)
 
 def done(c): # Check weather CRN has reached a terminal state
     return (
@@ -61,80 +65,89 @@ def done(c): # Check weather CRN has reached a terminal state
         c.get("a", 0) == 0
     )
 
-def ssa(seed, init):
+DONE_SPECIES = ("y", "x", "d", "wP", "c", "yP", "a") # Species read by done()
+
+def done_state(x, index): # SSA stop callback: done() on the simulator's state vector
+    return "done" if done({sp: x[index[sp]] for sp in DONE_SPECIES}) else None
+
+def ssa(seed, init, sim=None, cache=None):
     """
     Run one Gillespie SSA trajectory.
 
     Steps:
-      1. Initialize random seed and copy initial molecule counts.
-      2. Repeatedly:
-         - Check if terminal state is reached (done).
-         - Compute all reaction propensities and total rate a0.
-         - Sample next reaction time Δt ~ Exp(a0).
-         - Select which reaction fires (proportional to its propensity).
-         - Apply stoichiometric update (fire).
-      3. Stop when:
+      1. Seed the simulator's random pool with seed.
+      2. Run the engine (ENGINE) from init until:
          - Terminal state reached      → return "done"
          - No reactions possible       → return "no reactions possible"
          - Time exceeds T_END          → return "reached T_END"
          - Step limit reached          → return "reached MAX_STEPS"
 
+    With a ResultCache, a run done before with the same model, rates,
+    engine and seed is read back instead of simulated.
+
     Returns:
         (final_state_dict, stop_reason)
     """
-    random.seed(seed)
-    c = dict(init)
-    t = 0.0
-
-    for _ in range(MAX_STEPS):
-        if done(c): return c, "done"
-
-        props, a0 = [], 0.0
-        for _, R, _, rk in RXNS:
-            ai = propensity(c, R, k[rk])
-            props.append(ai)
-            a0 += ai
-        if a0 <= 0.0: return c, "no reactions possible"
-
-        dt = -math.log(random.random()) / a0
-        if t + dt > T_END: return c, "reached T_END"
-        t += dt
-
-        r = random.random() * a0
-        s = 0.0
-        for i, ai in enumerate(props):
-            s += ai
-            if s >= r:
-                _, R, P, _ = RXNS[i]
-                fire(c, R, P)
-                break
-
-    return c, "reached MAX_STEPS"
-
-def mean_std(xs):
-    return statistics.mean(xs), (statistics.stdev(xs) if len(xs) > 1 else 0.0)
+    sim = sim or Simulator(MODEL, engine=chosen_engine())
+    if cache is not None:
+        res = cache.run(sim, init, seed, t_end=T_END, max_steps=MAX_STEPS, stop=done_state)
+        return res.counts, res.reason
+    sim.seed(seed)
+    res = sim.run(init, t_end=T_END, max_steps=MAX_STEPS, stop=done_state)
+    return res.counts, res.reason
+
+@lru_cache(maxsize=None)
+def chosen_engine(): # ENGINE, with "auto" resolved once; checkpoints need the direct engine
+    candidates = ("direct",) if CHECKPOINT_FILENAME else ("direct", "nrm", "tau-leap", "ode")
+    return resolve_engine(ENGINE, MODEL, INIT, T_END, MAX_STEPS, done_state, candidates=candidates)
+
+def final_z(res): # Output whose sensitivities are estimated
+    return res.counts.get("z", 0)
+
+def report(i, final, reason): # Progress line every PRINT_EVERY runs
+    if PRINT_EVERY and (i + 1) % PRINT_EVERY == 0:
+        print(f"Run {i+1:3d}/{NUM_RUNS}: z={final.get('z',0)} w={final.get('w',0)} reason={reason}")
+
+def mean_std(agg, sp): # Mean and sample std of one species over the runs so far
+    return agg.mean(sp), (agg.std(sp, ddof=1) if agg.n > 1 else 0.0)
 
 def main():
     target_w = math.log2(INIT["y"])
     target_z = INIT["x"] * target_w
     print(f"Target z = {target_z}\n")
 
-    finals, reasons = [], {}
-    for i in range(NUM_RUNS):
-        final, reason = ssa(BASE_SEED + i, INIT)
-        finals.append(final)
-        reasons[reason] = reasons.get(reason, 0) + 1
-        if PRINT_EVERY and (i + 1) % PRINT_EVERY == 0:
-            print(f"Run {i+1:3d}/{NUM_RUNS}: z={final.get('z',0)} w={final.get('w',0)} reason={reason}")
-
-    w = [f.get("w", 0) for f in finals]
-    z = [f.get("z", 0) for f in finals]
-
-    mw, sw = mean_std(w)
-    mz, sz = mean_std(z)
+    engine = chosen_engine()
+    sim = Simulator(MODEL, engine=engine)
+    agg = Aggregate() # Streaming per-species mean/variance and stop reasons; no per-run state is kept
+    sens = None
+    if SENSITIVITY_RATES: # The trials come from the sensitivity runs (run i uses seed BASE_SEED + i as well)
+        sens = sensitivities(MODEL, INIT, final_z, SENSITIVITY_RATES, method=SENSITIVITY_METHOD, trials=NUM_RUNS,
+                             seed=BASE_SEED, t_end=T_END, max_steps=MAX_STEPS, stop=done_state)
+        for res in sens.results:
+            agg.add(res.counts, res.reason)
+    elif CHECKPOINT_FILENAME: # Same trials and results as the loop below, resumable from the checkpoint file
+        agg = run_trials(sim, INIT, NUM_RUNS, BASE_SEED, Path(__file__).resolve().parent / CHECKPOINT_FILENAME,
+                         t_end=T_END, max_steps=MAX_STEPS, stop=done_state, aggregate=agg,
+                         on_result=lambda i, res: report(i, res.counts, res.reason),
+                         every_seconds=CHECKPOINT_SECONDS)
+    elif CLUSTER_PORT: # Same seeds as the loop below; workers load this file's settings themselves
+        spec = {"workload": "log_multiply", "trials": NUM_RUNS, "base_seed": BASE_SEED, "engine": engine}
+        agg = Coordinator(spec, (CLUSTER_HOST, CLUSTER_PORT),
+                          progress=lambda done, total: print(f"Runs {done}/{total} done")
+                          ).run(local_workers=CLUSTER_LOCAL_WORKERS)[0]
+    cache = ResultCache(Path(__file__).resolve().parent / CACHE_FILENAME) if CACHE_FILENAME else None
+    for i in range(0 if sens or CHECKPOINT_FILENAME or CLUSTER_PORT else NUM_RUNS):
+        final, reason = ssa(BASE_SEED + i, INIT, sim, cache)
+        agg.add(final, reason)
+        report(i, final, reason)
+
+    mw, sw = mean_std(agg, "w")
+    mz, sz = mean_std(agg, "z")
 
     print("\n--- Summary ---")
-    print(f"Stop reasons: {reasons}")
+    print(f"Stop reasons: {agg.reasons}")
+    if cache is not None:
+        print(f"Cache: {cache.hits} runs reused, {cache.misses} simulated")
 
     print(f"\n--- Statistics over {NUM_RUNS} runs ---")
 
@@ -148,10 +161,15 @@ def main():
     print(f"  mean(z)    = {mz:.6f}")
     print(f"  std(z)     = {sz:.6f}")
 
-    species = sorted({sp for f in finals for sp in f})
+    if sens is not None:
+        print(f"\nSensitivities of mean(z) ({SENSITIVITY_METHOD}):")
+        for name, d in sens.sensitivity.items():
+            print(f"  d mean(z) / d {name:<6} = {d:.6g}  (+/- {sens.sensitivity_error[name]:.2g})")
+
+    species = sorted(agg.species)
     print("\n--- Mean final counts (all species) ---")
     for sp in species:
-        print(f"{sp:>3} : {statistics.mean([f.get(sp, 0) for f in finals]):.3f}")
+        print(f"{sp:>3} : {agg.mean(sp):.3f}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -3,8 +3,11 @@ Deterministic (sequenced) CRN simulator.
 Simulates the chemical reaction network until:
 - target value (y) is reached.
 - No more reactions can occur.
+simulate_crn_batch() runs many x inputs at once in NumPy lock-step.
 """
 
+import numpy as np
+
 # -----------------------------
 # Initial conditions
 # -----------------------------
@@ -20,6 +23,8 @@ species = {
     "yP": 0,
 }
 
+BATCH_X = None  # e.g. range(1, 20001): check every input at once with simulate_crn_batch() instead
+
 # -----------------------------
 # Reaction functions
 # -----------------------------
@@ -150,10 +155,130 @@ def simulate_crn(s, max_steps=2_000_000_000):
 
     return s, step
 
+# -----------------------------
+# Batched simulation
+# -----------------------------
+SPECIES = ["a", "b", "c", "x", "xP", "w", "y", "d", "yP"]
+LANE_REACHED, LANE_STUCK, LANE_MAX_STEPS = 0, 1, 2  # status codes of simulate_crn_batch()
+
+def simulate_crn_batch(x_values, s0=None, max_steps=2_000_000_000):
+    """
+    simulate_crn() for many x inputs at once.
+
+    Every lane starts from s0 (default: species) with its own x and target
+    y = x, and all lanes apply the same ten-reaction sequence each step.
+    The "if s[...] > 0" checks become boolean masks over the lanes. A lane
+    retires when y reaches its target (LANE_REACHED), when nothing fired in a
+    step (LANE_STUCK, where simulate_crn raises), or at max_steps
+    (LANE_MAX_STEPS). Retired lanes are dropped from the working arrays, so
+    the remaining steps only touch live lanes.
+
+    Returns {species: final counts, "steps": ..., "status": ..., "target": ...},
+    all arrays in the order of x_values.
+    """
+    s0 = species if s0 is None else s0
+    xs = np.asarray(x_values, dtype=np.int64).ravel()
+    n = xs.size
+    cur = {sp: np.full(n, s0[sp], dtype=np.int64) for sp in SPECIES}
+    cur["x"] = xs.copy()
+    target = xs.copy()
+    lane = np.arange(n)
+
+    out = {sp: np.zeros(n, dtype=np.int64) for sp in SPECIES}
+    out["steps"] = np.zeros(n, dtype=np.int64)
+    out["status"] = np.full(n, -1, dtype=np.int8)
+    out["target"] = xs.copy()
+
+    def retire(mask, code, step):
+        nonlocal target, lane
+        ids = lane[mask]
+        for sp in SPECIES:
+            out[sp][ids] = cur[sp][mask]
+        out["steps"][ids] = step
+        out["status"][ids] = code
+        keep = ~mask
+        for sp in SPECIES:
+            cur[sp] = cur[sp][keep]
+        target, lane = target[keep], lane[keep]
+
+    step = 0
+    while lane.size:
+        done = cur["y"] >= target
+        if done.any():
+            retire(done, LANE_REACHED, step)
+        if not lane.size:
+            break
+        if step >= max_steps:
+            retire(np.ones(lane.size, dtype=bool), LANE_MAX_STEPS, step)
+            break
+        step += 1
+
+        # Masks are added as 0/1 so each reaction is a few whole-array operations
+        a, b, c, x, xP, w, y, d, yP = (cur[sp] for sp in SPECIES)
+        fired = b > 0                 # b -> a + b
+        a += fired
+        b += fired
+        m = (a > 0) & (x >= 2)        # a + 2x -> c + xP + a
+        c += m
+        xP += m
+        x -= 2 * m
+        fired |= m
+        m = c >= 2                    # 2c -> c
+        c -= m
+        fired |= m
+        m = a > 0                     # a -> ∅
+        a -= m
+        fired |= m
+        m = xP > 0                    # xP -> x
+        xP -= m
+        x += m
+        fired |= m
+        m = c > 0                     # c -> w
+        w += m
+        c -= m
+        fired |= m
+        m = w > 0                     # w -> d
+        w -= m
+        d += m
+        fired |= m
+        m = (d > 0) & (y > 0)         # d + y -> d + 2yP
+        y -= m
+        yP += 2 * m
+        fired |= m
+        m = d > 0                     # d -> ∅
+        d -= m
+        fired |= m
+        m = yP > 0                    # yP -> y
+        yP -= m
+        y += m
+        fired |= m
+
+        if not fired.all():  # Stuck lanes (simulate_crn breaks out and raises for these)
+            retire(~fired, LANE_STUCK, step)
+
+    return out
+
+def batch_main():
+    xs = np.asarray(BATCH_X, dtype=np.int64)
+    res = simulate_crn_batch(xs)
+    status = res["status"]
+    reached = status == LANE_REACHED
+    exact = reached & (res["y"] == res["target"])
+    print(f"Batch of {xs.size} inputs, x in [{xs.min()}, {xs.max()}]")
+    print(f"  reached target : {int(reached.sum())} (y == x exactly: {int(exact.sum())})")
+    print(f"  stuck          : {int((status == LANE_STUCK).sum())}")
+    print(f"  hit max_steps  : {int((status == LANE_MAX_STEPS).sum())}")
+    print(f"  steps          : max {int(res['steps'].max())}, mean {res['steps'].mean():.1f}")
+    bad = np.flatnonzero(~exact)
+    if bad.size:
+        print(f"  first inputs without y == x: {xs[bad[:10]].tolist()}")
+
 # -----------------------------
 # Run
 # -----------------------------
-if __name__ == "__main__":
+if __name__ == "__main__" and BATCH_X is not None:
+    batch_main()
+elif __name__ == "__main__":
     target_y = species['x']
     final_species, steps = simulate_crn(species)
 
@@ -1,147 +1,176 @@
-import math
-import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for crnsim
+from crnsim import Model, Simulator
+from crnsim.autoselect import resolve_engine
+from crnsim.ensemble import ensemble, linspace
 
 # -------------------- User settings --------------------
 SEED = 1
 MAX_TIME = 1e6
 MAX_STEPS = 100000
+ENGINE = "nrm"  # "direct", "nrm", "tau-leap", "ode" or "auto"; nrm's cost per event does not grow with DEPTH
+
+DEPTH = 12  # Number of Fibonacci terms X1..X_DEPTH (>= 3)
 
-RATES = [1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.05]
+RATES = [1.0, 0.9, 0.8, 0.7, 0.6, 0.5, 0.4, 0.3, 0.2, 0.1, 0.05]  # Stage n uses RATES[n]; later stages reuse the last
 
 K_INIT = 1e-4   # small, but not too small
 
 input_value = 0
-# ------------------------------------------------------
-
-
-def nCk(n, k):
-    if k < 0 or k > n:
-        return 0
-    if k == 0 or k == n:
-        return 1
-    k = min(k, n - k)
-    out = 1
-    for i in range(1, k + 1):
-        out = out * (n - (k - i)) // i
-    return out
 
+ENSEMBLE_TRIALS = 0       # e.g. 1000: mean +- 95% CI of X1..X_DEPTH over time instead of one run
+ENSEMBLE_T_END = 30000.0  # Last grid time (the I -> S fallback alone takes ~1/K_INIT)
+ENSEMBLE_POINTS = 11      # Grid times from 0 to ENSEMBLE_T_END
+ENSEMBLE_CSV = None       # e.g. "fibonacci_ensemble.csv": full table (mean, std, CI per term)
 
-def propensity(counts, reactants, rate):
-    a = rate
-    for sp, m in reactants.items():
-        n = counts.get(sp, 0)
-        c = nCk(n, m)
-        if c == 0:
-            return 0.0
-        a *= c
-    return float(a)
-
-
-def run_fibonacci_ssa():
-    if SEED is not None:
-        random.seed(SEED)
+DEPTH_STUDY = []  # e.g. [12, 100, 1000, 5000]: time MAX_STEPS events at each depth instead of the single run
+# ------------------------------------------------------
 
-    counts = {}
 
+def stage_rate(n):
+    return RATES[min(n, len(RATES) - 1)]
+
+
+def build_fibonacci_model(depth=DEPTH):
+    """
+    Fibonacci CRN with depth terms, generated directly in index form.
+
+    Species: S, I, X1..X_depth, A1..A_{depth-2}, B1..B_{depth-2}
+      I -> S                               (K_INIT, one-time fallback)
+      S -> A1 + B1 + X1 + X2               (k0)
+      A_n -> B_{n+1} + X_{n+2}             (k_n, n < depth-2)
+      B_n -> A_{n+1} + B_{n+1} + X_{n+2}   (k_n, n < depth-2)
+      A_{depth-2} -> X_depth,  B_{depth-2} -> X_depth
+    Every reaction touches at most 4 species, so the dependency graph has
+    O(1) entries per reaction at any depth.
+    """
+    if depth < 3:
+        raise ValueError(f"depth must be >= 3, got {depth}")
+    last = depth - 2  # carriers A1..A_last, B1..B_last
+
+    species = ["S", "I"] + [f"X{i}" for i in range(1, depth + 1)]
+    species += [f"A{n}" for n in range(1, last + 1)] + [f"B{n}" for n in range(1, last + 1)]
+    S, I = 0, 1
+
+    def X(i):
+        return 1 + i
+
+    def A(n):
+        return 1 + depth + n
+
+    def B(n):
+        return 1 + depth + last + n
+
+    reactants = [((I, 1),), ((S, 1),)]
+    products = [((S, 1),), ((A(1), 1), (B(1), 1), (X(1), 1), (X(2), 1))]
+    rates = ["K_INIT", "k0"]
+    for n in range(1, last):
+        reactants += [((A(n), 1),), ((B(n), 1),)]
+        products += [((B(n + 1), 1), (X(n + 2), 1)), ((A(n + 1), 1), (B(n + 1), 1), (X(n + 2), 1))]
+        rates += [f"k{n}", f"k{n}"]
+    # Final stage: both carriers only record X_depth
+    reactants += [((A(last), 1),), ((B(last), 1),)]
+    products += [((X(depth), 1),), ((X(depth), 1),)]
+    rates += [f"k{last}", f"k{last}"]
+
+    # Rates are named (k0..k_last, K_INIT) so they can be swept
+    params = {f"k{n}": stage_rate(n) for n in range(last + 1)}
+    params["K_INIT"] = K_INIT
+
+    counts = dict.fromkeys(species, 0)
     counts["S"] = input_value  # 0 or 1
     counts["I"] = 1 - counts["S"]
 
-    # recorded Fibonacci species
-    for i in range(1, 13):
-        counts[f"X{i}"] = 0
-
-    # active pair carriers
-    for i in range(1, 11):
-        counts[f"A{i}"] = 0
-        counts[f"B{i}"] = 0
-
-    reactions = []
-
-    # -------- One-time fallback --------
-    reactions.append(({"I": 1}, {"S": 1}, K_INIT))
-
-    # -------- Bootstrap --------
-    reactions.append((
-        {"S": 1},
-        {"A1": 1, "B1": 1, "X1": 1, "X2": 1},
-        RATES[0]
-    ))
-
-    # -------- Fibonacci propagation --------
-    for n in range(1, 10):
-        reactions.append((
-            {f"A{n}": 1},
-            {f"B{n+1}": 1, f"X{n+2}": 1},
-            RATES[n]
-        ))
-        reactions.append((
-            {f"B{n}": 1},
-            {f"A{n+1}": 1, f"B{n+1}": 1, f"X{n+2}": 1},
-            RATES[n]
-        ))
-
-    # -------- Final stage --------
-    reactions.append((
-        {"A10": 1},
-        {"X12": 1},
-        RATES[10]
-    ))
-    reactions.append((
-        {"B10": 1},
-        {"X11": 0, "X12": 1},
-        RATES[10]
-    ))
-
-    t = 0.0
+    return Model.from_arrays(species, reactants, products, rates, params=params), counts
 
-    print("=" * 72)
-    print("FIBONACCI SSA (with one-time fallback)")
-    print("=" * 72)
-    print(f"Initial: S={counts['S']}")
 
-    for step in range(1, MAX_STEPS + 1):
-        if t >= MAX_TIME:
-            print("\nStopped: MAX_TIME reached.")
-            break
+def chosen_engine(model, counts, t_end=MAX_TIME):
+    # ENGINE, with "auto" resolved by pilot runs on this model (crnsim/autoselect.py)
+    return resolve_engine(ENGINE, model, counts, t_end, MAX_STEPS)
 
-        props = []
-        a0 = 0.0
 
-        for reactants, products, rate in reactions:
-            a = propensity(counts, reactants, rate)
-            props.append(a)
-            a0 += a
+def fibonacci(n):
+    a, b = 1, 1
+    for _ in range(n - 1):
+        a, b = b, a + b
+    return a
 
-        if a0 <= 0.0:
-            print(f"\nStopped at step {step-1}: no reactions can fire.")
-            break
 
-        r1 = random.random()
-        dt = -math.log(max(r1, 1e-300)) / a0
-        t += dt
+def run_fibonacci_ssa():
+    model, counts = build_fibonacci_model()
+    sim = Simulator(model, engine=chosen_engine(model, counts), seed=SEED)
 
-        r2 = random.random() * a0
-        s = 0.0
-        idx = 0
-        for i, a in enumerate(props):
-            s += a
-            if r2 <= s:
-                idx = i
-                break
+    print("=" * 72)
+    print("FIBONACCI SSA (with one-time fallback)")
+    print("=" * 72)
+    print(f"Initial: S={counts['S']}, DEPTH={DEPTH}, {model.n_reactions} reactions")
 
-        reactants, products, _ = reactions[idx]
+    res = sim.run(counts, t_end=MAX_TIME, max_steps=MAX_STEPS)
+    counts = res.counts
 
-        for sp, m in reactants.items():
-            counts[sp] -= m
-        for sp, m in products.items():
-            counts[sp] = counts.get(sp, 0) + m
+    if res.reason == "reached T_END":
+        print("\nStopped: MAX_TIME reached.")
+    elif res.reason == "no reactions possible":
+        print(f"\nStopped at step {res.steps}: no reactions can fire.")
+    elif res.reason == "reached MAX_STEPS":
+        print(f"\nStopped: MAX_STEPS reached (the CRN needs about F({DEPTH + 2}) events to finish).")
 
     print("\nFinal:")
-    for i in range(1, 13):
+    shown = range(1, DEPTH + 1) if DEPTH <= 24 else [*range(1, 7), *range(DEPTH - 5, DEPTH + 1)]
+    for i in shown:
         print(f"X{i} = {counts[f'X{i}']}")
+    done = [i for i in range(1, DEPTH + 1) if counts[f"X{i}"] == fibonacci(i)]
+    print(f"X_i == F(i) for {len(done)} of {DEPTH} terms")
 
     print("=" * 72)
 
 
+def ensemble_main():
+    # Time course of every X_i, sampled on a grid while the trials run (no events stored)
+    model, counts = build_fibonacci_model()
+    terms = [f"X{i}" for i in range(1, DEPTH + 1)]
+    engine = chosen_engine(model, counts, ENSEMBLE_T_END)
+    tc = ensemble(model, counts, linspace(0.0, ENSEMBLE_T_END, ENSEMBLE_POINTS), trials=ENSEMBLE_TRIALS,
+                  base_seed=SEED, max_steps=MAX_STEPS, species=terms, engine=engine, processes=None)
+    if ENSEMBLE_CSV:
+        from crnsim.sweep import write_csv
+        write_csv(tc.table(), Path(__file__).resolve().parent / ENSEMBLE_CSV)
+
+    print(f"{tc.trials} trials, ENGINE={engine}, stop reasons: {tc.reasons}")
+    shown = terms if DEPTH <= 6 else [terms[0], terms[DEPTH // 2 - 1], terms[-2], terms[-1]]
+    print(f"{'t':>10}" + "".join(f"  {sp + ' mean +- 95% CI':>24}" for sp in shown))
+    for i, t in enumerate(tc.times):
+        cells = []
+        for sp in shown:
+            m, hi = tc.mean(sp)[i], tc.band(sp)[1][i]
+            cells.append(f"  {m:>12.4g} +- {hi - m:<8.3g}")
+        print(f"{t:>10.4g}" + "".join(cells))
+    print("Final-term target: " + ", ".join(f"F({i})={fibonacci(i)}" for i in (DEPTH - 1, DEPTH)))
+
+
+def depth_study():
+    # Events per second at each depth: flat for nrm, falls off as 1/M for direct ("auto" picks per depth)
+    print(f"ENGINE={ENGINE}, {MAX_STEPS} events per depth (input S=1)")
+    print("depth   reactions   events   seconds   us/event   deepest X > 0")
+    for depth in DEPTH_STUDY:
+        model, counts = build_fibonacci_model(depth)
+        counts["S"], counts["I"] = 1, 0
+        sim = Simulator(model, engine=chosen_engine(model, counts), seed=SEED)
+        t0 = time.perf_counter()
+        res = sim.run(counts, t_end=MAX_TIME, max_steps=MAX_STEPS)
+        sec = time.perf_counter() - t0
+        deepest = max((i for i in range(1, depth + 1) if res.counts[f"X{i}"] > 0), default=0)
+        print(f"{depth:>5d}   {model.n_reactions:>9d}   {res.steps:>6d}   {sec:>7.2f}   "
+              f"{1e6 * sec / max(res.steps, 1):>8.2f}   {deepest:>13d}")
+
+
 if __name__ == "__main__":
-    run_fibonacci_ssa()
\ No newline at end of file
+    if DEPTH_STUDY:
+        depth_study()
+    elif ENSEMBLE_TRIALS:
+        ensemble_main()
+    else:
+        run_fibonacci_ssa()
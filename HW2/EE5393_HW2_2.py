@@ -1,7 +1,12 @@
-import math
-import random
+import sys
+from pathlib import Path
 from typing import Dict, List, Tuple
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))  # repo root, for crnsim
+from crnsim import Model, RandomPool, Simulator
+from crnsim.autoselect import resolve_engine
+from crnsim.validate import validate
+
 INPUT_SEQUENCE = [100, 5, 500, 20, 250]
 
 MAX_TIME_PER_PHASE = 10000.0
@@ -11,43 +16,45 @@ SEED = 1
 K_SLOW = 0.01
 K_FAST = 100.0
 
+ENGINE = "direct"  # "direct", "nrm", "tau-leap", "ode" or "auto" (chosen per phase by pilot runs, on first use)
+
 Stoich = Dict[str, int]
-Reaction = Tuple[Stoich, Stoich, float]
+Reaction = Tuple[Stoich, Stoich, str]  # rate is a key of PARAMS
 
 RXNS_BLUE_RED: List[Reaction] = [
-    ({"X": 1}, {"A": 1, "R_1": 1}, K_SLOW),
-    ({"B_1": 1}, {"F": 1, "C": 1, "R_2": 1}, K_SLOW),
-    ({"B_2": 1}, {"H": 1, "E": 1}, K_SLOW),
+    ({"X": 1}, {"A": 1, "R_1": 1}, "K_SLOW"),
+    ({"B_1": 1}, {"F": 1, "C": 1, "R_2": 1}, "K_SLOW"),
+    ({"B_2": 1}, {"H": 1, "E": 1}, "K_SLOW"),
 
-    ({"A": 2}, {"A_1": 1}, K_FAST),
-    ({"A_1": 2}, {"A_2": 1}, K_FAST),
-    ({"A_2": 2}, {"Y": 1}, K_FAST),
+    ({"A": 2}, {"A_1": 1}, "K_FAST"),
+    ({"A_1": 2}, {"A_2": 1}, "K_FAST"),
+    ({"A_2": 2}, {"Y": 1}, "K_FAST"),
 
-    ({"F": 2}, {"F_1": 1}, K_FAST),
-    ({"F_1": 2}, {"F_2": 1}, K_FAST),
-    ({"F_2": 2}, {"X": 1}, K_FAST),
+    ({"F": 2}, {"F_1": 1}, "K_FAST"),
+    ({"F_1": 2}, {"F_2": 1}, "K_FAST"),
+    ({"F_2": 2}, {"X": 1}, "K_FAST"),
 
-    ({"C": 2}, {"C_1": 1}, K_FAST),
-    ({"C_1": 2}, {"C_2": 1}, K_FAST),
-    ({"C_2": 2}, {"Y": 1}, K_FAST),
+    ({"C": 2}, {"C_1": 1}, "K_FAST"),
+    ({"C_1": 2}, {"C_2": 1}, "K_FAST"),
+    ({"C_2": 2}, {"Y": 1}, "K_FAST"),
 
-    ({"H": 2}, {"H_1": 1}, K_FAST),
-    ({"H_1": 2}, {"H_2": 1}, K_FAST),
-    ({"H_2": 2}, {"X": 1}, K_FAST),
+    ({"H": 2}, {"H_1": 1}, "K_FAST"),
+    ({"H_1": 2}, {"H_2": 1}, "K_FAST"),
+    ({"H_2": 2}, {"X": 1}, "K_FAST"),
 
-    ({"E": 2}, {"E_1": 1}, K_FAST),
-    ({"E_1": 2}, {"E_2": 1}, K_FAST),
-    ({"E_2": 2}, {"Y": 1}, K_FAST),
+    ({"E": 2}, {"E_1": 1}, "K_FAST"),
+    ({"E_1": 2}, {"E_2": 1}, "K_FAST"),
+    ({"E_2": 2}, {"Y": 1}, "K_FAST"),
 ]
 
 RXNS_RED_GREEN: List[Reaction] = [
-    ({"R_1": 1}, {"G_1": 1}, K_SLOW),
-    ({"R_2": 1}, {"G_2": 1}, K_SLOW),
+    ({"R_1": 1}, {"G_1": 1}, "K_SLOW"),
+    ({"R_2": 1}, {"G_2": 1}, "K_SLOW"),
 ]
 
 RXNS_GREEN_BLUE: List[Reaction] = [
-    ({"G_1": 1}, {"B_1": 1}, K_SLOW),
-    ({"G_2": 1}, {"B_2": 1}, K_SLOW),
+    ({"G_1": 1}, {"B_1": 1}, "K_SLOW"),
+    ({"G_2": 1}, {"B_2": 1}, "K_SLOW"),
 ]
 
 INIT_COUNTS: Dict[str, int] = {
@@ -63,94 +70,63 @@ INIT_COUNTS: Dict[str, int] = {
 }
 
 
-def nCk(n: int, k: int) -> int:
-    if k < 0 or k > n:
-        return 0
-    if k == 0 or k == n:
-        return 1
-    k = min(k, n - k)
-    out = 1
-    for i in range(1, k + 1):
-        out = out * (n - (k - i)) // i
-    return out
-
-
-def propensity(counts: Dict[str, int], reactants: Stoich, rate: float) -> float:
-    a = rate
-    for sp, m in reactants.items():
-        c = nCk(counts.get(sp, 0), m)
-        if c == 0:
-            return 0.0
-        a *= c
-    return float(a)
-
+PARAMS: Dict[str, float] = {"K_SLOW": K_SLOW, "K_FAST": K_FAST}
 
-def fire_reaction(counts: Dict[str, int], reactants: Stoich, products: Stoich) -> None:
-    for sp, m in reactants.items():
-        counts[sp] = counts.get(sp, 0) - m
-    for sp, m in products.items():
-        counts[sp] = counts.get(sp, 0) + m
+def compile_phase(rxns: List[Reaction]) -> Model:
+    # Phases start from whatever the previous phase left, so nothing is dropped as dead
+    rxns, names, report = validate(rxns, INIT_COUNTS, drop_dead=False)
+    if report.unknown_species:
+        raise ValueError(f"Species missing from INIT_COUNTS: {report.unknown_species}")
+    return Model(rxns, species=list(INIT_COUNTS), params=PARAMS, names=names)
 
 
-def run_phase(rxns: List[Reaction], counts_in: Dict[str, int]) -> Dict[str, int]:
-    counts = dict(counts_in)
-    t = 0.0
-
-    for _ in range(MAX_STEPS_PER_PHASE):
-        if t >= MAX_TIME_PER_PHASE:
-            break
-
-        props: List[float] = []
-        a0 = 0.0
+PHASES: Dict[str, Model] = {
+    "blue_red": compile_phase(RXNS_BLUE_RED),
+    "red_green": compile_phase(RXNS_RED_GREEN),
+    "green_blue": compile_phase(RXNS_GREEN_BLUE),
+}
 
-        for reactants, products, rate in rxns:
-            a = propensity(counts, reactants, rate)
-            props.append(a)
-            a0 += a
 
-        if a0 <= 0.0:
-            break
+PHASE_ENGINES: Dict[str, str] = {}  # phase name -> engine, resolved on the phase's first run
 
-        r1 = random.random()
-        dt = -math.log(max(r1, 1e-300)) / a0
-        t += dt
 
-        r2 = random.random() * a0
-        s = 0.0
-        idx = 0
-        for i, a in enumerate(props):
-            s += a
-            if r2 <= s:
-                idx = i
-                break
+def phase_engine(model: Model, counts: Dict[str, int]) -> str:
+    name = next(n for n, m in PHASES.items() if m is model)
+    if name not in PHASE_ENGINES:
+        PHASE_ENGINES[name] = resolve_engine(ENGINE, model, counts, MAX_TIME_PER_PHASE, MAX_STEPS_PER_PHASE,
+                                             log=lambda line: print(f"[{name}] {line}"))
+    return PHASE_ENGINES[name]
 
-        reactants, products, _ = rxns[idx]
-        fire_reaction(counts, reactants, products)
 
+def run_phase(model: Model, counts_in: Dict[str, int], pool: RandomPool) -> Dict[str, int]:
+    counts = dict(counts_in)
+    res = Simulator(model, engine=phase_engine(model, counts), pool=pool).run(
+        counts, t_end=MAX_TIME_PER_PHASE, max_steps=MAX_STEPS_PER_PHASE
+    )
+    counts.update((sp, round(n)) for sp, n in res.counts.items())  # ode amounts are floats; the next phase needs counts
     return counts
 
 
-def run_one_cycle(counts_in: Dict[str, int], x_value: int) -> Dict[str, int]:
+def run_one_cycle(counts_in: Dict[str, int], x_value: int, pool: RandomPool) -> Dict[str, int]:
     counts = dict(counts_in)
 
     counts["Y"] = 0
     counts["X"] = x_value
 
-    counts = run_phase(RXNS_BLUE_RED, counts)
+    counts = run_phase(PHASES["blue_red"], counts, pool)
     counts["Y_recorded"] = counts.get("Y", 0)
 
-    counts = run_phase(RXNS_RED_GREEN, counts)
+    counts = run_phase(PHASES["red_green"], counts, pool)
 
     counts["Y"] = 0
 
-    counts = run_phase(RXNS_GREEN_BLUE, counts)
+    counts = run_phase(PHASES["green_blue"], counts, pool)
 
     return counts
 
 
 def main() -> None:
-    if SEED is not None:
-        random.seed(SEED)
+    pool = RandomPool(SEED)
 
     counts = dict(INIT_COUNTS)
 
@@ -158,7 +134,7 @@ def main() -> None:
     print("---------------------------")
 
     for i, xval in enumerate(INPUT_SEQUENCE, start=1):
-        counts = run_one_cycle(counts, xval)
+        counts = run_one_cycle(counts, xval, pool)
         print(f"{i:>2} | {xval:>4} | {counts['Y_recorded']:>4} | "
               f"{counts['B_1']:>4} | {counts['B_2']:>4}")
 
@@ -1,6 +1,11 @@
 import numpy as np
 from math import comb
 
+from bernstein_fit import cheapest, errors, fit_degrees, in_unit_interval
+
+FIT_DEGREES = range(1, 7)  # Degrees fitted to cos(x) with coefficients kept in [0, 1]
+FIT_BUDGET = 1e-3          # Max error allowed when picking the cheapest circuit
+
 def poly_to_bernstein_exact(coeffs):
     n = len(coeffs) - 1
     b = np.zeros(n + 1, dtype=float)
@@ -42,6 +47,8 @@ bern_coeffs_1a = poly_to_bernstein_exact(poly_coeffs_1a)
 
 print("Problem 1a:")
 print(bern_coeffs_1a)
+if not in_unit_interval(bern_coeffs_1a):
+    print("  warning: coefficients outside [0, 1] cannot be MUX input probabilities")
 print()
 
 # ----------------------------
@@ -54,6 +61,8 @@ bern_coeffs_1b = poly_to_bernstein_exact(poly_coeffs_1b)
 
 print("Problem 1b:")
 print(bern_coeffs_1b)
+if not in_unit_interval(bern_coeffs_1b):
+    print("  warning: coefficients outside [0, 1] cannot be MUX input probabilities")
 print()
 
 # ----------------------------
@@ -66,6 +75,8 @@ bern_coeffs_1c = poly_to_bernstein_exact(poly_coeffs_1c)
 
 print("Problem 1c:")
 print(bern_coeffs_1c)
+if not in_unit_interval(bern_coeffs_1c):
+    print("  warning: coefficients outside [0, 1] cannot be MUX input probabilities")
 print()
 
 print("X = 0:")
@@ -88,4 +99,20 @@ print("X = 1")
 print(bernstein_output(bern_coeffs_1c, 1))
 print()
 
+# ----------------------------
+# Problem 1(b), fitted instead of truncated:
+# Bernstein coefficients in [0, 1] fitted to cos(x) directly
+# ----------------------------
 
+print("cos(x): Taylor 1 - x^2/2 max error = %.3e" % errors(bern_coeffs_1b, np.cos)[0])
+for method in ("lsq", "minimax"):
+    print(f"cos(x) fits ({method}):")
+    for f in fit_degrees(np.cos, FIT_DEGREES, method):
+        print(f"  n={f.degree}: max error {f.max_error:.3e}, rms {f.rms_error:.3e}, b = {np.round(f.coeffs, 4)}")
+best = cheapest(np.cos, FIT_BUDGET, FIT_DEGREES)
+if best is None:
+    print(f"No degree in {list(FIT_DEGREES)} meets max error {FIT_BUDGET:g}")
+else:
+    print(f"Cheapest circuit within {FIT_BUDGET:g}: degree {best.degree} ({best.degree} streams, "
+          f"{best.degree + 1}:1 MUX), b = {np.round(best.coeffs, 4)}")
+print()
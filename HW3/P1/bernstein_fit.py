@@ -0,0 +1,190 @@
+"""
+Bernstein-coefficient fitting for Problem 1.
+
+A stochastic circuit with n input streams and an (n+1):1 MUX computes
+sum_k b_k C(n,k) x^k (1-x)^(n-k), and each b_k must be a probability. The
+fitters here take any target f on [0, 1] and find coefficients in [0, 1]
+for each degree, either in least squares (L2 over [0, 1]) or minimax (max
+error on a grid). The matrices for each degree are built once and cached,
+so fitting many functions only re-samples f and solves.
+"""
+
+from functools import lru_cache
+from math import comb
+from typing import NamedTuple
+
+import numpy as np
+from scipy.optimize import linprog, lsq_linear
+
+POINTS = 513      # uniform grid for the reported errors
+LP_POINTS = 129   # Chebyshev-Lobatto nodes for the minimax fit (the LP cost grows with them)
+QUAD_POINTS = 64  # Gauss-Legendre nodes for the least-squares fit
+LP_TOLERANCE = 1e-10  # HiGHS feasibility tolerance; the default (1e-7) caps the minimax error near 1e-7
+
+
+class Fit(NamedTuple):
+    degree: int
+    coeffs: np.ndarray
+    max_error: float  # on the POINTS grid
+    rms_error: float
+
+
+def _read_only(*arrays):
+    for a in arrays:
+        a.setflags(write=False)
+    return arrays if len(arrays) > 1 else arrays[0]
+
+
+def basis(n, x):
+    """Bernstein basis of degree n at the points x; returns an array of shape (len(x), n+1)."""
+    x = np.asarray(x, dtype=float)[:, None]
+    k = np.arange(n + 1)
+    c = np.array([comb(n, i) for i in k], dtype=float)
+    return c * x**k * (1 - x) ** (n - k)
+
+
+@lru_cache(maxsize=None)
+def grid(points=POINTS):
+    return _read_only(np.linspace(0.0, 1.0, points))
+
+
+@lru_cache(maxsize=None)
+def grid_basis(n, points=POINTS):
+    return _read_only(basis(n, grid(points)))
+
+
+@lru_cache(maxsize=None)
+def cheb_grid(points=LP_POINTS):
+    """Chebyshev-Lobatto nodes on [0, 1]: denser near the ends, where fit errors peak."""
+    return _read_only((1 - np.cos(np.pi * np.arange(points) / (points - 1))) / 2)
+
+
+@lru_cache(maxsize=None)
+def lsq_system(n, quad=QUAD_POINTS):
+    """
+    Weighted collocation matrix for the L2 fit of degree n.
+
+    returns: (x, sqrt_w, A, A_pinv)
+      x, sqrt_w : Gauss-Legendre nodes on [0, 1] and the square roots of their weights
+      A         : sqrt_w * basis(n, x), so ||A b - sqrt_w f(x)|| is the L2 error
+      A_pinv    : pseudo-inverse of A (the unconstrained solution, used when it is already in [0, 1])
+    """
+    t, w = np.polynomial.legendre.leggauss(quad)
+    x = (t + 1) / 2
+    sqrt_w = np.sqrt(w / 2)
+    a = sqrt_w[:, None] * basis(n, x)
+    return _read_only(x, sqrt_w, a, np.linalg.pinv(a))
+
+
+@lru_cache(maxsize=None)
+def minimax_system(n, points=LP_POINTS):
+    """
+    Linear program for the minimax fit of degree n, variables (b_0 .. b_n, t):
+    minimize t subject to -t <= B b - f <= t on cheb_grid() and 0 <= b_k <= 1.
+
+    returns: (c, A_ub, bounds); the right-hand side is (f, -f)
+    """
+    b = basis(n, cheb_grid(points))
+    ones = np.ones((len(b), 1))
+    a_ub = np.vstack([np.hstack([b, -ones]), np.hstack([-b, -ones])])
+    c = np.zeros(n + 2)
+    c[-1] = 1.0
+    return _read_only(c, a_ub), [(0.0, 1.0)] * (n + 1) + [(0.0, None)]
+
+
+def sample(f, x):
+    """f at the points x; f may take an array or a single float."""
+    try:
+        y = np.asarray(f(x), dtype=float)
+        if y.shape == x.shape:
+            return y
+    except (TypeError, ValueError):
+        pass
+    return np.array([f(v) for v in x], dtype=float)
+
+
+def errors(b, f, points=POINTS):
+    """returns: (max abs error, rms error) of the Bernstein polynomial b against f on the grid"""
+    e = grid_basis(len(b) - 1, points) @ b - sample(f, grid(points))
+    return float(np.max(np.abs(e))), float(np.sqrt(np.mean(e**2)))
+
+
+def in_unit_interval(b, tol=1e-12):
+    """True when every coefficient is a valid probability (so the MUX inputs can be built)."""
+    b = np.asarray(b, dtype=float)
+    return bool(np.all(b >= -tol) and np.all(b <= 1 + tol))
+
+
+def fit(f, n, method="lsq", points=POINTS):
+    """
+    Coefficients in [0, 1] of degree n approximating f on [0, 1].
+
+    method : "lsq" (least squares over [0, 1]) or "minimax" (max error at the
+             LP_POINTS nodes; the reported errors use the finer POINTS grid,
+             and the least-squares fit is returned when it is better there)
+
+    returns: Fit
+    """
+    if method == "lsq":
+        x, sqrt_w, a, a_pinv = lsq_system(n)
+        rhs = sqrt_w * sample(f, x)
+        b = a_pinv @ rhs
+        if not in_unit_interval(b, 0.0):  # the bounds are active: solve the bounded problem
+            b = lsq_linear(a, rhs, bounds=(0.0, 1.0), method="bvls").x
+    elif method == "minimax":
+        (c, a_ub), bounds = minimax_system(n)
+        y = sample(f, cheb_grid())
+        res = linprog(c, A_ub=a_ub, b_ub=np.concatenate([y, -y]), bounds=bounds, method="highs",
+                      options={"primal_feasibility_tolerance": LP_TOLERANCE,
+                               "dual_feasibility_tolerance": LP_TOLERANCE})
+        if not res.success:
+            raise RuntimeError(f"minimax fit of degree {n} failed: {res.message}")
+        b = np.clip(res.x[:-1], 0.0, 1.0)
+        lsq = fit(f, n, "lsq", points)
+        mm = Fit(n, b, *errors(b, f, points))
+        return lsq if lsq.max_error < mm.max_error else mm
+    else:
+        raise ValueError(f"method must be 'lsq' or 'minimax', got {method!r}")
+
+    b = np.clip(b, 0.0, 1.0)
+    return Fit(n, b, *errors(b, f, points))
+
+
+def fit_degrees(f, degrees, method="lsq", points=POINTS):
+    """fit() for each degree; returns a list of Fit (the error per degree)."""
+    return [fit(f, n, method, points) for n in degrees]
+
+
+def cheapest(f, budget, degrees=range(1, 11), method="minimax", points=POINTS):
+    """
+    Lowest-degree fit (fewest input streams, smallest MUX) whose max error is
+    within budget.
+
+    Degree elevation writes a degree-n polynomial at degree n+1 with
+    coefficients that are averages of the old ones, so they stay in [0, 1]
+    and the best minimax error never grows with the degree. Minimax fits
+    therefore bisect over the degrees; least-squares fits try them in order.
+    A degree whose (cheap) least-squares fit already meets the budget is
+    feasible without solving the linear program.
+
+    returns: Fit, or None when no degree meets the budget
+    """
+    degrees = sorted(degrees)
+    if method != "minimax":
+        for n in degrees:
+            res = fit(f, n, method, points)
+            if res.max_error <= budget:
+                return res
+        return None
+
+    best, lo, hi = None, 0, len(degrees) - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        n = degrees[mid]
+        if fit(f, n, "lsq", points).max_error <= budget:
+            best, hi = n, mid - 1
+        elif fit(f, n, method, points).max_error <= budget:
+            best, hi = n, mid - 1
+        else:
+            lo = mid + 1
+    return None if best is None else fit(f, best, method, points)
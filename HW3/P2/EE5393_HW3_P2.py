@@ -1,18 +1,18 @@
-def p_and(a, b):
-    return a * b
+from fractions import Fraction
 
-def p_not(a):
-    return 1 - a
+from stochastic_logic import (
+    p_and, p_not, p_or, binary_chain, eval_chain, eval_chain_exact,
+    verify_chain_table, verify_chain_library,
+)
 
-def p_or(a, b):
-    return 1 - (1 - a) * (1 - b)
+EXACT = True  # Evaluate with exact fractions instead of floats
 
 
 # ----------------------------
 # Base probabilities
 # ----------------------------
-A = 0.4
-B = 0.5
+A = Fraction(2, 5) if EXACT else 0.4
+B = Fraction(1, 2) if EXACT else 0.5
 
 p04 = A
 p05 = B
@@ -38,8 +38,10 @@ p5 = p_or(p03, p4)      # 0.62942
 p6 = p_and(p07, p5)     # 0.440594
 z1 = p_or(p08, p6)      # 0.8881188
 
-print("(a)(i) P(z) =", round(z1, 7))
+print("(a)(i) P(z) =", round(float(z1), 7))
 print("target      =", 0.8881188)
+if EXACT:
+    print("exact match =", z1 == Fraction("0.8881188"))
 print()
 
 
@@ -56,8 +58,10 @@ q7 = p_and(p06, q6)     # 0.412806
 q8 = p_or(p05, q7)      # 0.706403
 z2 = p_and(p03, q8)     # 0.2119209
 
-print("(a)(ii) P(z) =", round(z2, 7))
+print("(a)(ii) P(z) =", round(float(z2), 7))
 print("target       =", 0.2119209)
+if EXACT:
+    print("exact match  =", z2 == Fraction("0.2119209"))
 print()
 
 
@@ -72,15 +76,17 @@ r5 = p_and(p07, r4)     # 0.37037
 r6 = p_and(p03, r5)     # 0.111111
 z3 = p_or(p05, r6)      # 0.5555555
 
-print("(a)(iii) P(z) =", round(z3, 7))
+print("(a)(iii) P(z) =", round(float(z3), 7))
 print("target        =", 0.5555555)
+if EXACT:
+    print("exact match   =", z3 == Fraction("0.5555555"))
 print()
 
 # ----------------------------
 # Problem 2(b)
 # ----------------------------
 
-p05 = 0.5
+p05 = Fraction(1, 2) if EXACT else 0.5
 
 print("Problem 2b:")
 print()
@@ -96,7 +102,7 @@ z3 = p_or(p05, z4)
 z2 = p_and(p05, z3)
 z1 = p_or(p05, z2)
 
-print("(b)(i) P(z) =", round(z1, 7))
+print("(b)(i) P(z) =", round(float(z1), 7))
 print("target      =", int("1011111", 2) / (2**7))
 print()
 
@@ -112,7 +118,7 @@ z3 = p_and(p05, z4)
 z2 = p_or(p05, z3)
 z1 = p_or(p05, z2)
 
-print("(b)(ii) P(z) =", round(z1, 7))
+print("(b)(ii) P(z) =", round(float(z1), 7))
 print("target       =", int("1101111", 2) / (2**7))
 print()
 
@@ -128,6 +134,24 @@ z3 = p_or(p05, z4)
 z2 = p_and(p05, z3)
 z1 = p_or(p05, z2)
 
-print("(b)(iii) P(z) =", round(z1, 7))
+print("(b)(iii) P(z) =", round(float(z1), 7))
 print("target        =", int("1010111", 2) / (2**7))
-print()
\ No newline at end of file
+print()
+
+
+# ----------------------------
+# Problem 2(b): generated chains
+# ----------------------------
+for label, bits in [("(i)", "1011111"), ("(ii)", "1101111"), ("(iii)", "1010111")]:
+    gates = binary_chain(bits)
+    print(f"(b){label} chain from x_7:", " -> ".join(gates))
+    value = eval_chain_exact(gates) if EXACT else eval_chain(gates, p05)
+    print(f"(b){label} P(z) =", value, "target =", int(bits, 2) / (2**7))
+print()
+
+ok, err = verify_chain_table(16)
+print("All 16-bit constants verified:", ok, "max error =", err)
+if EXACT:
+    ok, n_gates = verify_chain_library(16)
+    print("All 16-bit constants verified exactly:", ok, f"({n_gates} shared gates)")
+print()
@@ -0,0 +1,240 @@
+"""
+Stochastic logic helpers for Problem 2.
+
+Gate probabilities for independent input streams, plus a direct synthesizer
+that maps a k-bit binary fraction 0.b1 b2 ... bk to its AND/OR chain over
+0.5 sources (the construction used by hand in Problem 2(b)), and a netlist
+type that evaluates circuits exactly with shared subexpressions computed once.
+"""
+
+from fractions import Fraction
+from functools import lru_cache
+
+import numpy as np
+
+
+def p_and(a, b):
+    return a * b
+
+def p_not(a):
+    return 1 - a
+
+def p_or(a, b):
+    return 1 - (1 - a) * (1 - b)
+
+
+# ----------------------------
+# Binary-expansion chains
+# ----------------------------
+
+def binary_chain(bits):
+    """
+    bits : binary fraction digits after the point, e.g. "1011111" for 0.1011111_2
+
+    returns: list of gates ("and"/"or") applied, in order, to z = x_k (a 0.5 source)
+
+    Reading bits from the least significant end: the last 1 is the starting source,
+    every later bit b_i gives z_i = x_i OR z_{i+1} when b_i = 1 and x_i AND z_{i+1}
+    when b_i = 0. Trailing zeros do not change the value and are dropped.
+    """
+    bits = bits.strip()
+    if not bits or set(bits) - {"0", "1"}:
+        raise ValueError(f"Not a binary fraction: {bits!r}")
+
+    bits = bits.rstrip("0")
+    if not bits:
+        raise ValueError("0 cannot be built from 0.5 sources (needs a constant-0 input)")
+
+    return ["or" if b == "1" else "and" for b in reversed(bits[:-1])]
+
+
+def eval_chain(gates, p05=0.5):
+    """Evaluate a chain from binary_chain(); returns P(z)."""
+    z = p05
+    for g in gates:
+        z = p_or(p05, z) if g == "or" else p_and(p05, z)
+    return z
+
+
+def eval_chain_exact(gates):
+    """
+    Exact value of a chain as a Fraction.
+
+    Every gate halves the denominator's weight, so the value is n / 2^(len+1)
+    and only integer adds/shifts are needed:
+      x AND z -> n / 2^(j+1)
+      x OR z  -> (2^j + n) / 2^(j+1)
+    """
+    n, j = 1, 1
+    for g in gates:
+        if g == "or":
+            n += 1 << j
+        j += 1
+    return Fraction(n, 1 << j)
+
+
+@lru_cache(maxsize=None)
+def chain_table(k):
+    """
+    Precomputed chains for every k-bit constant m / 2^k, m = 0 .. 2^k - 1.
+
+    returns: (n_gates, or_mask)
+      n_gates[m] : gates after the starting source (-1 for m = 0, which has no chain)
+      or_mask[m] : bit i set when gate i (counted from the source) is an OR
+    """
+    if not 1 <= k <= 30:
+        raise ValueError(f"k must be in [1, 30], got {k}")
+
+    m = np.arange(2**k, dtype=np.int64)
+
+    # trailing zeros of m (m = 0 gets k)
+    tz = np.full(m.shape, k, dtype=np.int64)
+    for i in range(k - 1, -1, -1):
+        tz[(m >> i) & 1 == 1] = i
+
+    n_gates = (k - tz - 1).astype(np.int8)
+    or_mask = m >> (tz + 1)
+
+    n_gates.setflags(write=False)
+    or_mask.setflags(write=False)
+    return n_gates, or_mask
+
+
+CHAIN_TABLE_16 = chain_table(16)
+
+
+def verify_chain_table(k):
+    """
+    Evaluate all 2^k chains of chain_table(k) at once and compare with m / 2^k.
+
+    returns: (ok, max_abs_error)
+    """
+    n_gates, or_mask = chain_table(k)
+    p05 = 0.5
+
+    z = np.where(n_gates >= 0, p05, 0.0)
+    for i in range(k - 1):
+        active = n_gates > i
+        is_or = (or_mask >> i) & 1 == 1
+        step = np.where(is_or, p_or(p05, z), p_and(p05, z))
+        z = np.where(active, step, z)
+
+    target = np.arange(2**k, dtype=np.float64) / 2**k
+    err = float(np.max(np.abs(z - target)))
+    return err == 0.0, err
+
+
+# ----------------------------
+# Netlists with exact evaluation
+# ----------------------------
+
+class Netlist:
+    """
+    AND/OR/NOT netlist over independent sources.
+
+    Nodes are integer ids. Gates are hash-consed: asking for a gate that
+    already exists (same op, same inputs) returns the existing node, so
+    circuits added to one netlist share their common subexpressions.
+    """
+
+    def __init__(self):
+        self.nodes = []   # (op, args): ("src", name) / ("and", a, b) / ("or", a, b) / ("not", a)
+        self.sources = {}  # name -> probability (Fraction, int or float)
+        self._ids = {}
+
+    def _node(self, key):
+        nid = self._ids.get(key)
+        if nid is None:
+            nid = len(self.nodes)
+            self.nodes.append(key)
+            self._ids[key] = nid
+        return nid
+
+    def source(self, name, p):
+        if name in self.sources and self.sources[name] != p:
+            raise ValueError(f"Source {name!r} already defined with p={self.sources[name]}")
+        self.sources[name] = p
+        return self._node(("src", name))
+
+    def and_(self, a, b):
+        return self._node(("and",) + tuple(sorted((a, b))))
+
+    def or_(self, a, b):
+        return self._node(("or",) + tuple(sorted((a, b))))
+
+    def not_(self, a):
+        return self._node(("not", a))
+
+    def add_chain(self, bits, x="x05"):
+        """Add the binary_chain() circuit for bits; returns its output node."""
+        x05 = self.source(x, Fraction(1, 2))
+        z = x05
+        for g in binary_chain(bits):
+            z = self.or_(x05, z) if g == "or" else self.and_(x05, z)
+        return z
+
+    def evaluate(self, outputs, exact=True):
+        """
+        Evaluate output node(s); every node is computed once.
+
+        exact=True works on integer (numerator, denominator) pairs without
+        reducing (source denominators are powers of 2/10, so products stay
+        small) and converts to Fraction at the end. exact=False uses floats.
+
+        returns: value for a single node id, or a list for a list of ids
+        """
+        single = isinstance(outputs, int)
+        outs = [outputs] if single else list(outputs)
+
+        if exact:
+            vals = [None] * len(self.nodes)
+            for nid in range(max(outs) + 1):  # inputs always have smaller ids
+                op = self.nodes[nid]
+                if op[0] == "src":
+                    p = self.sources[op[1]]
+                    p = Fraction(repr(p)) if isinstance(p, float) else Fraction(p)  # 0.4 -> 2/5
+                    vals[nid] = (p.numerator, p.denominator)
+                elif op[0] == "not":
+                    n, d = vals[op[1]]
+                    vals[nid] = (d - n, d)
+                else:
+                    n1, d1 = vals[op[1]]
+                    n2, d2 = vals[op[2]]
+                    if op[0] == "and":
+                        vals[nid] = (n1 * n2, d1 * d2)
+                    else:
+                        vals[nid] = (d1 * d2 - (d1 - n1) * (d2 - n2), d1 * d2)
+            res = [Fraction(*vals[o]) for o in outs]
+        else:
+            vals = [0.0] * len(self.nodes)
+            for nid in range(max(outs) + 1):
+                op = self.nodes[nid]
+                if op[0] == "src":
+                    vals[nid] = float(self.sources[op[1]])
+                elif op[0] == "not":
+                    vals[nid] = p_not(vals[op[1]])
+                elif op[0] == "and":
+                    vals[nid] = p_and(vals[op[1]], vals[op[2]])
+                else:
+                    vals[nid] = p_or(vals[op[1]], vals[op[2]])
+            res = [vals[o] for o in outs]
+
+        return res[0] if single else res
+
+
+def verify_chain_library(k):
+    """
+    Build every k-bit chain (m = 1 .. 2^k - 1) into one netlist and check each
+    output exactly against m / 2^k.
+
+    returns: (ok, number of gate nodes shared by the whole library)
+    """
+    net = Netlist()
+    outs, targets = [], []
+    for m in range(1, 2**k):
+        outs.append(net.add_chain(format(m, f"0{k}b")))
+        targets.append(Fraction(m, 2**k))
+
+    vals = net.evaluate(outs)
+    ok = all(v == t for v, t in zip(vals, targets))
+    return ok, len(net.nodes) - len(net.sources)
@@ -0,0 +1,31 @@
+"""
+crnsim — shared chemical reaction network simulation code for the EE5393 scripts.
+
+The homework scripts add the repository root to sys.path and import from here:
+
+    model = Model(reactions, species=list(init))
+    sim = Simulator(model, engine="direct", seed=SEED)
+    result = sim.run(init, t_end=MAX_TIME, max_steps=MAX_STEPS, stop=stop_fn)
+"""
+
+from .engines import ENGINES, NO_REACTIONS, REACHED_MAX_STEPS, REACHED_T_END
+from .model import Model, load_initial_counts, load_reactions, nCk, parse_stoich
+from .profile import Profile
+from .rng import RandomPool
+from .simulator import Result, Simulator
+
+__all__ = [
+    "ENGINES",
+    "Model",
+    "NO_REACTIONS",
+    "Profile",
+    "REACHED_MAX_STEPS",
+    "REACHED_T_END",
+    "RandomPool",
+    "Result",
+    "Simulator",
+    "load_initial_counts",
+    "load_reactions",
+    "nCk",
+    "parse_stoich",
+]
@@ -0,0 +1,316 @@
+"""
+Automatic engine choice: model analysis plus short pilot runs.
+
+choose_engine() first looks at the compiled model: its size, initial copy
+numbers, rate constants and the spread of the initial propensities
+(stiffness). With every initial count small, tau-leap and ode are left
+out, because leaping and mass-action ODEs are only accurate at large
+copy numbers. A stiff model leaves out tau-leap, whose explicit leaps
+are unstable when the fastest reactions are STIFF_RATIO times faster than
+the slowest. The size and the rate-constant spread do not change the
+choice; they are reported for context. Then every remaining engine gets
+pilot runs:
+
+  1. a few direct-method runs of pilot_steps events each; the median
+     time they reach is the pilot horizon (capped at t_end)
+  2. pilot_runs runs of each engine up to that horizon (one run for the
+     deterministic ode engine), timed
+  3. direct and nrm are exact. tau-leap and ode run with the same seeds
+     as the direct runs and are judged on the species whose direct mean
+     is at least LEAP_MIN_COUNT (smaller ones are too noisy to judge from
+     a few pilots): the mean paired difference, less two standard errors,
+     must stay within accuracy of the direct mean. Without a direct
+     reference they are not tried.
+
+The fastest engine that passes wins, but timing noise alone never
+decides: nrm replaces direct only when it is SPEEDUP times faster, and an
+approximate engine must beat the fastest exact one by SPEEDUP as well.
+When no candidate passes, choose_engine() raises ValueError. The choice
+and each engine's seconds per run and events per second can be printed
+with lines().
+Pilot runs cover only the early part of a trajectory, so the choice
+reflects how the model behaves there.
+
+    choice = choose_engine(model, init, t_end=T_END, stop=done_state)
+    sim = Simulator(model, engine=choice.engine)
+
+Scripts accept ENGINE = "auto" through resolve_engine().
+
+    python -m crnsim.autoselect --workload log_multiply
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+from .engines import ENGINES, REACHED_MAX_STEPS, StopFn
+from .model import Model
+from .simulator import Simulator
+
+AUTO = "auto"
+EXACT = ("direct", "nrm")
+PILOT_STEPS = 20_000     # events per direct-method probe run
+PILOT_RUNS = 5           # timed runs per engine
+ACCURACY = 0.05          # allowed relative error of species means for approximate engines
+LEAP_MIN_COUNT = 20      # tau-leap and ode need some initial count at least this large
+STIFF_RATIO = 1e3        # propensity spread above which the model counts as stiff
+CAP_FACTOR = 50          # a timed run may fire at most CAP_FACTOR * pilot_steps events
+SPEEDUP = 1.2            # an approximate engine must be this much faster than the exact ones
+
+
+@dataclass
+class Analysis:
+    """Model facts for choose_engine(); only counts and stiff change the choice."""
+    n_reactions: int
+    n_species: int
+    counts: tuple            # (min, median, max) of the nonzero initial counts
+    rate_ratio: float        # max / min positive rate constant
+    propensity_ratio: float  # max / min nonzero initial propensity
+    stiff: bool
+
+    def lines(self) -> List[str]:
+        lo, mid, hi = self.counts
+        out = [f"{self.n_reactions} reactions, {self.n_species} species; initial counts {lo:g} / {mid:g} / "
+               f"{hi:g} (min / median / max nonzero)",
+               f"rate constants span {self.rate_ratio:.3g}x, initial propensities {self.propensity_ratio:.3g}x"
+               + (" (stiff)" if self.stiff else "")]
+        if hi < LEAP_MIN_COUNT:
+            out.append(f"all initial counts below {LEAP_MIN_COUNT}: tau-leap and ode not tried")
+        elif self.stiff:
+            out.append(f"initial propensities span over {STIFF_RATIO:g}x: tau-leap not tried")
+        return out
+
+
+@dataclass
+class Pilot:
+    engine: str
+    seconds: float = math.nan  # wall time per run to the horizon
+    events: float = math.nan   # events (ode: right-hand-side evaluations) per run
+    error: float = math.nan    # worst relative error of a judged species mean (approximate engines)
+    ok: bool = False
+    note: str = ""
+
+    @property
+    def rate(self) -> float:
+        return self.events / self.seconds if self.seconds > 0 else math.nan
+
+
+@dataclass
+class Choice:
+    engine: str
+    horizon: float
+    analysis: Analysis
+    pilots: List[Pilot] = field(default_factory=list)
+    seconds: float = 0.0  # total time spent choosing
+
+    def lines(self) -> List[str]:
+        out = self.analysis.lines()
+        out.append(f"pilot horizon t = {self.horizon:.4g}")
+        for p in self.pilots:
+            if math.isnan(p.seconds):
+                out.append(f"  {p.engine:<9} {p.note}")
+                continue
+            unit = "rhs evals/s" if p.engine == "ode" else "events/s"
+            err = "" if math.isnan(p.error) else f", mean error {p.error:.2%}"
+            mark = "ok" if p.ok else "rejected"
+            out.append(f"  {p.engine:<9} {p.seconds * 1e3:9.2f} ms/run  {p.rate:12.4g} {unit}{err}  {mark}"
+                       + (f" ({p.note})" if p.note else ""))
+        chosen = next(p for p in self.pilots if p.engine == self.engine)
+        speed = "" if math.isnan(chosen.rate) else \
+            f" ({chosen.rate:.4g} {'rhs evals' if self.engine == 'ode' else 'events'}/s)"
+        out.append(f"chose {self.engine}{speed} in {self.seconds:.2f} s")
+        return out
+
+
+def analyze(model: Model, init: Dict[str, int]) -> Analysis:
+    x = model.state(init)
+    nonzero = sorted(v for v in x if v > 0) or [0]
+    rates = [r for r in model.rates if r > 0]
+    props = [a for a in (model.propensity(j, x) for j in range(model.n_reactions)) if a > 0]
+    p_ratio = max(props) / min(props) if props else 1.0
+    return Analysis(
+        n_reactions=model.n_reactions,
+        n_species=model.n_species,
+        counts=(nonzero[0], statistics.median(nonzero), nonzero[-1]),
+        rate_ratio=max(rates) / min(rates) if rates else 1.0,
+        propensity_ratio=p_ratio,
+        stiff=p_ratio > STIFF_RATIO,
+    )
+
+
+def _timed(model: Model, engine: str, init: Dict[str, int], seeds: Sequence[int], horizon: float,
+           cap: int, stop: StopFn | None) -> tuple:
+    sim = Simulator(model, engine=engine)
+    finals = []
+    events, hit_cap = 0, False
+    t0 = time.perf_counter()
+    for s in seeds:
+        sim.seed(s)
+        res = sim.run(init, t_end=horizon, max_steps=cap, stop=stop)
+        finals.append(res.counts)
+        events += res.steps
+        hit_cap |= res.reason == REACHED_MAX_STEPS
+    return (time.perf_counter() - t0) / len(seeds), events / len(seeds), finals, hit_cap
+
+
+def _mean_error(ref: List[Dict[str, float]], other: List[Dict[str, float]], accuracy: float) -> tuple:
+    """
+    (worst relative error of a species mean, within accuracy) of other's
+    final states against ref's, over the species whose ref mean is at least
+    LEAP_MIN_COUNT; (nan, False) when there are none. Runs are paired by
+    seed; a single run (ode) is compared with every ref run. A species
+    fails only when its error exceeds accuracy by more than two standard
+    errors of the paired differences.
+    """
+    worst, ok = math.nan, False
+    for sp in ref[0]:
+        r = [c[sp] for c in ref]
+        scale = abs(statistics.fmean(r))
+        if scale < LEAP_MIN_COUNT:
+            continue
+        d = [o[sp] - c for o, c in zip(other * len(ref) if len(other) == 1 else other, r)]
+        err = abs(statistics.fmean(d))
+        se = statistics.stdev(d) / math.sqrt(len(d)) if len(d) > 1 else 0.0
+        if math.isnan(worst):
+            worst, ok = 0.0, True
+        worst = max(worst, err / scale)
+        ok &= err - 2 * se <= accuracy * scale
+    return worst, ok
+
+
+def choose_engine(
+    model: Model,
+    init: Dict[str, int],
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    accuracy: float = ACCURACY,
+    candidates: Sequence[str] = ("direct", "nrm", "tau-leap", "ode"),
+    pilot_steps: int = PILOT_STEPS,
+    pilot_runs: int = PILOT_RUNS,
+    seed: int = 0,
+) -> Choice:
+    """
+    Pick the fastest engine in candidates that is accurate for this model
+    and initial state; ValueError when none of them passes the pilots.
+    """
+    unknown = [e for e in candidates if e not in ENGINES]
+    if unknown:
+        raise ValueError(f"Unknown engines {unknown}; choose from {sorted(ENGINES)}")
+    start = time.perf_counter()
+    info = analyze(model, init)
+    seeds = range(seed, seed + pilot_runs)
+
+    probe = Simulator(model, engine="direct")
+    reached = []
+    for s in seeds:
+        probe.seed(s)
+        reached.append(probe.run(init, t_end=t_end, max_steps=min(pilot_steps, max_steps), stop=stop).t)
+    horizon = min(statistics.median(reached), t_end)
+    cap = min(CAP_FACTOR * pilot_steps, max_steps)
+
+    pilots, ref = [], None
+    for engine in ["direct"] + [e for e in candidates if e != "direct"]:
+        p = Pilot(engine)
+        pilots.append(p)
+        if engine not in EXACT and info.counts[2] < LEAP_MIN_COUNT:
+            p.note = "skipped: copy numbers too small"
+            continue
+        if engine == "tau-leap" and info.stiff:
+            p.note = "skipped: stiff"
+            continue
+        if horizon <= 0.0:
+            p.note = "skipped: the run stops at t = 0"
+            continue
+        if engine == "ode" and not math.isfinite(horizon):
+            p.note = "skipped: needs a finite horizon"
+            continue
+        if engine not in EXACT and ref is None:
+            p.note = "skipped: no direct runs to compare with"
+            continue
+        try:
+            p.seconds, p.events, finals, hit_cap = _timed(model, engine, init, seeds[:1] if engine == "ode" else seeds,
+                                                       horizon, cap, stop)
+        except (RuntimeError, ValueError, FloatingPointError) as e:
+            p.note = f"failed: {e}"
+            continue
+        if engine == "direct":
+            ref = finals
+        if hit_cap and cap < max_steps:  # at max_steps itself the real runs stop there too
+            p.note = f"over {cap} events to the horizon"
+            continue
+        if engine in EXACT:
+            p.ok = True
+        else:
+            p.error, p.ok = _mean_error(ref, finals, accuracy)
+            if math.isnan(p.error):
+                p.note = f"no species mean reaches {LEAP_MIN_COUNT} to judge it by"
+
+    fine = [p for p in pilots if p.ok and p.engine in candidates]
+    if not fine and horizon <= 0.0:  # nothing to time: any exact candidate will do
+        fine = [p for p in pilots if p.engine in EXACT and p.engine in candidates][:1]
+    if not fine:
+        raise ValueError(f"No engine in {list(candidates)} passed the pilot runs: "
+                         + "; ".join(f"{p.engine} {p.note or 'rejected'}" for p in pilots if p.engine in candidates))
+    direct = next((p for p in fine if p.engine == "direct"), None)
+    if direct is not None:  # exact vs exact: keep direct unless nrm is clearly faster
+        for p in fine:
+            if p.engine == "nrm" and p.seconds * SPEEDUP > direct.seconds:
+                p.note = f"not {SPEEDUP:g}x faster than direct"
+        fine = [p for p in fine if p.engine != "nrm" or p.seconds * SPEEDUP <= direct.seconds]
+    exact = min((p.seconds for p in fine if p.engine in EXACT), default=math.inf)
+    for p in fine:
+        if p.engine not in EXACT and p.seconds * SPEEDUP > exact:
+            p.note = f"not {SPEEDUP:g}x faster than the exact engines"
+    fine = [p for p in fine if p.engine in EXACT or p.seconds * SPEEDUP <= exact]
+    best = min(fine, key=lambda p: (p.seconds, EXACT.index(p.engine) if p.engine in EXACT else len(EXACT)))
+    return Choice(best.engine, horizon, info, pilots, time.perf_counter() - start)
+
+
+def resolve_engine(
+    engine: str,
+    model: Model,
+    init: Dict[str, int],
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    log=print,
+    **kw,
+) -> str:
+    """engine itself, or for "auto" the choose_engine() pick (its report goes to log)."""
+    if engine != AUTO:
+        return engine
+    choice = choose_engine(model, init, t_end, max_steps, stop, **kw)
+    if log is not None:
+        for line in choice.lines():
+            log(f"ENGINE=auto: {line}")
+    return choice.engine
+
+
+def main(argv=None) -> int:
+    from .workloads import experiment
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workload", required=True, choices=("lambda", "log_multiply", "fibonacci"))
+    ap.add_argument("--accuracy", type=float, default=ACCURACY)
+    ap.add_argument("--pilot-steps", type=int, default=PILOT_STEPS)
+    ap.add_argument("--pilot-runs", type=int, default=PILOT_RUNS)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    ex = experiment(args.workload)
+    choice = choose_engine(ex.model, ex.init, ex.t_end, ex.max_steps, ex.stop, accuracy=args.accuracy,
+                           pilot_steps=args.pilot_steps, pilot_runs=args.pilot_runs, seed=args.seed)
+    for line in choice.lines():
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""
+Benchmarks for the CRN simulators.
+
+    python -m crnsim.bench                          # run and print
+    python -m crnsim.bench --save baseline.json     # also write a JSON baseline
+    python -m crnsim.bench --compare baseline.json  # exit 1 on a regression
+
+Reports, per workload in crnsim.workloads: events/sec, trials/sec and the
+peak RSS of a fresh process running it. Also reports events/sec versus
+reaction count (synthetic A_0 -> A_1 -> ... chain, per engine) and
+trials/sec versus worker processes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from .model import Model
+from .simulator import Simulator
+from .workloads import WORKLOADS, run_trial
+
+DEFAULT_TRIALS = 3
+DEFAULT_MAX_STEPS = 200_000       # per trial, keeps every workload to a few seconds
+SCALING_REACTIONS = (10, 100, 1000)
+SCALING_ENGINES = ("direct", "nrm")
+SCALING_EVENTS = 20_000
+TOLERANCE = 0.20                  # allowed fractional drop in throughput before flagging
+
+
+def _bench_workload(name: str, trials: int, max_steps: int, engine: str | None) -> Dict[str, float]:
+    # Runs inside a fresh child process so ru_maxrss is this workload's peak
+    events = 0
+    t0 = time.perf_counter()
+    for i in range(trials):
+        events += run_trial(name, seed=i, max_steps=max_steps, engine=engine)
+    elapsed = time.perf_counter() - t0
+    return {
+        "trials": trials,
+        "events": events,
+        "seconds": elapsed,
+        "events_per_sec": events / elapsed,
+        "trials_per_sec": trials / elapsed,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0,  # KiB on Linux
+    }
+
+
+def bench_workloads(names: List[str], trials: int, max_steps: int, engine: str | None) -> Dict[str, dict]:
+    out = {}
+    for name in names:
+        with mp.get_context("spawn").Pool(1, maxtasksperchild=1) as pool:
+            out[name] = pool.apply(_bench_workload, (name, trials, max_steps, engine))
+    return out
+
+
+def chain_model(n_reactions: int) -> Model:
+    """A_0 -> A_1 -> ... -> A_{n-1} -> A_0 (n reactions): a ring, so it never runs out of events."""
+    n = n_reactions
+    return Model([({f"A{i}": 1}, {f"A{(i + 1) % n}": 1}, 1.0) for i in range(n)])
+
+
+def bench_reaction_scaling(sizes=SCALING_REACTIONS, engines=SCALING_ENGINES,
+                           events: int = SCALING_EVENTS) -> Dict[str, Dict[str, float]]:
+    out: Dict[str, Dict[str, float]] = {}
+    for engine in engines:
+        out[engine] = {}
+        for n in sizes:
+            model = chain_model(n)
+            sim = Simulator(model, engine=engine, seed=0)
+            t0 = time.perf_counter()
+            res = sim.run({"A0": 10 * n}, max_steps=events)
+            out[engine][str(n)] = res.steps / (time.perf_counter() - t0)
+    return out
+
+
+def bench_core_scaling(name: str, trials: int, max_steps: int, engine: str | None,
+                       max_workers: int | None = None) -> Dict[str, float]:
+    max_workers = max_workers or os.cpu_count() or 1
+    counts = sorted({1, max_workers} | {w for w in (2, 4, 8, 16, 32, 64) if w < max_workers})
+    out = {}
+    for workers in counts:
+        args = [(name, seed, max_steps, engine) for seed in range(trials * workers)]
+        with mp.get_context("spawn").Pool(workers) as pool:
+            pool.starmap(run_trial, args[:workers])  # warm up imports in every worker
+            t0 = time.perf_counter()
+            pool.starmap(run_trial, args)
+            out[str(workers)] = len(args) / (time.perf_counter() - t0)
+    return out
+
+
+def compare(current: dict, baseline: dict, tolerance: float = TOLERANCE) -> List[str]:
+    """Regressions of current against baseline (throughput drops beyond tolerance)."""
+    problems = []
+    for name, cur in current.get("workloads", {}).items():
+        base = baseline.get("workloads", {}).get(name)
+        if base is None:
+            continue
+        for key in ("events_per_sec", "trials_per_sec"):
+            if cur[key] < (1.0 - tolerance) * base[key]:
+                problems.append(f"{name}: {key} {cur[key]:.1f} < baseline {base[key]:.1f}")
+    for engine, sizes in current.get("reaction_scaling", {}).items():
+        for n, eps in sizes.items():
+            base = baseline.get("reaction_scaling", {}).get(engine, {}).get(n)
+            if base is not None and eps < (1.0 - tolerance) * base:
+                problems.append(f"{engine} M={n}: events_per_sec {eps:.1f} < baseline {base:.1f}")
+    return problems
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workloads", nargs="+", default=sorted(WORKLOADS), choices=sorted(WORKLOADS))
+    ap.add_argument("--trials", type=int, default=DEFAULT_TRIALS)
+    ap.add_argument("--max-steps", type=int, default=DEFAULT_MAX_STEPS)
+    ap.add_argument("--engine", default=None, help="override every script's ENGINE")
+    ap.add_argument("--cores", type=int, default=None, help="largest worker count for core scaling")
+    ap.add_argument("--core-workload", default="log_multiply", choices=sorted(WORKLOADS))
+    ap.add_argument("--skip-scaling", action="store_true")
+    ap.add_argument("--save", type=Path, help="write results as a JSON baseline")
+    ap.add_argument("--compare", type=Path, help="JSON baseline to check against")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = ap.parse_args(argv)
+
+    results = {
+        "python": sys.version.split()[0],
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "trials": args.trials,
+        "max_steps": args.max_steps,
+        "engine": args.engine,
+        "workloads": bench_workloads(args.workloads, args.trials, args.max_steps, args.engine),
+    }
+
+    print(f"{'workload':<14} {'events/s':>12} {'trials/s':>10} {'peak RSS MB':>12}")
+    for name, r in results["workloads"].items():
+        print(f"{name:<14} {r['events_per_sec']:>12.0f} {r['trials_per_sec']:>10.3f} {r['peak_rss_mb']:>12.1f}")
+
+    if not args.skip_scaling:
+        results["reaction_scaling"] = bench_reaction_scaling()
+        print("\nevents/s vs reaction count")
+        for engine, sizes in results["reaction_scaling"].items():
+            print(f"  {engine:<8} " + "  ".join(f"M={n}: {eps:.0f}" for n, eps in sizes.items()))
+
+        results["core_scaling"] = bench_core_scaling(args.core_workload, args.trials, args.max_steps,
+                                                     args.engine, args.cores)
+        print(f"\ntrials/s vs worker processes ({args.core_workload})")
+        print("  " + "  ".join(f"{w}: {tps:.3f}" for w, tps in results["core_scaling"].items()))
+
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2) + "\n")
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        problems = compare(results, json.loads(args.compare.read_text()), args.tolerance)
+        if problems:
+            print("\nRegressions:")
+            for p in problems:
+                print("  " + p)
+            return 1
+        print(f"\nNo regressions against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
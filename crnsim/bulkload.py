@@ -0,0 +1,299 @@
+"""
+Chunked, parallel loading of very large "reactants : products : rate" files.
+
+load_reactions() builds two dicts per reaction, and Model() then walks them
+again to number the species. Generated networks can have 10^5 - 10^6
+reactions, and that is slow and memory-hungry. Here the file is
+memory-mapped and cut into chunks at line boundaries. Each chunk is
+tokenized (in worker processes when processes > 1) into one flat token
+list, converted to integer arrays with numpy, and its species are
+interned to chunk-local ids. The chunks are
+then stitched together in file order with one id remap per chunk:
+
+    net = load_compiled("big_r.txt", processes=8)
+    model = net.model(species=list(init))   # same Model as Model(load_reactions(...))
+
+The arrays use CSR layout: reaction j's reactants are
+r_idx[r_ptr[j]:r_ptr[j+1]] with counts r_cnt[...], and likewise for
+products. The file format and error messages follow load_reactions():
+blank and "#" lines are skipped, and a species repeated on one side has
+its counts summed. Zero counts are dropped as Model() drops them. Counts
+are stored as int32, so a count above COUNT_MAX is an error here (at its
+path:line) although load_reactions() would keep it.
+
+    python -m crnsim.bulkload big_r.txt --processes 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import mmap
+import multiprocessing as mp
+import sys
+import time
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .model import Model, parse_stoich
+
+CHUNK_BYTES = 8 * 2**20
+COUNT_MAX = int(np.iinfo(np.int32).max)  # counts are stored as int32
+
+
+@dataclass
+class CompiledReactions:
+    """A reaction file in index form; species[i] is the name of id i."""
+    species: List[str]
+    rates: np.ndarray   # float64, one per reaction
+    r_ptr: np.ndarray   # int64, n_reactions + 1
+    r_idx: np.ndarray   # int32 species ids
+    r_cnt: np.ndarray   # int32 counts > 0
+    p_ptr: np.ndarray
+    p_idx: np.ndarray
+    p_cnt: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rates)
+
+    def side(self, j: int, products: bool = False) -> Tuple[Tuple[int, int], ...]:
+        """((species_id, count), ...) of reaction j's reactants (or products)."""
+        ptr, idx, cnt = (self.p_ptr, self.p_idx, self.p_cnt) if products else (self.r_ptr, self.r_idx, self.r_cnt)
+        a, b = ptr[j], ptr[j + 1]
+        return tuple(zip(idx[a:b].tolist(), cnt[a:b].tolist()))
+
+    def model(self, species: Sequence[str] | None = None, names: Sequence[str] | None = None) -> Model:
+        """
+        Model with species listed first (in that order), then the file's
+        species in order of first appearance, as Model(load_reactions(path), species).
+        """
+        order = list(dict.fromkeys(species or []))
+        seen = set(order)
+        order += [sp for sp in self.species if sp not in seen]
+        pos = {sp: i for i, sp in enumerate(order)}
+        remap = np.array([pos[sp] for sp in self.species], dtype=np.int64)
+        return Model.from_arrays(order, _sides(self.r_ptr, remap[self.r_idx], self.r_cnt),
+                                 _sides(self.p_ptr, remap[self.p_idx], self.p_cnt),
+                                 self.rates.tolist(), names=names)
+
+
+def _sides(ptr: np.ndarray, idx: np.ndarray, cnt: np.ndarray) -> List[Tuple[Tuple[int, int], ...]]:
+    pairs = list(zip(idx.tolist(), cnt.tolist()))
+    bounds = ptr.tolist()
+    return [tuple(pairs[a:b]) for a, b in zip(bounds, bounds[1:])]
+
+
+def _boundaries(mm, size: int, chunk_bytes: int) -> List[Tuple[int, int]]:
+    cuts = [0]
+    while cuts[-1] < size:
+        nl = mm.find(b"\n", min(cuts[-1] + chunk_bytes, size) - 1)
+        cuts.append(size if nl < 0 else nl + 1)
+    return list(zip(cuts, cuts[1:]))
+
+
+def _parse_text(data: bytes) -> tuple:
+    """
+    load_reactions()'s line-by-line parse of a chunk, for chunks the byte
+    tokenizer rejects (bad lines, but also Unicode whitespace that bytes.split()
+    does not split on).
+
+    returns: ((names, counts, pairs, rates), None), or (None, (line, message))
+    for the first bad line
+    """
+    names: List[bytes] = []
+    counts: List[int] = []
+    pairs = array("i")
+    rates: List[float] = []
+    for lineno, raw in enumerate(data.decode("utf-8", errors="replace").split("\n"), 1):
+        line = raw.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = [p.strip() for p in line.split(":")]
+        if len(parts) != 3:
+            return None, (lineno, f"Bad reaction line (need 2 colons): {line}")
+        try:
+            sides = parse_stoich(parts[0]), parse_stoich(parts[1])
+            rate = float(parts[2])
+        except ValueError as e:
+            return None, (lineno, str(e))
+        if not rate >= 0.0:  # also rejects nan
+            return None, (lineno, f"Bad rate {parts[2]!r}")
+        for d in sides:
+            for sp, m in d.items():
+                if m > COUNT_MAX:
+                    return None, (lineno, f"Count {m} for {sp!r} is above {COUNT_MAX}")
+            names += [sp.encode() for sp in d]
+            counts += d.values()
+            pairs.append(len(d))
+        rates.append(rate)
+    return (names, np.array(counts, dtype=np.int64), pairs, np.array(rates, dtype=np.float64)), None
+
+
+def _tokenize(data: bytes) -> tuple | None:
+    """
+    Fast path of _parse_chunk(): (names, counts, pairs, rates), or None when
+    some line does not split or convert cleanly (_parse_text() then decides).
+
+    names and counts alternate over every reaction's reactant then product
+    pairs; pairs holds the number of pairs of each side in the same order.
+    """
+    toks: List[bytes] = []   # reactant then product tokens of every reaction, in file order
+    pairs = array("i")       # (name, count) pairs per side: reactants, products, reactants, ...
+    rate_toks: List[bytes] = []
+    for raw in data.split(b"\n"):
+        line = raw.strip()
+        if not line or line.startswith(b"#"):
+            continue
+        parts = line.split(b":")
+        r, p = parts[0].split(), parts[1].split() if len(parts) > 1 else ()
+        if len(parts) != 3 or len(r) % 2 or len(p) % 2:
+            return None
+        toks += r
+        toks += p
+        pairs.append(len(r) >> 1)
+        pairs.append(len(p) >> 1)
+        rate_toks.append(parts[2])
+
+    try:
+        cnt = np.array(toks[1::2]).astype(np.int64) if toks else np.zeros(0, np.int64)
+        rates = np.array(rate_toks).astype(np.float64) if rate_toks else np.zeros(0)
+    except (ValueError, OverflowError):
+        return None
+    if np.any(cnt < 0) or not np.all(rates >= 0.0):  # also rejects nan
+        return None
+    return toks[0::2], cnt, pairs, rates
+
+
+def _repeats(side: np.ndarray, sid: np.ndarray, longest: int) -> bool:
+    """True when some side names a species twice; sides are short, so compare pairs up to longest - 1 apart."""
+    for d in range(1, longest):
+        if np.any((side[d:] == side[:-d]) & (sid[d:] == sid[:-d])):
+            return True
+    return False
+
+
+def _parse_chunk(path: str, start: int, end: int) -> tuple:
+    """
+    Tokenize bytes start..end of path (whole lines).
+
+    The only per-line work is splitting into tokens; counts and rates are
+    converted, checked and grouped with whole-array numpy operations.
+
+    returns: (names, arrays, lines, error); names are the chunk's species in
+    order of first appearance (local id = position), arrays are (rates,
+    r_len, r_idx, r_cnt, p_len, p_idx, p_cnt), error is None or (line within
+    the chunk, message)
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[start:end]
+    lines = data.count(b"\n") + (0 if data.endswith(b"\n") else 1)
+
+    parsed = _tokenize(data)
+    if parsed is None:
+        parsed, error = _parse_text(data)
+        if error is not None:
+            return [], (), lines, error
+    names, cnt, pairs, rates = parsed
+
+    ids = dict(zip(dict.fromkeys(names), itertools.count()))  # ids in order of first appearance
+    sid = np.fromiter(map(ids.__getitem__, names), dtype=np.int64, count=len(names))
+    side = np.repeat(np.arange(len(pairs), dtype=np.int64), np.frombuffer(pairs, dtype=np.int32))
+    if np.any(cnt == 0) or _repeats(side, sid, int(max(pairs, default=0))):
+        # A species repeated on one side has its counts summed (kept at its first place); zero counts go
+        key = side * max(len(ids), 1) + sid
+        uniq, first, inv = np.unique(key, return_index=True, return_inverse=True)
+        total = np.bincount(inv, weights=cnt).astype(np.int64)
+        order = np.argsort(first, kind="stable")
+        keep = order[total[order] > 0]
+        side, sid, cnt = side[first[keep]], sid[first[keep]], total[keep]
+    if np.any(cnt > COUNT_MAX):  # the arrays hold int32 counts
+        return [], (), lines, _parse_text(data)[1]
+
+    n = len(rates)
+    is_p = (side & 1).astype(bool)
+    rxn = side >> 1
+    arrays = (rates,
+              np.bincount(rxn[~is_p], minlength=n), sid[~is_p].astype(np.int32), cnt[~is_p].astype(np.int32),
+              np.bincount(rxn[is_p], minlength=n), sid[is_p].astype(np.int32), cnt[is_p].astype(np.int32))
+    names = [name.decode("utf-8", errors="replace") for name in ids]
+    return names, arrays, lines, None
+
+
+def _ptr(lengths: np.ndarray) -> np.ndarray:
+    ptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=ptr[1:])
+    return ptr
+
+
+def load_compiled(
+    path: Path,
+    processes: int | None = 1,
+    chunk_bytes: int = CHUNK_BYTES,
+) -> CompiledReactions:
+    """
+    Parse a reaction file into CompiledReactions.
+
+    processes   : worker processes for the chunks; None uses every core
+    chunk_bytes : approximate chunk size (chunks end at a newline)
+    """
+    path = Path(path)
+    size = path.stat().st_size
+    if size == 0:
+        raise ValueError(f"No reactions loaded from {path}")
+    with path.open("rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        tasks = [(str(path), a, b) for a, b in _boundaries(mm, size, chunk_bytes)]
+    if processes == 1 or len(tasks) == 1:
+        parts = [_parse_chunk(*t) for t in tasks]
+    else:
+        with mp.Pool(processes) as pool:
+            parts = pool.starmap(_parse_chunk, tasks, chunksize=1)
+
+    # Intern chunk-local ids in file order, so ids follow first appearance in the whole file
+    ids: Dict[str, int] = {}
+    lines = 0
+    cols: List[List[np.ndarray]] = [[] for _ in range(7)]
+    for names, arrays, n_lines, error in parts:
+        if error is not None:
+            raise ValueError(f"{path}:{lines + error[0]}: {error[1]}")
+        lines += n_lines
+        ids.update(zip([sp for sp in names if sp not in ids], itertools.count(len(ids))))
+        remap = np.fromiter(map(ids.__getitem__, names), dtype=np.int32, count=len(names))
+        rates, r_len, r_idx, r_cnt, p_len, p_idx, p_cnt = arrays
+        for col, a in zip(cols, (rates, r_len, remap[r_idx], r_cnt, p_len, remap[p_idx], p_cnt)):
+            col.append(a)
+    rates, r_len, r_idx, r_cnt, p_len, p_idx, p_cnt = (np.concatenate(c) for c in cols)
+    if len(rates) == 0:
+        raise ValueError(f"No reactions loaded from {path}")
+    return CompiledReactions(
+        species=list(ids),
+        rates=rates.astype(np.float64, copy=False),
+        r_ptr=_ptr(r_len), r_idx=r_idx.astype(np.int32, copy=False), r_cnt=r_cnt.astype(np.int32, copy=False),
+        p_ptr=_ptr(p_len), p_idx=p_idx.astype(np.int32, copy=False), p_cnt=p_cnt.astype(np.int32, copy=False),
+    )
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("reactions", type=Path)
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 2**20)
+    ap.add_argument("--model", action="store_true", help="also compile a Model and time it")
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    net = load_compiled(args.reactions, args.processes, int(args.chunk_mb * 2**20))
+    t1 = time.perf_counter()
+    size = args.reactions.stat().st_size
+    print(f"{len(net)} reactions, {len(net.species)} species from {size / 2**20:.1f} MiB in {t1 - t0:.2f} s")
+    if args.model:
+        model = net.model()
+        print(f"Model with {len(model.reactions)} reactions compiled in {time.perf_counter() - t1:.2f} s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+"""
+Persistent cache of single-trajectory results.
+
+A run is identified by a hash of everything its result depends on:
+  - the compiled model (species, reactants, products, resolved rates)
+  - the engine (name, code, options) and the random pool's block size
+  - initial counts, seed, t_end and max_steps
+  - the stop callback: its code, and the module-level constants and
+    helper functions it reads (so changing STEALTH_THRESHOLD is a miss)
+Results live in one SQLite file, so worker processes can share it. When
+the file grows past max_bytes, least-recently-used results are evicted.
+
+    cache = ResultCache("runs.sqlite")
+    res = cache.run(sim, init, seed, t_end=T_END, max_steps=MAX_STEPS, stop=done_state)
+    print(cache.hits, cache.misses)
+
+The key covers the seed, so a cached result is only reused for runs seeded
+per trial (sim.seed(seed) before each run). Runs that share one pool
+across trials cannot be cached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import pickle
+import sqlite3
+import sys
+import time
+import types
+from pathlib import Path
+from typing import Dict
+
+from .engines import StopFn
+from .profile import Profile
+from .simulator import Result, Simulator
+
+MAX_BYTES = 256 * 2**20
+PLAIN = (int, float, str, bool, bytes, type(None))
+
+
+def _plain(v) -> bool:
+    if isinstance(v, PLAIN):
+        return True
+    if isinstance(v, (tuple, frozenset)):
+        return all(_plain(u) for u in v)
+    return False
+
+
+def _code_parts(code: types.CodeType, out: list) -> None:
+    out.append(code.co_code)
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):  # nested functions and comprehensions
+            _code_parts(c, out)
+        else:
+            out.append(repr(c))
+
+
+def _names(code: types.CodeType) -> set:
+    names = set(code.co_names)
+    for c in code.co_consts:
+        if isinstance(c, types.CodeType):
+            names |= _names(c)
+    return names
+
+
+def callable_fingerprint(fn, _seen: set | None = None) -> list:
+    """
+    Code of fn plus the plain module-level values (numbers, strings, tuples)
+    and functions it reads, recursively. Other globals are keyed by name only.
+    """
+    seen = _seen if _seen is not None else set()
+    if fn is None:
+        return [None]
+    fn = getattr(fn, "__func__", fn)
+    if not isinstance(fn, types.FunctionType):
+        return [getattr(fn, "__module__", None), getattr(fn, "__qualname__", repr(fn))]
+    if id(fn) in seen:
+        return [fn.__qualname__]
+    seen.add(id(fn))
+
+    out = [fn.__module__, fn.__qualname__, repr(fn.__defaults__)]
+    _code_parts(fn.__code__, out)
+    for cell in fn.__closure__ or ():
+        v = cell.cell_contents
+        out.extend(callable_fingerprint(v, seen) if callable(v) else [repr(v) if _plain(v) else type(v).__name__])
+    for name in sorted(_names(fn.__code__)):
+        if name not in fn.__globals__:
+            continue
+        v = fn.__globals__[name]
+        if _plain(v):
+            out.append((name, repr(v)))
+        elif isinstance(v, types.FunctionType):
+            out.extend(callable_fingerprint(v, seen))
+    return out
+
+
+def run_key(
+    sim: Simulator,
+    init: Dict[str, int],
+    seed: int,
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+) -> str:
+    """Hex digest identifying one seeded run of sim."""
+    m = sim.model
+    parts = [
+        type(m).__name__,
+        tuple(m.species),
+        tuple(map(tuple, m.reactants)),
+        tuple(map(tuple, m.products)),
+        tuple(float(r) for r in m.rates),
+        sim.engine_name,
+        callable_fingerprint(sim.engine),
+        tuple(sorted((k, repr(v)) for k, v in sim.engine_opts.items())),
+        sim.pool.block_size,
+        tuple(sorted((sp, int(n)) for sp, n in init.items())),
+        seed,
+        repr(float(t_end)),
+        int(max_steps),
+        callable_fingerprint(stop),
+    ]
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(repr(p).encode())
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk store of Result objects keyed by run_key().
+
+    path      : SQLite file, created if missing
+    max_bytes : total size of stored results before LRU eviction
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._db = sqlite3.connect(self.path, timeout=60.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self._db.commit()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __getstate__(self):  # reopened by each worker process
+        return self.path, self.max_bytes
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def get(self, key: str) -> Result | None:
+        row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self._db:
+            self._db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+        return pickle.loads(row[0])
+
+    def put(self, key: str, result: Result) -> None:
+        blob = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._db:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                             (key, blob, len(blob), time.time()))
+            self._evict()
+
+    def _evict(self) -> None:
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        drop = []
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY used"):
+            if total <= self.max_bytes:
+                break
+            drop.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM results WHERE key = ?", drop)
+
+    def run(
+        self,
+        sim: Simulator,
+        init: Dict[str, int],
+        seed: int,
+        t_end: float = math.inf,
+        max_steps: int = sys.maxsize,
+        stop: StopFn | None = None,
+        profile: Profile | None = None,
+    ) -> Result:
+        """
+        sim.run() seeded with seed, served from the cache when this exact run
+        was done before. A profile only sees the runs that are simulated.
+        """
+        key = run_key(sim, init, seed, t_end, max_steps, stop)
+        res = self.get(key)
+        if res is None:
+            sim.seed(seed)
+            res = sim.run(init, t_end=t_end, max_steps=max_steps, stop=stop, profile=profile)
+            self.put(key, res)
+        return res
+
+    def stats(self) -> Dict[str, int]:
+        n, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results").fetchone()
+        return {"entries": n, "bytes": size, "hits": self.hits, "misses": self.misses}
+
+    def clear(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM results")
@@ -0,0 +1,134 @@
+"""
+Checkpoint and resume for long batches of direct-method trials.
+
+run_trials() runs each trajectory in chunks of at most chunk_steps events.
+The direct engine continues a chunk exactly where the last one stopped, so
+chunking does not change any result. Between chunks, at most every
+every_seconds, the whole batch is written to one binary file:
+  - the next trial number and the Aggregate of the finished trials
+  - the trajectory in flight: counts vector, time, step count
+  - the random pool (generator state + buffer position, not the buffer)
+Rerunning the same call with the file present resumes from it and gives
+bit-identical results. The file is written atomically (temp file +
+rename), so a kill mid-write leaves the previous checkpoint intact. It is
+deleted when the batch finishes.
+"""
+
+from __future__ import annotations
+
+import math
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from .engines import REACHED_MAX_STEPS, StopFn
+from .simulator import Result, Simulator
+from .stats import Aggregate
+
+MAGIC = b"CRNCKPT1"
+CHUNK_STEPS = 200_000
+EVERY_SECONDS = 60.0
+
+
+def _fingerprint(sim: Simulator, init, trials, base_seed, t_end, max_steps) -> tuple:
+    # Everything the results depend on; a checkpoint from another setup is refused
+    m = sim.model
+    return (tuple(m.species), tuple(m.rates), tuple(map(tuple, m.delta)), tuple(sorted(init.items())),
+            trials, base_seed, t_end, max_steps, sim.engine_name, sim.pool.block_size)
+
+
+def save(path: Path, state: dict) -> None:
+    """Write state atomically."""
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load(path: Path) -> dict:
+    with Path(path).open("rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a crnsim checkpoint")
+        return pickle.load(f)
+
+
+def run_trials(
+    sim: Simulator,
+    init: Dict[str, int],
+    trials: int,
+    base_seed: int,
+    path: Path,
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    aggregate: Aggregate | None = None,
+    on_result: Callable[[int, Result], None] | None = None,
+    chunk_steps: int = CHUNK_STEPS,
+    every_seconds: float = EVERY_SECONDS,
+) -> Aggregate:
+    """
+    Run trials trajectories (trial i seeded with base_seed + i) with checkpoints at path.
+
+    aggregate collects the finished trials (a fresh Aggregate by default; on
+    resume the saved one replaces it). on_result(i, result) is called once per
+    trial as it finishes; trials finished before a restart are not replayed.
+    stop is not saved: pass the same one again when resuming.
+    """
+    if sim.engine_name != "direct":
+        raise ValueError(f"Checkpointing needs the direct engine, not {sim.engine_name!r}")
+    if chunk_steps < 1:
+        raise ValueError("chunk_steps must be >= 1")
+    path = Path(path)
+    model = sim.model
+    key = _fingerprint(sim, init, trials, base_seed, t_end, max_steps)
+
+    agg = aggregate if aggregate is not None else Aggregate()
+    start, flight = 0, None
+    if path.exists():
+        state = load(path)
+        if state["key"] != key:
+            raise ValueError(f"{path} was written for a different model or settings; delete it to start over")
+        start, agg, flight = state["next"], state["aggregate"], state["flight"]
+
+    last_save = time.monotonic()
+
+    def checkpoint(nxt, flight):
+        nonlocal last_save
+        save(path, {"key": key, "next": nxt, "aggregate": agg, "flight": flight})
+        last_save = time.monotonic()
+
+    for i in range(start, trials):
+        if flight is not None:
+            x, t, steps = list(flight["x"]), flight["t"], flight["steps"]
+            sim.pool.set_state(flight["pool"])
+            flight = None
+        else:
+            sim.seed(base_seed + i)
+            x, t, steps = model.state(init), 0.0, 0
+
+        while True:
+            n = min(chunk_steps, max_steps - steps)
+            t, fired, reason = sim.engine(model, x, sim.pool, t=t, t_end=t_end, max_steps=n,
+                                          stop=stop, **sim.engine_opts)
+            steps += fired
+            if reason != REACHED_MAX_STEPS or steps >= max_steps:
+                break
+            if time.monotonic() - last_save >= every_seconds:
+                checkpoint(i, {"x": x, "t": t, "steps": steps, "pool": sim.pool.get_state()})
+
+        res = Result(model.counts(x), t, steps, reason)
+        agg.add(res.counts, res.reason)
+        if on_result is not None:
+            on_result(i, res)
+        if time.monotonic() - last_save >= every_seconds:
+            checkpoint(i + 1, None)
+
+    path.unlink(missing_ok=True)
+    return agg
@@ -0,0 +1,408 @@
+"""
+Trial batches spread over several machines: one coordinator, any number of workers.
+
+The coordinator splits a job (a workload, points and trials per point)
+into chunks of consecutive trials. Trial i of every point is seeded with
+base_seed + i, exactly as in crnsim.sweep (or from a per-point base
+seed, as EE5393_HW1_P2.py seeds its MOI values), so the results do not depend
+on which worker ran what. Workers connect over TCP
+(multiprocessing.connection, authenticated with a shared key). Each one
+takes a chunk, runs it and sends back one partial Aggregate. The
+coordinator merges the partial aggregates per point in chunk order, so
+the result is the same however the chunks were spread.
+
+Worker loss: a worker that disconnects, or sends no result or heartbeat
+for lease seconds, is dropped and its chunk goes back in the queue.
+Results for a chunk that is already done are ignored. Before a worker
+gets any chunk, it checks that its own copy of the workload (model,
+rates, limits, stop rule) hashes the same as the coordinator's.
+
+    # coordinator (e.g. from EE5393_HW1_P2.py with CLUSTER_PORT set)
+    aggs = Coordinator(spec, ("0.0.0.0", 5393)).run()
+    # on every node, one process per core
+    python -m crnsim.cluster worker --connect head-node:5393 --processes 16
+    # everything on localhost, as a stand-in for a cluster
+    python -m crnsim.cluster run --workload lambda --grid MOI=1,2,3 --trials 50 --local-workers 4
+
+Messages are pickles, so whoever holds the key can run code on the other
+end. The key comes from the CRNSIM_CLUSTER_KEY environment variable, and
+there is no default. Workers, and a coordinator listening on anything
+but loopback, refuse to start without it. A loopback coordinator (the
+default --bind 127.0.0.1) without the variable makes a random key and
+hands it to its --local-workers only.
+"""
+
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import multiprocessing as mp
+import os
+import queue
+import secrets
+import socket
+import sys
+import threading
+import time
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Callable, Dict, List, Tuple
+
+from .cache import run_key
+from .simulator import Simulator
+from .stats import Aggregate
+from .sweep import _parse_axis, apply_point, grid
+
+PORT = 5393
+KEY_ENV = "CRNSIM_CLUSTER_KEY"
+CHUNK_TRIALS = 10
+LEASE = 20.0  # seconds of silence after which a worker counts as lost; busy workers say "alive" every LEASE / 4
+WORKLOADS = ("lambda", "log_multiply", "fibonacci")
+
+
+def _loopback(host: str) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+def authkey(host: str | None = None) -> bytes:
+    """
+    The shared key from CRNSIM_CLUSTER_KEY. Without it, a coordinator
+    listening on a loopback host gets a random key for its local workers,
+    and everything else raises RuntimeError.
+    """
+    key = os.environ.get(KEY_ENV, "")
+    if key:
+        return key.encode()
+    if host is not None and _loopback(host):
+        return secrets.token_bytes(32)
+    where = f"listen on {host}" if host is not None else "connect to a coordinator"
+    raise RuntimeError(f"Set {KEY_ENV} to a shared secret to {where}: messages are pickles, "
+                       f"so anyone with the key can run code on this host")
+
+
+def fingerprint(spec: dict) -> List[str]:
+    """run_key of trial 0 at every point: equal on two hosts only if they would simulate the same runs."""
+    from .workloads import experiment
+
+    ex = experiment(spec["workload"])
+    out = []
+    for p in spec["points"]:
+        model, init = apply_point(ex.model, ex.init, p)
+        sim = Simulator(model, engine=spec.get("engine") or ex.engine)
+        out.append(run_key(sim, init, _base_seed(spec, len(out)), *_limits(spec, ex), stop=ex.stop))
+    return out
+
+
+def _base_seed(spec: dict, k: int) -> int:
+    seeds = spec.get("point_seeds")
+    return spec["base_seed"] if seeds is None else seeds[k]
+
+
+def _limits(spec: dict, ex) -> Tuple[float, int]:
+    t_end = ex.t_end if spec.get("t_end") is None else spec["t_end"]
+    max_steps = ex.max_steps if spec.get("max_steps") is None else spec["max_steps"]
+    return t_end, max_steps
+
+
+def run_chunk(spec: dict, k: int, start: int, stop: int) -> Aggregate:
+    """Trials start..stop-1 of point k as one Aggregate over spec["species"] (all species if empty)."""
+    from .workloads import experiment
+
+    ex = experiment(spec["workload"])
+    model, init = apply_point(ex.model, ex.init, spec["points"][k])
+    sim = Simulator(model, engine=spec.get("engine") or ex.engine)
+    t_end, max_steps = _limits(spec, ex)
+    keep = spec.get("species") or list(model.species)
+    agg = Aggregate()
+    for i in range(start, stop):
+        sim.seed(_base_seed(spec, k) + i)
+        res = sim.run(init, t_end=t_end, max_steps=max_steps, stop=ex.stop)
+        agg.add({sp: res.counts[sp] for sp in keep}, res.reason)
+    return agg
+
+
+class Coordinator:
+    """
+    Hands out the chunks of one job to connecting workers and merges their results.
+
+    spec     : {"workload", "points", "trials", "base_seed"} plus optional
+               "species", "t_end", "max_steps", "engine", and "point_seeds"
+               (one base seed per point instead of base_seed for all)
+    address  : (host, port) to listen on; anything but loopback needs CRNSIM_CLUSTER_KEY
+    progress : called as progress(trials_done, trials_total) after each chunk
+    """
+
+    def __init__(
+        self,
+        spec: dict,
+        address: Tuple[str, int] = ("127.0.0.1", PORT),
+        chunk_trials: int = CHUNK_TRIALS,
+        lease: float = LEASE,
+        progress: Callable[[int, int], None] | None = None,
+        log: Callable[[str], None] | None = print,
+    ):
+        if spec.get("workload") not in WORKLOADS:
+            raise ValueError(f"workload must be one of {WORKLOADS}")
+        spec = {"points": [{}], "base_seed": 0, "species": [], **spec}
+        if int(spec["trials"]) < 1 or chunk_trials < 1:
+            raise ValueError("trials and chunk_trials must be >= 1")
+        if spec.get("point_seeds") is not None and len(spec["point_seeds"]) != len(spec["points"]):
+            raise ValueError("point_seeds needs one seed per point")
+        self.spec = spec
+        self.address = address
+        self.authkey = authkey(address[0])
+        self.lease = lease
+        self.progress = progress
+        self.log = log or (lambda msg: None)
+        self.key = fingerprint(spec)
+        trials = int(spec["trials"])
+        # Trial-major chunk order: every point makes progress from the start
+        self.chunks = [(k, a, min(a + chunk_trials, trials))
+                       for a in range(0, trials, chunk_trials) for k in range(len(spec["points"]))]
+        self.todo: queue.Queue = queue.Queue()
+        for cid in range(len(self.chunks)):
+            self.todo.put(cid)
+        self.results: Dict[int, Aggregate] = {}
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+        self.error: str | None = None
+        self.workers_seen = 0
+
+    @property
+    def trials_done(self) -> int:
+        return sum(b - a for cid, (_, a, b) in enumerate(self.chunks) if cid in self.results)
+
+    def run(self, local_workers: int = 0) -> List[Aggregate]:
+        """Serve until every chunk is done; returns one merged Aggregate per point."""
+        listener = Listener(self.address, authkey=self.authkey)
+        host, port = listener.address
+        self.log(f"coordinator on {host}:{port}: {len(self.chunks)} chunks, {self.spec['trials']} trials "
+                 f"x {len(self.spec['points'])} points")
+        accept = threading.Thread(target=self._accept, args=(listener,), daemon=True)
+        accept.start()
+        procs = [mp.Process(target=worker, args=(("127.0.0.1", port), 60.0, self.authkey), daemon=True)
+                 for _ in range(local_workers)]
+        for p in procs:
+            p.start()
+        try:
+            self.finished.wait()
+        finally:
+            try:  # wake the accept() call so its thread can see that we are done
+                Client(("127.0.0.1", port), authkey=self.authkey).close()
+            except OSError:
+                pass
+            listener.close()
+            for p in procs:
+                p.join(timeout=5)
+        if self.error:
+            raise RuntimeError(self.error)
+
+        out = [Aggregate() for _ in self.spec["points"]]
+        for cid, (k, _, _) in enumerate(self.chunks):
+            out[k].merge(self.results[cid])
+        return out
+
+    def _accept(self, listener: Listener) -> None:
+        while not self.finished.is_set():
+            try:
+                conn = listener.accept()
+            except (OSError, EOFError, mp.AuthenticationError):
+                continue
+            if self.finished.is_set():
+                conn.close()
+                return
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: Connection) -> None:
+        name, cid = "?", None
+        try:
+            if not conn.poll(self.lease):
+                return
+            _, name = conn.recv()  # ("hello", "host:pid")
+            conn.send(("spec", self.spec, self.key, self.lease / 4))
+            reply = conn.recv()
+            if reply[0] != "ready":
+                self.log(f"worker {name} refused the job: {reply[1]}")
+                return
+            with self.lock:
+                self.workers_seen += 1
+            self.log(f"worker {name} joined")
+            while not self.finished.is_set():
+                try:
+                    cid = self.todo.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if cid in self.results:
+                    cid = None
+                    continue
+                conn.send(("run", cid, *self.chunks[cid]))
+                while True:
+                    if not conn.poll(self.lease):
+                        raise TimeoutError(f"no word for {self.lease:g} s")
+                    msg = conn.recv()
+                    if msg[0] == "alive":
+                        continue
+                    if msg[0] == "error":
+                        self._fail(f"chunk {cid} failed on {name}: {msg[1]}")
+                        return
+                    self._record(msg[1], msg[2])
+                    cid = None
+                    break
+        except (EOFError, OSError, TimeoutError) as exc:
+            if cid is not None and cid not in self.results:
+                self.log(f"lost worker {name} ({type(exc).__name__}: {exc}); chunk {cid} requeued")
+                self.todo.put(cid)
+        finally:
+            try:
+                conn.send(("stop",))
+            except OSError:
+                pass
+            conn.close()
+
+    def _record(self, cid: int, agg: Aggregate) -> None:
+        with self.lock:
+            if cid in self.results:  # a requeued chunk finished twice
+                return
+            self.results[cid] = agg
+            done = self.trials_done
+            total = int(self.spec["trials"]) * len(self.spec["points"])
+            if self.progress is not None:
+                self.progress(done, total)
+            if len(self.results) == len(self.chunks):
+                self.finished.set()
+
+    def _fail(self, message: str) -> None:
+        with self.lock:
+            self.error = message
+            self.finished.set()
+
+
+def worker(address: Tuple[str, int], wait: float = 60.0, key: bytes | None = None) -> None:
+    """
+    Connect to a coordinator (retrying for wait seconds), run chunks until told to stop.
+
+    key defaults to CRNSIM_CLUSTER_KEY (RuntimeError when it is unset).
+    """
+    key = key or authkey()
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            conn = Client(address, authkey=key)
+            break
+        except (ConnectionRefusedError, OSError):
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.5)
+
+    send_lock = threading.Lock()
+
+    def send(msg):
+        with send_lock:
+            conn.send(msg)
+
+    try:
+        send(("hello", f"{socket.gethostname()}:{os.getpid()}"))
+        msg = conn.recv()
+        if msg[0] != "spec":
+            return
+        spec, key, heartbeat = msg[1:]
+        try:
+            mine = fingerprint(spec)
+        except Exception as exc:  # e.g. the workload's script is missing on this host
+            send(("refuse", repr(exc)))
+            return
+        if mine != key:
+            send(("refuse", "this host's copy of the workload differs from the coordinator's"))
+            return
+        send(("ready",))
+
+        while True:
+            msg = conn.recv()
+            if msg[0] != "run":
+                return
+            cid, k, start, stop = msg[1:]
+            busy = threading.Event()
+
+            def beat():
+                try:
+                    while not busy.wait(heartbeat):
+                        send(("alive",))
+                except OSError:  # the coordinator dropped us; the main loop notices on its next send
+                    pass
+
+            t = threading.Thread(target=beat, daemon=True)
+            t.start()
+            try:
+                agg = run_chunk(spec, k, start, stop)
+            except Exception as exc:
+                busy.set()
+                send(("error", repr(exc)))
+                return
+            busy.set()
+            t.join()
+            send(("done", cid, agg))
+    except (EOFError, OSError):
+        pass
+    finally:
+        conn.close()
+
+
+def _parse_address(text: str) -> Tuple[str, int]:
+    host, _, port = text.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    wp = sub.add_parser("worker", help="run chunks for a coordinator")
+    wp.add_argument("--connect", type=_parse_address, required=True, metavar="HOST:PORT")
+    wp.add_argument("--processes", type=int, default=1, help="worker processes on this host")
+    wp.add_argument("--wait", type=float, default=60.0, help="seconds to keep retrying the connection")
+
+    rp = sub.add_parser("run", help="coordinate a job (and optionally run local workers)")
+    rp.add_argument("--workload", required=True, choices=WORKLOADS)
+    rp.add_argument("--grid", type=_parse_axis, action="append", default=[], metavar="NAME=V1,V2,...")
+    rp.add_argument("--trials", type=int, default=10)
+    rp.add_argument("--seed", type=int, default=0, help="trial i uses seed SEED+i at every point")
+    rp.add_argument("--species", nargs="+", default=[])
+    rp.add_argument("--chunk", type=int, default=CHUNK_TRIALS, help="trials per chunk")
+    rp.add_argument("--bind", type=_parse_address, default=("127.0.0.1", PORT), metavar="HOST:PORT",
+                    help=f"e.g. 0.0.0.0:{PORT} to accept workers from other hosts (needs {KEY_ENV})")
+    rp.add_argument("--local-workers", type=int, default=0)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "worker":
+        try:
+            key = authkey()
+        except RuntimeError as e:
+            ap.error(str(e))
+        procs = [mp.Process(target=worker, args=(args.connect, args.wait, key)) for _ in range(args.processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        return 0
+
+    points = grid(**{n: [float(v) for v in vals.split(",")] for n, vals in args.grid}) if args.grid else [{}]
+    spec = {"workload": args.workload, "points": points, "trials": args.trials, "base_seed": args.seed,
+            "species": args.species}
+    t0 = time.perf_counter()
+    try:
+        coord = Coordinator(spec, args.bind, args.chunk,
+                            progress=lambda d, n: print(f"  {d}/{n} trials", flush=True))
+    except RuntimeError as e:
+        ap.error(str(e))
+    aggs = coord.run(local_workers=args.local_workers)
+    print(f"{coord.workers_seen} workers, {time.perf_counter() - t0:.1f} s")
+    for p, agg in zip(points, aggs):
+        means = "  ".join(f"{sp}={agg.mean(sp):.6g}" for sp in args.species)
+        print(f"{p}  n={agg.n}  {means}  {agg.reasons}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
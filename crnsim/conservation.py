@@ -0,0 +1,320 @@
+"""
+Conservation laws and conserved-moiety reduction.
+
+A conservation law is an integer vector c with c @ S = 0 (S = net
+stoichiometry, species x reactions), so c @ x stays at its initial value
+whatever fires. The laws are an exact (rational) basis of the left null
+space of S, in reduced row echelon form. Each law then has one species
+that no other law uses. That species is "dependent": its count follows
+from the law's total and the other counts, so it can be dropped from the
+simulated state.
+
+    laws = conservation_laws(model)
+    laws.describe(x0)             # e.g. "OR + ORcI + ... = 1"
+    conserved_bounds(model, x0)   # per-species upper bounds for FSP
+    reduced = reduce(model, init) # ReducedModel for the direct and nrm engines
+
+    python -m crnsim.conservation lambda_r.txt lambda_in.txt
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+from dataclasses import dataclass
+from fractions import Fraction
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from .model import Model, load_initial_counts, load_reactions, nCk
+
+
+@dataclass
+class ConservationLaws:
+    species: List[str]     # species order of the columns
+    matrix: np.ndarray     # (n_laws, n_species) int64; matrix @ S == 0
+    dependent: List[int]   # species eliminated by each law (coefficient > 0, in no other law)
+
+    @property
+    def n_laws(self) -> int:
+        return len(self.dependent)
+
+    def totals(self, x: Sequence[int]) -> np.ndarray:
+        """Conserved totals of state x (in self.species order)."""
+        return self.matrix @ np.asarray(x, dtype=np.int64)
+
+    def describe(self, x: Sequence[int] | None = None) -> List[str]:
+        """Each law as text, with its total when a state is given."""
+        out = []
+        totals = self.totals(x) if x is not None else None
+        for l, row in enumerate(self.matrix):
+            terms = []
+            for i in np.flatnonzero(row):
+                c = int(row[i])
+                name = self.species[i]
+                mag = "" if abs(c) == 1 else f"{abs(c)} "
+                terms.append(("- " if c < 0 else "+ ") + mag + name)
+            text = " ".join(terms)
+            text = text[2:] if text.startswith("+ ") else "-" + text[2:]
+            out.append(text + (f" = {int(totals[l])}" if totals is not None else ""))
+        return out
+
+
+def _rref(rows: List[List[Fraction]], n_cols: int) -> Tuple[List[List[Fraction]], List[int]]:
+    # Exact reduced row echelon form; returns (rows, pivot columns)
+    rows = [r[:] for r in rows]
+    pivots = []
+    r = 0
+    for c in range(n_cols):
+        p = next((i for i in range(r, len(rows)) if rows[i][c] != 0), None)
+        if p is None:
+            continue
+        rows[r], rows[p] = rows[p], rows[r]
+        inv = 1 / rows[r][c]
+        rows[r] = [v * inv for v in rows[r]]
+        for i in range(len(rows)):
+            if i != r and rows[i][c] != 0:
+                f = rows[i][c]
+                rows[i] = [a - f * b for a, b in zip(rows[i], rows[r])]
+        pivots.append(c)
+        r += 1
+        if r == len(rows):
+            break
+    return rows[:r], pivots
+
+
+def conservation_laws(model: Model, keep: Sequence[str] = ()) -> ConservationLaws:
+    """
+    Integer basis of the left null space of model's stoichiometry.
+
+    Species in keep are never chosen as dependent if that can be avoided
+    (e.g. the species a stop callback reads). Among the rest, species that
+    no reaction consumes are eliminated first, then the least-consumed.
+    """
+    S = model.stoich_matrix()
+    n = model.n_species
+    consumed = [0] * n
+    for R in model.reactants:
+        for i, _ in R:
+            consumed[i] += 1
+    keep_i = {model.index[sp] for sp in keep}
+    # Columns to the right end up free in the echelon form, i.e. dependent
+    order = sorted(range(n), key=lambda i: (i not in keep_i, -consumed[i], i))
+    rows = [[Fraction(int(S[i, j])) for i in order] for j in range(model.n_reactions)]
+    rref, pivots = _rref(rows, n)
+
+    pivot_set = set(pivots)
+    laws, dependent = [], []
+    for f in range(n):
+        if f in pivot_set:
+            continue
+        vec = [Fraction(0)] * n
+        vec[f] = Fraction(1)
+        for r, p in enumerate(pivots):
+            vec[p] = -rref[r][f]
+        scale = math.lcm(*(v.denominator for v in vec))
+        ints = [int(v * scale) for v in vec]
+        g = math.gcd(*ints)
+        full = [0] * n
+        for pos, i in enumerate(order):
+            full[i] = ints[pos] // g
+        laws.append(full)
+        dependent.append(order[f])
+    matrix = np.array(laws, dtype=np.int64).reshape(len(laws), n)
+    assert not (matrix @ S).any()
+    return ConservationLaws(list(model.species), matrix, dependent)
+
+
+def _nonnegative(matrix: np.ndarray) -> np.ndarray:
+    # Greedily add other laws (x +-1, +-2) to each mixed-sign law while that
+    # lowers its negative mass, e.g. (OR pool - RNAP forms) + (RNAP pool)
+    rows = [r.copy() for r in matrix]
+
+    def neg(r):
+        return int(-r[r < 0].sum())
+
+    for a in range(len(rows)):
+        while neg(rows[a]):
+            best, cand = neg(rows[a]), None
+            for b in range(len(rows)):
+                if b == a:
+                    continue
+                for k in (1, -1, 2, -2):
+                    c = rows[a] + k * rows[b]
+                    if neg(c) < best and c.any():
+                        best, cand = neg(c), c
+            if cand is None:
+                break
+            rows[a] = cand
+    return np.array(rows, dtype=np.int64).reshape(matrix.shape)
+
+
+def conserved_bounds(model: Model, x0: Sequence[int]) -> Dict[str, Tuple[int, int]]:
+    """
+    {species: (0, hi)} implied by the laws with no negative coefficient.
+
+    Mixed-sign laws are first combined with the others to remove negative
+    coefficients where possible. Species not covered by a non-negative law
+    are left out (unbounded).
+    """
+    if isinstance(model, ReducedModel):
+        laws, x0 = model.laws, model.full_state(x0)
+    else:
+        laws = conservation_laws(model)
+    matrix = _nonnegative(laws.matrix)
+    totals = matrix @ np.asarray(x0, dtype=np.int64)
+    hi: Dict[int, int] = {}
+    for row, total in zip(matrix, totals):
+        if (row < 0).any():
+            continue
+        for i in np.flatnonzero(row):
+            b = int(total) // int(row[i])
+            hi[i] = min(hi.get(i, b), b)
+    return {laws.species[i]: (0, b) for i, b in sorted(hi.items()) if laws.species[i] in model.index}
+
+
+class ReducedModel(Model):
+    """
+    model with the dependent species of its conservation laws removed from the state.
+
+    The totals come from init, so a ReducedModel is tied to one set of
+    conserved totals (state() refuses counts with other totals). Dependent
+    counts are derived on demand in propensity() and counts(). Works with
+    the direct and nrm engines (Simulator refuses the others, which read the
+    stoichiometry as if it were the full state); stop callbacks see the
+    reduced state and index, so pass the species they read as keep.
+    """
+
+    engines = ("direct", "nrm")
+
+    def __init__(self, model: Model, init: Dict[str, int], keep: Sequence[str] = ()):
+        laws = conservation_laws(model, keep)
+        self.full = model
+        self.laws = laws
+        self.keep = tuple(keep)
+        self._init = dict(init)
+        full_x = model.state(init)
+        self.totals = [int(v) for v in laws.totals(full_x)]
+
+        dep = set(laws.dependent)
+        self.reactions = model.reactions
+        self.params = model.params
+        self.names = model.names
+        self.species = [sp for i, sp in enumerate(model.species) if i not in dep]
+        self.index = {sp: i for i, sp in enumerate(self.species)}
+        self.removed = [model.species[i] for i in laws.dependent]
+        pos = {model.index[sp]: i for sp, i in self.index.items()}  # full -> reduced index
+
+        # law l: x_dep = (total - sum(c * x_k)) / c_dep over reduced indices k
+        self._derive = []
+        for row, d in zip(laws.matrix, laws.dependent):
+            terms = tuple((pos[i], int(row[i])) for i in np.flatnonzero(row) if i != d)
+            self._derive.append((terms, int(row[d])))
+        law_of = {d: l for l, d in enumerate(laws.dependent)}
+
+        self.rates = list(model.rates)
+        # Reactant sources: ("x", reduced index) or ("law", l)
+        self._sources = []
+        reads = []
+        for R in model.reactants:
+            src, rd = [], set()
+            for i, m in R:
+                if i in law_of:
+                    l = law_of[i]
+                    src.append((True, l, m))
+                    rd.update(k for k, _ in self._derive[l][0])
+                else:
+                    src.append((False, pos[i], m))
+                    rd.add(pos[i])
+            self._sources.append(tuple(src))
+            reads.append(rd)
+        self.reactants = [tuple((pos[i], m) for i, m in R if i in pos) for R in model.reactants]
+        self.products = [tuple((pos[i], m) for i, m in P if i in pos) for P in model.products]
+        self.delta = [tuple((pos[i], v) for i, v in d if i in pos) for d in model.delta]
+
+        readers: Dict[int, List[int]] = {}
+        for j, rd in enumerate(reads):
+            for k in rd:
+                readers.setdefault(k, []).append(j)
+        self.depends = [tuple(sorted({k for i, _ in d for k in readers.get(i, ())})) for d in self.delta]
+
+    def _compile(self) -> None:  # everything is built in __init__
+        pass
+
+    def with_params(self, **params: float) -> "ReducedModel":
+        return ReducedModel(self.full.with_params(**params), self._init, self.keep)
+
+    def derived(self, l: int, x: Sequence[int]) -> int:
+        """Count of the dependent species of law l in reduced state x."""
+        terms, c = self._derive[l]
+        v = self.totals[l]
+        for k, a in terms:
+            v -= a * x[k]
+        return v // c
+
+    def propensity(self, j: int, x: Sequence[int]) -> float:
+        a = self.rates[j]
+        for is_law, k, m in self._sources[j]:
+            n = self.derived(k, x) if is_law else x[k]
+            if n < m:
+                return 0.0
+            a *= n if m == 1 else nCk(n, m)
+        return float(a)
+
+    def state(self, counts: Dict[str, int]) -> List[int]:
+        full_x = self.full.state(counts)
+        if [int(v) for v in self.laws.totals(full_x)] != self.totals:
+            raise ValueError("counts have other conserved totals than this ReducedModel; reduce() again")
+        return [counts.get(sp, 0) for sp in self.species]
+
+    def full_state(self, x: Sequence[int]) -> List[int]:
+        """Full state vector (self.full.species order) from reduced state x."""
+        out = [0] * self.full.n_species
+        for sp, v in zip(self.species, x):
+            out[self.full.index[sp]] = v
+        for l, d in enumerate(self.laws.dependent):
+            out[d] = self.derived(l, x)
+        return out
+
+    def counts(self, x: Sequence[int]) -> Dict[str, int]:
+        """{species: count} for every species of the full model, dependents included."""
+        return self.full.counts(self.full_state(x))
+
+    def stoich_matrix(self) -> np.ndarray:
+        S = np.zeros((self.n_species, self.n_reactions), dtype=np.int64)
+        for j, d in enumerate(self.delta):
+            for i, v in d:
+                S[i, j] = v
+        return S
+
+
+def reduce(model: Model, init: Dict[str, int], keep: Sequence[str] = ()) -> ReducedModel:
+    """ReducedModel of model for the conserved totals of init."""
+    return ReducedModel(model, init, keep)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Print the conservation laws of a reaction file.")
+    ap.add_argument("reactions", type=Path)
+    ap.add_argument("init", type=Path, nargs="?", help="initial counts file, for totals and bounds")
+    args = ap.parse_args(argv)
+
+    init = load_initial_counts(args.init) if args.init else {}
+    model = Model(load_reactions(args.reactions), species=list(init))
+    laws = conservation_laws(model)
+    x0 = model.state(init) if args.init else None
+    print(f"{model.n_species} species, {model.n_reactions} reactions, "
+          f"rank {model.n_species - laws.n_laws}, {laws.n_laws} conservation laws")
+    for text, d in zip(laws.describe(x0), laws.dependent):
+        print(f"  {text}    (eliminates {model.species[d]})")
+    if x0 is not None:
+        bounds = conserved_bounds(model, x0)
+        print(f"\nBounded species ({len(bounds)}): " + ", ".join(f"{sp} <= {hi}" for sp, (_, hi) in bounds.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
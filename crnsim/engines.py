@@ -0,0 +1,415 @@
+"""
+Simulation engines.
+
+Every engine has the same signature
+
+    engine(model, x, pool, t=0.0, t_end=inf, max_steps=..., stop=None, **opts)
+        -> (t, steps, reason)
+
+and advances the state list x in place. stop(x, index) is called on the
+initial state and after every event; a non-None return value ends the run
+and becomes the reason. Other reasons are the module constants below.
+"""
+
+from __future__ import annotations
+
+import heapq
+import math
+import sys
+import time
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .model import Model
+from .profile import Profile
+from .rng import RandomPool
+
+NO_REACTIONS = "no reactions possible"
+REACHED_T_END = "reached T_END"
+REACHED_MAX_STEPS = "reached MAX_STEPS"
+
+StopFn = Callable[[Sequence[int], dict], Optional[str]]
+EngineResult = Tuple[float, int, str]
+
+
+def direct(
+    model: Model,
+    x: List[int],
+    pool: RandomPool,
+    t: float = 0.0,
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    profile: Profile | None = None,
+) -> EngineResult:
+    """
+    Gillespie direct method.
+
+    Only the propensities in model.depends[j] are recomputed after reaction j
+    fires; a0 is re-summed every step so it never drifts. With a profile the
+    instrumented copy of this loop (_direct_profiled) runs instead.
+    """
+    if profile is not None:
+        return _direct_profiled(model, x, pool, t, t_end, max_steps, stop, profile)
+
+    index = model.index
+    prop = model.propensity
+    delta = model.delta
+    depends = model.depends
+    draw = pool.pair
+
+    props = [prop(j, x) for j in range(model.n_reactions)]
+
+    if stop is not None:
+        reason = stop(x, index)
+        if reason is not None:
+            return t, 0, reason
+
+    for step in range(max_steps):
+        a0 = sum(props)
+        if a0 <= 0.0:
+            return t, step, NO_REACTIONS
+
+        e, u = draw()
+        dt = e / a0
+        if t + dt > t_end:
+            return t_end, step, REACHED_T_END
+        t += dt
+
+        # Choose which reaction fires
+        r = u * a0
+        s = 0.0
+        for j, a in enumerate(props):
+            s += a
+            if r < s:
+                break
+        else:  # rounding pushed r past the last partial sum
+            j = max(k for k, a in enumerate(props) if a > 0.0)
+
+        for i, d in delta[j]:
+            x[i] += d
+        for k in depends[j]:
+            props[k] = prop(k, x)
+
+        if stop is not None:
+            reason = stop(x, index)
+            if reason is not None:
+                return t, step + 1, reason
+
+    return t, max_steps, REACHED_MAX_STEPS
+
+
+def _direct_profiled(model, x, pool, t, t_end, max_steps, stop, profile):
+    # Same loop as direct(), with timers around each phase
+    clock = time.perf_counter
+    index = model.index
+    prop = model.propensity
+    delta = model.delta
+    depends = model.depends
+    draw = pool.pair
+    firings = profile.firings
+    sample_every = profile.sample_every
+    profile.runs += 1
+
+    c0 = clock()
+    props = [prop(j, x) for j in range(model.n_reactions)]
+    profile.time_propensity += clock() - c0
+
+    step = 0
+    try:
+        if stop is not None:
+            reason = stop(x, index)
+            if reason is not None:
+                return t, 0, reason
+
+        for step in range(max_steps):
+            c0 = clock()
+            a0 = sum(props)
+            if step % sample_every == 0:
+                profile.sample_a0(a0)
+            if a0 <= 0.0:
+                return t, step, NO_REACTIONS
+
+            e, u = draw()
+            dt = e / a0
+            if t + dt > t_end:
+                return t_end, step, REACHED_T_END
+            t += dt
+
+            r = u * a0
+            s = 0.0
+            for j, a in enumerate(props):
+                s += a
+                if r < s:
+                    break
+            else:
+                j = max(k for k, a in enumerate(props) if a > 0.0)
+            c1 = clock()
+            profile.time_selection += c1 - c0
+
+            for i, d in delta[j]:
+                x[i] += d
+            firings[j] += 1
+            c2 = clock()
+            profile.time_update += c2 - c1
+
+            for k in depends[j]:
+                props[k] = prop(k, x)
+            c3 = clock()
+            profile.time_propensity += c3 - c2
+
+            if stop is not None:
+                reason = stop(x, index)
+                profile.time_events += clock() - c3
+                if reason is not None:
+                    step += 1
+                    return t, step, reason
+
+        step = max_steps
+        return t, max_steps, REACHED_MAX_STEPS
+    finally:
+        profile.steps += step
+
+
+def nrm(
+    model: Model,
+    x: List[int],
+    pool: RandomPool,
+    t: float = 0.0,
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+) -> EngineResult:
+    """
+    Gibson–Bruck next reaction method.
+
+    Each reaction keeps an absolute firing time in a heap. After an event only
+    the reactions in model.depends[j] get new times (rescaled, not redrawn), so
+    the cost per event is O(|depends| log M) instead of O(M).
+    """
+    index = model.index
+    prop = model.propensity
+    delta = model.delta
+    depends = model.depends
+    draw = pool.pair
+    inf = math.inf
+    M = model.n_reactions
+
+    props = [prop(j, x) for j in range(M)]
+    taus = [t + draw()[0] / a if a > 0.0 else inf for a in props]
+    heap = [(tau, j) for j, tau in enumerate(taus) if tau < inf]
+    heapq.heapify(heap)
+
+    if stop is not None:
+        reason = stop(x, index)
+        if reason is not None:
+            return t, 0, reason
+
+    for step in range(max_steps):
+        # Entries are never removed in place; skip the ones that were superseded
+        while heap and heap[0][0] != taus[heap[0][1]]:
+            heapq.heappop(heap)
+        if not heap:
+            return t, step, NO_REACTIONS
+
+        tau, j = heapq.heappop(heap)
+        if tau > t_end:
+            return t_end, step, REACHED_T_END
+        t = tau
+
+        for i, d in delta[j]:
+            x[i] += d
+
+        for k in depends[j]:
+            a_old = props[k]
+            a_new = props[k] = prop(k, x)
+            if k == j or a_old <= 0.0 or taus[k] == inf:
+                taus[k] = t + draw()[0] / a_new if a_new > 0.0 else inf
+            elif a_new > 0.0:
+                taus[k] = t + (a_old / a_new) * (taus[k] - t)
+            else:
+                taus[k] = inf
+            if taus[k] < inf:
+                heapq.heappush(heap, (taus[k], k))
+        if j not in depends[j]:  # j's own clock always restarts
+            taus[j] = t + draw()[0] / props[j] if props[j] > 0.0 else inf
+            if taus[j] < inf:
+                heapq.heappush(heap, (taus[j], j))
+
+        if len(heap) > 4 * M + 64:
+            heap = [(tau, k) for k, tau in enumerate(taus) if tau < inf]
+            heapq.heapify(heap)
+
+        if stop is not None:
+            reason = stop(x, index)
+            if reason is not None:
+                return t, step + 1, reason
+
+    return t, max_steps, REACHED_MAX_STEPS
+
+
+def _leap_orders(model: Model) -> List[Tuple[int, int]]:
+    # (species, g_i): highest reaction order among reactions that consume species i
+    g = {}
+    for R in model.reactants:
+        order = sum(m for _, m in R)
+        for i, _ in R:
+            g[i] = max(g.get(i, 0), order)
+    return sorted(g.items())
+
+
+def tau_leap(
+    model: Model,
+    x: List[int],
+    pool: RandomPool,
+    t: float = 0.0,
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    epsilon: float = 0.03,
+    ssa_threshold: float = 10.0,
+    ssa_steps: int = 100,
+) -> EngineResult:
+    """
+    Explicit tau-leaping with Cao–Gillespie–Petzold step selection.
+
+    Each leap fires Poisson(a_j * tau) copies of every reaction. tau keeps the
+    expected relative change of every reactant below epsilon. When tau would be
+    under ssa_threshold / a0, ssa_steps exact direct-method events are taken
+    instead. Leaps that would drive a count negative are retried with tau / 2.
+    steps counts reaction events, not leaps.
+    """
+    index = model.index
+    prop = model.propensity
+    M = model.n_reactions
+    rng = pool.rng
+    orders = _leap_orders(model)
+    S = model.stoich_matrix()
+
+    steps = 0
+    if stop is not None:
+        reason = stop(x, index)
+        if reason is not None:
+            return t, 0, reason
+
+    while steps < max_steps:
+        props = np.array([prop(j, x) for j in range(M)])
+        a0 = props.sum()
+        if a0 <= 0.0:
+            return t, steps, NO_REACTIONS
+
+        mu = S @ props
+        sigma2 = (S * S) @ props
+        tau = math.inf
+        for i, g in orders:
+            bound = max(epsilon * x[i] / g, 1.0)
+            if mu[i] != 0.0:
+                tau = min(tau, bound / abs(mu[i]))
+            if sigma2[i] > 0.0:
+                tau = min(tau, bound * bound / sigma2[i])
+
+        if tau == math.inf:  # only zero-order reactants: no bound from the counts
+            tau = ssa_steps / a0
+
+        if tau < ssa_threshold / a0:
+            n = min(ssa_steps, max_steps - steps)
+            t, fired, reason = direct(model, x, pool, t, t_end, n, stop)
+            steps += fired
+            if reason != REACHED_MAX_STEPS:
+                return t, steps, reason
+            continue
+
+        if t + tau > t_end:
+            tau = t_end - t
+            if tau <= 0.0:
+                return t_end, steps, REACHED_T_END
+
+        while True:
+            k = rng.poisson(props * tau)
+            x_new = np.asarray(x) + S @ k
+            if (x_new >= 0).all():
+                break
+            tau /= 2.0
+
+        x[:] = x_new.tolist()
+        t += tau
+        steps += int(k.sum())
+
+        if stop is not None:
+            reason = stop(x, index)
+            if reason is not None:
+                return t, steps, reason
+        if t >= t_end:
+            return t_end, steps, REACHED_T_END
+
+    return t, steps, REACHED_MAX_STEPS
+
+
+def ode(
+    model: Model,
+    x: List[float],
+    pool: RandomPool,
+    t: float = 0.0,
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    method: str = "LSODA",
+    rtol: float = 1e-6,
+    atol: float = 1e-9,
+    n_checks: int = 1000,
+) -> EngineResult:
+    """
+    Deterministic mass-action rate equations, a_j(x) = k_j * prod x_i^m / m!.
+
+    Needs a finite t_end. stop is checked on n_checks evenly spaced points of
+    the dense solution. x ends up holding floats; steps is the number of
+    right-hand-side evaluations. pool is unused.
+    """
+    from scipy.integrate import solve_ivp
+
+    if not math.isfinite(t_end):
+        raise ValueError("ode engine needs a finite t_end")
+
+    index = model.index
+    S = model.stoich_matrix().astype(float)
+    orders = np.zeros((model.n_reactions, model.n_species))
+    for j, R in enumerate(model.reactants):
+        for i, m in R:
+            orders[j, i] = m
+    scale = np.array(model.rates) / np.array([
+        math.prod(math.factorial(m) for _, m in R) for R in model.reactants
+    ])
+
+    def rhs(_t, y):
+        a = scale * np.prod(np.maximum(y, 0.0) ** orders, axis=1)
+        return S @ a
+
+    if stop is not None:
+        reason = stop(x, index)
+        if reason is not None:
+            return t, 0, reason
+
+    sol = solve_ivp(rhs, (t, t_end), np.asarray(x, dtype=float), method=method,
+                    rtol=rtol, atol=atol, dense_output=stop is not None)
+    if not sol.success:
+        raise RuntimeError(f"ODE solver failed: {sol.message}")
+
+    if stop is not None:
+        for ti in np.linspace(t, t_end, n_checks)[1:]:
+            y = sol.sol(ti).tolist()
+            reason = stop(y, index)
+            if reason is not None:
+                x[:] = y
+                return float(ti), sol.nfev, reason
+
+    x[:] = sol.y[:, -1].tolist()
+    return t_end, sol.nfev, REACHED_T_END
+
+
+ENGINES = {
+    "direct": direct,
+    "nrm": nrm,
+    "tau-leap": tau_leap,
+    "ode": ode,
+}
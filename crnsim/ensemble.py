@@ -0,0 +1,283 @@
+"""
+Ensemble time courses: streaming statistics of many trajectories on a shared time grid.
+
+Each trajectory is run up to one grid time after another and its state is
+recorded there, so no events are stored. For the direct and nrm engines
+stopping at a grid time and restarting is exact, because waiting times
+are memoryless. Every grid point keeps a crnsim.stats.Aggregate of the
+states recorded there. Memory depends on the grid and the species kept,
+not on the number of trials, and workers' results merge exactly.
+
+A trajectory that stops early (no reaction can fire, or stop returned a
+reason) keeps its final state at the later grid points. One that hits
+max_steps stops contributing, so n can fall off at late grid points.
+
+    tc = ensemble(model, init, linspace(0, 50, 101), trials=1000, species=["z"])
+    lo, hi = tc.band("z")            # 95% confidence band of the mean
+
+    python -m crnsim.ensemble --workload fibonacci --t-end 40 --trials 1000 --species X10 X12
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import multiprocessing as mp
+import sys
+from pathlib import Path
+from statistics import NormalDist
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from .engines import REACHED_MAX_STEPS, REACHED_T_END, StopFn
+from .model import Model
+from .simulator import Simulator
+from .stats import Aggregate
+
+Table = Dict[str, List[object]]
+
+
+def linspace(start: float, stop: float, n: int) -> List[float]:
+    """n evenly spaced grid times from start to stop inclusive."""
+    if n < 2:
+        raise ValueError("a time grid needs n >= 2 points")
+    step = (stop - start) / (n - 1)
+    return [start + i * step for i in range(n - 1)] + [float(stop)]
+
+
+class TimeCourse:
+    """
+    One Aggregate per grid time, over the species kept.
+
+    histograms : also keep per-point histograms, for quantile() (memory then
+                 grows with the number of distinct counts seen, not with trials)
+    """
+
+    def __init__(self, times: Sequence[float], species: Sequence[str], histograms: bool = False):
+        self.times = [float(t) for t in times]
+        if any(b <= a for a, b in zip(self.times, self.times[1:])):
+            raise ValueError("grid times must be strictly increasing")
+        self.species = list(species)
+        self.histograms = histograms
+        self.points = [Aggregate(histograms) for _ in self.times]
+        self.trials = 0
+        self.reasons: Dict[str, int] = {}
+
+    def merge(self, other: "TimeCourse") -> "TimeCourse":
+        """Fold another TimeCourse on the same grid into this one; returns self."""
+        if other.times != self.times or other.species != self.species:
+            raise ValueError("Cannot merge time courses with different grids or species")
+        for a, b in zip(self.points, other.points):
+            a.merge(b)
+        self.trials += other.trials
+        for r, c in other.reasons.items():
+            self.reasons[r] = self.reasons.get(r, 0) + c
+        return self
+
+    @classmethod
+    def merged(cls, parts: Iterable["TimeCourse"]) -> "TimeCourse":
+        out = None
+        for p in parts:
+            out = p if out is None else out.merge(p)
+        if out is None:
+            raise ValueError("no time courses to merge")
+        return out
+
+    def n(self) -> List[int]:
+        """Trajectories recorded at each grid time."""
+        return [p.n for p in self.points]
+
+    def mean(self, sp: str) -> List[float]:
+        return [p.mean(sp) if p.n else math.nan for p in self.points]
+
+    def std(self, sp: str, ddof: int = 1) -> List[float]:
+        return [p.std(sp, ddof) if p.n else math.nan for p in self.points]
+
+    def quantile(self, sp: str, q: float) -> List[float]:
+        return [p.quantile(sp, q) if p.n else math.nan for p in self.points]
+
+    def band(self, sp: str, level: float = 0.95) -> Tuple[List[float], List[float]]:
+        """Normal-approximation confidence band (lo, hi) of the mean of sp at each grid time."""
+        z = NormalDist().inv_cdf(0.5 + level / 2)
+        lo, hi = [], []
+        for p in self.points:
+            m = p.mean(sp) if p.n else math.nan
+            half = z * p.std(sp, ddof=1) / math.sqrt(p.n) if p.n > 1 else math.nan
+            lo.append(m - half)
+            hi.append(m + half)
+        return lo, hi
+
+    def table(self, species: Sequence[str] | None = None, level: float = 0.95) -> Table:
+        """Columnar table: t, n, then <sp>_mean, <sp>_std, <sp>_lo, <sp>_hi per species."""
+        out: Table = {"t": list(self.times), "n": self.n()}
+        for sp in species or self.species:
+            lo, hi = self.band(sp, level)
+            out[f"{sp}_mean"] = self.mean(sp)
+            out[f"{sp}_std"] = self.std(sp)
+            out[f"{sp}_lo"] = lo
+            out[f"{sp}_hi"] = hi
+        return out
+
+
+def record(
+    sim: Simulator,
+    init: Dict[str, int],
+    tc: TimeCourse,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+) -> str:
+    """Run one trajectory of sim from init over tc's grid and fold it into tc; returns the stop reason."""
+    model = sim.model
+    x = model.state(init)
+    keep = [(sp, model.index[sp]) for sp in tc.species]
+    t, steps, reason = 0.0, 0, REACHED_T_END
+    for k, g in enumerate(tc.times):
+        if g > t:
+            t, fired, reason = sim.engine(model, x, sim.pool, t=t, t_end=g, max_steps=max_steps - steps,
+                                          stop=stop, **sim.engine_opts)
+            steps += fired
+        if reason == REACHED_MAX_STEPS:
+            break
+        tc.points[k].add({sp: x[i] for sp, i in keep})
+        if reason != REACHED_T_END:  # absorbed or stopped: the state holds from here on
+            for p in tc.points[k + 1:]:
+                p.add({sp: x[i] for sp, i in keep})
+            break
+    tc.trials += 1
+    tc.reasons[reason] = tc.reasons.get(reason, 0) + 1
+    return reason
+
+
+# Worker state, set once per process by _init_worker
+_job: dict = {}
+
+
+def _init_worker(job: dict) -> None:
+    if "workload" in job:
+        from .workloads import experiment
+
+        ex = experiment(job["workload"])
+        job = {**job, "model": ex.model, "init": ex.init, "stop": ex.stop,
+               "max_steps": ex.max_steps if job["max_steps"] is None else job["max_steps"],
+               "engine": job["engine"] or ex.engine}
+    _job.clear()
+    _job.update(job)
+
+
+def _run_trials(first: int, count: int) -> TimeCourse:
+    j = _job
+    tc = TimeCourse(j["times"], j["species"], j["histograms"])
+    sim = Simulator(j["model"], engine=j["engine"])
+    for trial in range(first, first + count):
+        sim.seed(j["base_seed"] + trial)
+        record(sim, j["init"], tc, j["max_steps"], j["stop"])
+    return tc
+
+
+def _fan_out(job: dict, trials: int, processes: int | None) -> TimeCourse:
+    if trials < 1:
+        raise ValueError("trials must be >= 1")
+    if processes == 1:
+        _init_worker(job)
+        return _run_trials(0, trials)
+    n = processes or mp.cpu_count()
+    size = -(-trials // (4 * n))  # a few chunks per worker evens out long trajectories
+    tasks = [(s, min(size, trials - s)) for s in range(0, trials, size)]
+    with mp.Pool(processes, initializer=_init_worker, initargs=(job,)) as pool:
+        return TimeCourse.merged(pool.starmap(_run_trials, tasks, chunksize=1))
+
+
+def _check(model: Model, times: Sequence[float], species: Sequence[str] | None) -> List[str]:
+    species = list(model.species) if species is None else list(species)
+    missing = [sp for sp in species if sp not in model.index]
+    if missing:
+        raise KeyError(f"Unknown species: {missing}")
+    if not times or times[0] < 0:
+        raise ValueError("grid times must start at t >= 0")
+    return species
+
+
+def ensemble(
+    model: Model,
+    init: Dict[str, int],
+    times: Sequence[float],
+    trials: int = 100,
+    base_seed: int = 0,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    species: Sequence[str] | None = None,
+    histograms: bool = False,
+    engine: str = "direct",
+    processes: int | None = 1,
+) -> TimeCourse:
+    """
+    TimeCourse of trials trajectories (trial i seeded with base_seed + i) on the grid times.
+
+    species    : species to keep (default all of them)
+    processes  : worker processes; None uses every core. stop must be
+                 picklable (a top-level function) unless processes=1.
+    """
+    species = _check(model, times, species)
+    job = dict(model=model, init=dict(init), times=list(times), species=species, histograms=histograms,
+               stop=stop, max_steps=max_steps, engine=engine, base_seed=base_seed)
+    return _fan_out(job, trials, processes)
+
+
+def ensemble_workload(
+    name: str,
+    times: Sequence[float],
+    trials: int = 100,
+    base_seed: int = 0,
+    max_steps: int | None = None,
+    species: Sequence[str] | None = None,
+    histograms: bool = False,
+    engine: str | None = None,
+    processes: int | None = None,
+) -> TimeCourse:
+    """ensemble() over a crnsim.workloads experiment; None settings come from its script."""
+    from .workloads import experiment
+
+    species = _check(experiment(name).model, times, species)
+    # Workers rebuild the experiment themselves: script-level stop functions do not pickle
+    job = dict(workload=name, times=list(times), species=species, histograms=histograms,
+               max_steps=max_steps, engine=engine, base_seed=base_seed)
+    return _fan_out(job, trials, processes)
+
+
+def main(argv=None) -> int:
+    from .sweep import write_csv
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workload", required=True, choices=("lambda", "log_multiply", "fibonacci"))
+    ap.add_argument("--t-end", type=float, required=True, help="last grid time")
+    ap.add_argument("--points", type=int, default=51, help="grid times from 0 to T_END")
+    ap.add_argument("--trials", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=0, help="trial i uses seed SEED+i")
+    ap.add_argument("--species", nargs="+", required=True)
+    ap.add_argument("--level", type=float, default=0.95, help="confidence level of the band")
+    ap.add_argument("--max-steps", type=int, default=None)
+    ap.add_argument("--engine", default=None, help="override the script's ENGINE")
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--out", type=Path, help="write the table as CSV")
+    args = ap.parse_args(argv)
+
+    times = linspace(0.0, args.t_end, args.points)
+    tc = ensemble_workload(args.workload, times, trials=args.trials, base_seed=args.seed,
+                           max_steps=args.max_steps, species=args.species, engine=args.engine,
+                           processes=args.processes)
+    table = tc.table(level=args.level)
+    if args.out:
+        write_csv(table, args.out)
+
+    print(f"{tc.trials} trials, stop reasons: {tc.reasons}")
+    print(f"{'t':>10} {'n':>6}" + "".join(f"  {sp + ' mean':>14} {'+-':>10}" for sp in tc.species))
+    for i, t in enumerate(table["t"]):
+        cells = []
+        for sp in tc.species:
+            m, hi = table[f"{sp}_mean"][i], table[f"{sp}_hi"][i]
+            cells.append(f"  {m:>14.6g} {hi - m:>10.3g}")
+        print(f"{t:>10.4g} {table['n'][i]:>6d}" + "".join(cells))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+"""
+Finite state projection (FSP) for small networks.
+
+Enumerates the states reachable from x0 inside a box of per-species bounds.
+Transitions that leave the box go to one extra sink state. Hitting
+probabilities of a target set then come from sparse linear algebra instead
+of Monte Carlo. The mass that reaches the sink is the FSP error bound: the
+true probability lies in [probability, probability + error_bound].
+Upper bounds implied by conservation laws (crnsim.conservation) are applied
+on top of the given box, so conserved pools never need to be listed.
+
+Horizons:
+  steps=N   : hit within N reaction events (the embedded jump chain)
+  t_end=T   : hit by time T (CTMC, via expm_multiply)
+  neither   : ever hit (one sparse solve)
+"""
+
+from __future__ import annotations
+
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Dict, Sequence, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import expm_multiply, spsolve
+
+from .conservation import conserved_bounds
+from .model import Model
+
+TargetFn = Callable[[Sequence[int], Dict[str, int]], bool]
+
+MAX_STATES = 2_000_000
+TOLERANCE = 1e-12  # stop stepping once the live mass is below this
+
+
+@dataclass
+class FSPResult:
+    probability: float   # mass that hit the target (sink counted as a miss)
+    error_bound: float   # mass that left the projection
+    n_states: int        # states in the projection (without the sink)
+
+
+class StateSpace:
+    """
+    Reachable states of model from x0 inside bounds.
+
+    bounds    : {species: (lo, hi)}; unlisted species are bounded only by conservation laws
+    absorbing : states that are not expanded (the target set)
+    Rates of the CTMC are stored as COO triplets, column n_states is the sink.
+    """
+
+    def __init__(self, model: Model, x0: Sequence[int], bounds: Dict[str, Tuple[int, int]] | None = None,
+                 absorbing: TargetFn | None = None, max_states: int = MAX_STATES):
+        self.model = model
+        lo = [0] * model.n_species
+        hi = [math.inf] * model.n_species
+        for sp_name, (b_lo, b_hi) in (bounds or {}).items():
+            i = model.index[sp_name]
+            lo[i], hi[i] = b_lo, b_hi
+        for sp_name, (_, b_hi) in conserved_bounds(model, x0).items():
+            i = model.index[sp_name]
+            hi[i] = min(hi[i], b_hi)
+
+        def inside(x):
+            return all(lo[i] <= v <= hi[i] for i, v in enumerate(x))
+
+        x0 = tuple(int(v) for v in x0)
+        if not inside(x0):
+            raise ValueError(f"x0={x0} is outside the bounds")
+
+        index = model.index
+        states = [x0]
+        ids = {x0: 0}
+        target = []
+        rows, cols, rates = [], [], []
+        queue = deque([0])
+        n_reac = model.n_reactions
+
+        while queue:
+            s = queue.popleft()
+            x = states[s]
+            hit = absorbing is not None and bool(absorbing(x, index))
+            target.append((s, hit))
+            if hit:
+                continue
+            for j in range(n_reac):
+                a = model.propensity(j, x)
+                if a <= 0.0:
+                    continue
+                y = list(x)
+                for i, d in model.delta[j]:
+                    y[i] += d
+                y = tuple(y)
+                if not inside(y):
+                    dst = -1  # sink, numbered once the state count is known
+                else:
+                    dst = ids.get(y)
+                    if dst is None:
+                        if len(states) >= max_states:
+                            raise MemoryError(f"More than max_states={max_states} states; tighten the bounds")
+                        dst = ids[y] = len(states)
+                        states.append(y)
+                        queue.append(dst)
+                rows.append(s)
+                cols.append(dst)
+                rates.append(a)
+
+        self.states = np.array(states, dtype=np.int64)
+        self.index = ids
+        self.n_states = n = len(states)
+        self.sink = n
+        self.target = np.zeros(n, dtype=bool)
+        for s, hit in target:
+            self.target[s] = hit
+        self._rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+        cols[cols < 0] = n
+        self._cols = cols
+        self._rates = np.array(rates, dtype=float)
+        self.exit_rate = np.bincount(self._rows, weights=self._rates, minlength=n)
+
+    def jump_chain(self) -> sp.csr_matrix:
+        """Embedded chain P (n+1 x n+1); target, dead and sink states are absorbing."""
+        n = self.n_states
+        P = sp.coo_matrix((self._rates / self.exit_rate[self._rows], (self._rows, self._cols)),
+                          shape=(n + 1, n + 1)).tocsr()
+        stay = np.append(self.exit_rate == 0.0, True)  # dead states (and target, which has no edges) + sink
+        return (P + sp.diags(stay.astype(float))).tocsr()
+
+    def generator(self) -> sp.csr_matrix:
+        """CTMC generator Q (n+1 x n+1, rows sum to 0); target, dead and sink states are absorbing."""
+        n = self.n_states
+        Q = sp.coo_matrix((self._rates, (self._rows, self._cols)), shape=(n + 1, n + 1)).tocsr()
+        return (Q - sp.diags(np.append(self.exit_rate, 0.0))).tocsr()
+
+
+def hitting_probability(
+    model: Model,
+    x0: Sequence[int],
+    target: TargetFn,
+    bounds: Dict[str, Tuple[int, int]] | None = None,
+    steps: int | None = None,
+    t_end: float | None = None,
+    max_states: int = MAX_STATES,
+) -> FSPResult:
+    """
+    Probability that a trajectory from x0 enters target(x, index).
+
+    x0 is a state vector in model.species order; target takes the same
+    (x, index) arguments as a stop callback. See the module docstring for
+    the horizon options.
+    """
+    if steps is not None and t_end is not None:
+        raise ValueError("Give steps or t_end, not both")
+
+    space = StateSpace(model, x0, bounds, absorbing=target, max_states=max_states)
+    n = space.n_states
+    hit = np.append(space.target, False)
+    sink = np.zeros(n + 1, dtype=bool)
+    sink[n] = True
+
+    if steps is not None:
+        PT = space.jump_chain().T.tocsr()
+        p = np.zeros(n + 1)
+        p[0] = 1.0
+        live = ~(hit | sink | np.append(space.exit_rate == 0.0, False))
+        for _ in range(steps):
+            p = PT @ p
+            if p[live].sum() < TOLERANCE:
+                break
+        return FSPResult(float(p[hit].sum()), float(p[n]), n)
+
+    if t_end is not None:
+        p0 = np.zeros(n + 1)
+        p0[0] = 1.0
+        p = expm_multiply(space.generator().T * t_end, p0)
+        return FSPResult(float(p[hit].sum()), float(p[n]), n)
+
+    # Ever hit: h = P_TT h + P_T,target over transient states T
+    P = space.jump_chain()
+    trans = np.flatnonzero(~hit[:n] & (space.exit_rate > 0.0))
+    if hit[0]:
+        return FSPResult(1.0, 0.0, n)
+    if space.exit_rate[0] == 0.0:
+        return FSPResult(0.0, 0.0, n)
+    A = sp.identity(len(trans), format="csc") - P[trans][:, trans].tocsc()
+    b_hit = np.asarray(P[trans][:, np.flatnonzero(hit)].sum(axis=1)).ravel()
+    b_sink = np.asarray(P[trans][:, [n]].sum(axis=1)).ravel()
+    h_hit = spsolve(A, b_hit)
+    h_sink = spsolve(A, b_sink)
+    if not (np.all(np.isfinite(h_hit)) and np.all(np.isfinite(h_sink))):
+        raise RuntimeError("Singular system: the projection has a closed class that never hits the target")
+    start = int(np.searchsorted(trans, 0))
+    return FSPResult(float(h_hit[start]), float(h_sink[start]), n)
@@ -0,0 +1,510 @@
+"""
+Multilevel Monte Carlo estimates of E[f] with tau-leap and exact SSA levels.
+
+Level l runs fixed-step tau-leaping with step h_l = h0 / refine**l. The
+estimator is the telescoping sum
+
+    E[f_exact] = E[f_0] + sum_l E[f_l - f_{l-1}] + E[f_exact - f_L]
+
+where each correction comes from a coupled pair of paths, following
+Anderson & Higham (2012). Within a fine step, reaction j fires
+    Poisson(min(a_f, a_c) h)  in both paths,
+    Poisson((a_f - min) h)    in the fine path only,
+    Poisson((a_c - min) h)    in the coarse path only.
+Here a_f is the fine path's propensity and a_c is the coarse path's,
+frozen at the start of its coarse step. Each path on its own is a plain
+tau-leap path, but the two stay close, so the corrections have small
+variance and need few samples. The last level couples an exact SSA path
+with the step-h_L tau-leap path in the same way, in continuous time: the
+whole estimate is unbiased with respect to exact SSA, at mostly
+tau-leap cost.
+
+In a leap, no reaction fires more often than its reactants allow on their
+own, and counts are then clamped at 0. Both rules are the same on every
+level, so the telescoping sum stays consistent. Fixed-step tau-leaping
+needs steps well below the fastest reaction's time scale. Stiff networks
+with bursts of very fast reactions gain nothing from the tau levels. Samples per level
+follow Giles (2008): pilot runs give each level's variance V_l and cost C_l
+(seconds per sample), then N_l ~ sqrt(V_l / C_l) * sum_k sqrt(V_k C_k) / (eps^2 / 2)
+so the sampling error reaches the requested RMS error eps at minimal cost.
+
+    res = mlmc(model, init, lambda r: r.counts["X"], rmse=2.0, h0=0.25, levels=2, t_end=20.0)
+    for line in res.lines():
+        print(line)
+
+    python -m crnsim.mlmc --workload fibonacci --species X12 --rmse 4 --h0 20 --t-end 5000
+    python -m crnsim.mlmc --workload log_multiply --species z --rmse 100 --h0 50 --levels 1 --t-end 5000 --compare 5
+
+Tau paths are only stopped by stop() at step boundaries, and on
+log_multiply they never reach its done state, so every tau path runs to
+t_end. An SSA run there ends near t = 3000, hence --t-end 5000 instead of
+the script's T_END.
+
+The report ends with the estimated time plain SSA would need for the same
+error, so it shows whether the tau levels paid off for that network.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, List
+
+import numpy as np
+
+from .engines import NO_REACTIONS, REACHED_MAX_STEPS, REACHED_T_END, StopFn
+from .model import Model
+from .rng import RandomPool
+from .simulator import Result, Simulator
+from .stats import Welford
+
+OutputFn = Callable[[Result], float]
+
+N_INIT = 20        # pilot samples per level
+MAX_ROUNDS = 20    # allocation rounds before giving up on the target
+SMALL_NETWORK = 32  # up to this many reactions, propensities are computed in a Python loop
+
+
+@dataclass
+class LevelStats:
+    name: str              # "tau h=..." or "exact - tau h=..."
+    h: float               # fine step (the coarse path's step for the exact level)
+    samples: int
+    mean: float            # mean of the level's correction
+    variance: float        # sample variance of the correction
+    seconds: float         # total time spent on this level
+
+    @property
+    def cost(self) -> float:
+        """Seconds per sample."""
+        return self.seconds / self.samples if self.samples else math.nan
+
+
+@dataclass
+class MLMCResult:
+    estimate: float
+    std_error: float            # sqrt(sum V_l / N_l)
+    rmse: float                 # requested RMS error
+    levels: List[LevelStats]
+    seconds: float              # total sampling time
+    exact: bool                 # last level couples to exact SSA (no bias)
+    bias: float = math.nan      # |E[f_L - f_{L-1}]| / (refine - 1) when exact is False
+    ssa_variance: float = math.nan
+    ssa_cost: float = math.nan  # seconds per plain SSA run
+    notes: List[str] = field(default_factory=list)
+
+    @property
+    def ssa_seconds(self) -> float:
+        """Estimated time for plain SSA to reach the same sampling error."""
+        return self.ssa_variance / self.std_error ** 2 * self.ssa_cost
+
+    @property
+    def savings(self) -> float:
+        """ssa_seconds / seconds."""
+        return self.ssa_seconds / self.seconds
+
+    def lines(self) -> List[str]:
+        out = [f"estimate = {self.estimate:.6g} +/- {self.std_error:.3g} (requested RMS error {self.rmse:g})"]
+        out.append(f"{'level':<22} {'samples':>8} {'mean':>12} {'variance':>12} {'s/sample':>10}")
+        for lv in self.levels:
+            out.append(f"{lv.name:<22} {lv.samples:>8d} {lv.mean:>12.5g} {lv.variance:>12.5g} {lv.cost:>10.3g}")
+        out.append(f"MLMC time {self.seconds:.3g} s")
+        if not math.isnan(self.ssa_cost):
+            out.append(f"plain SSA: variance {self.ssa_variance:.5g}, {self.ssa_cost:.3g} s/run, about "
+                       f"{self.ssa_seconds:.3g} s for the same error (savings x{self.savings:.2f})")
+        if not self.exact:
+            out.append(f"estimated tau-leap bias {self.bias:.3g} (no exact level)")
+        return out + self.notes
+
+
+def _propensities(model: Model) -> Callable[[np.ndarray], np.ndarray]:
+    # Vectorised mass-action propensities for a plain Model. Small networks
+    # (numpy's per-call overhead dominates) and other models (e.g. a
+    # ReducedModel) go through model.propensity()
+    if type(model).propensity is not Model.propensity or model.n_reactions <= SMALL_NETWORK:
+        prop, js = model.propensity, range(model.n_reactions)
+        return lambda x: np.array([prop(j, x.tolist()) for j in js])
+
+    rates = np.array(model.rates, dtype=float)
+    K = max((len(R) for R in model.reactants), default=0)
+    idx = np.zeros((model.n_reactions, K), dtype=np.intp)  # padding reads species 0 with multiplicity 0
+    mult = np.zeros((model.n_reactions, K), dtype=np.int64)
+    for j, R in enumerate(model.reactants):
+        for k, (i, m) in enumerate(R):
+            idx[j, k], mult[j, k] = i, m
+    top = int(mult.max()) if mult.size else 0
+
+    def props(x: np.ndarray) -> np.ndarray:
+        n = x[idx].astype(float)
+        term = np.ones_like(n)
+        for k in range(top):  # falling factorial / m! = C(n, m)
+            term = np.where(mult > k, term * (n - k) / (k + 1), term)
+        term[n < mult] = 0.0
+        return rates * term.prod(axis=1)
+
+    return props
+
+
+def _caps(model: Model) -> Callable[[np.ndarray], np.ndarray]:
+    # Most firings each reaction's reactants allow on their own (no cap for
+    # zero-order reactions); keeps one leap from consuming far more than exists
+    K = max((len(R) for R in model.reactants), default=0)
+    idx = np.zeros((model.n_reactions, K), dtype=np.intp)
+    mult = np.zeros((model.n_reactions, K), dtype=np.int64)
+    for j, R in enumerate(model.reactants):
+        for k, (i, m) in enumerate(R):
+            idx[j, k], mult[j, k] = i, m
+    used = mult > 0
+    div = np.where(used, mult, 1)
+    big = np.iinfo(np.int64).max
+
+    def caps(x: np.ndarray) -> np.ndarray:
+        c = np.where(used, np.maximum(x[idx], 0) // div, big)
+        return c.min(axis=1) if K else np.full(model.n_reactions, big)
+
+    return caps
+
+
+def _stopped(stop: StopFn | None, x, index) -> str | None:
+    return stop(x, index) if stop is not None else None
+
+
+def tau_path(model, x0, h, rng, props, caps, S, t_end=math.inf, stop=None, max_leaps=sys.maxsize):
+    """One fixed-step tau-leap path from x0; returns (x, t, reason)."""
+    x = np.array(x0, dtype=np.int64)
+    t = 0.0
+    for _ in range(max_leaps):
+        reason = _stopped(stop, x, model.index)
+        if reason is not None:
+            return x, t, reason
+        if t >= t_end:
+            return x, t_end, REACHED_T_END
+        a = props(x)
+        if not a.any():
+            return x, t, NO_REACTIONS
+        dt = min(h, t_end - t)
+        x += S @ np.minimum(rng.poisson(a * dt), caps(x))
+        np.maximum(x, 0, out=x)
+        t += dt
+    return x, t, REACHED_MAX_STEPS
+
+
+def tau_pair(model, x0, h, refine, rng, props, caps, S, t_end=math.inf, stop=None, max_leaps=sys.maxsize):
+    """
+    Coupled tau-leap paths from x0 with steps h (fine) and refine * h (coarse).
+
+    max_leaps counts fine steps (refine of them per coarse leap), so both
+    paths stop by the same time. A path that stops (stop, no reactions,
+    t_end) keeps its state while the other runs on. Returns
+    ((x_fine, t, reason), (x_coarse, t, reason)).
+    """
+    index = model.index
+    zero = np.zeros(model.n_reactions)
+    xf = np.array(x0, dtype=np.int64)
+    xc = xf.copy()
+    fine, coarse = [xf, 0.0, None], [xc, 0.0, None]  # [x, t, reason]
+    t = 0.0
+    for _ in range(max_leaps // refine):
+        for path in (fine, coarse):
+            if path[2] is None:
+                path[1], path[2] = t, _stopped(stop, path[0], index)
+                if path[2] is None and t >= t_end:
+                    path[1], path[2] = t_end, REACHED_T_END
+        if fine[2] is not None and coarse[2] is not None:
+            break
+
+        ac = props(xc) if coarse[2] is None else zero
+        if coarse[2] is None and not ac.any():
+            coarse[1], coarse[2], ac = t, NO_REACTIONS, zero
+        cc = caps(xc)
+        t_next = min(t + refine * h, t_end)
+        kc = np.zeros(model.n_reactions, dtype=np.int64)
+        s = t
+        for sub in range(refine):
+            dt = min(h, t_next - s)
+            if dt <= 0.0:
+                break
+            if sub and fine[2] is None:
+                fine[1], fine[2] = s, _stopped(stop, xf, index)
+            af = props(xf) if fine[2] is None else zero
+            if fine[2] is None and not af.any():
+                fine[1], fine[2], af = s, NO_REACTIONS, zero
+            m = np.minimum(af, ac)
+            both, only_f, only_c = rng.poisson(np.concatenate((m, af - m, ac - m)) * dt).reshape(3, -1)
+            if fine[2] is None:
+                xf += S @ np.minimum(both + only_f, caps(xf))
+                np.maximum(xf, 0, out=xf)
+            kc += both + only_c
+            s += dt
+        if coarse[2] is None:
+            xc += S @ np.minimum(kc, cc)
+            np.maximum(xc, 0, out=xc)
+        t = t_next
+    else:
+        for path in (fine, coarse):
+            if path[2] is None:
+                path[1], path[2] = t, REACHED_MAX_STEPS
+    return tuple(fine), tuple(coarse)
+
+
+def exact_pair(model, x0, h, pool, props, caps, S, t_end=math.inf, stop=None, max_steps=sys.maxsize,
+               max_leaps=sys.maxsize):
+    """
+    Exact SSA path coupled with a step-h tau-leap path from x0, in continuous time.
+
+    Reaction j fires in both paths at rate min(a_e, a_c), in the exact path
+    alone at a_e - min and in the tau path alone at a_c - min, where a_c is
+    frozen at the start of the tau path's current step. That is a direct
+    method over the rates max(a_e, a_c); restarting the clock at each step
+    boundary is exact because waiting times are memoryless. Once reaction j
+    has fired its cap for the step in the tau path, a_c of j is 0 until the
+    next step. After the exact path stops, the rest of the tau path has
+    nothing to couple with and is leaped (at most max_leaps steps in all).
+    Returns ((x_exact, t, reason), (x_tau, t, reason)).
+    """
+    index = model.index
+    prop = model.propensity
+    delta = model.delta
+    depends = model.depends
+    M = model.n_reactions
+    draw = pool.pair
+    zero = [0.0] * M
+
+    xe = list(x0)
+    xt = list(x0)
+    te, re = 0.0, _stopped(stop, xe, index)
+    ae = [prop(j, xe) for j in range(M)] if re is None else zero
+    tt, rt = 0.0, None
+    t = 0.0
+    steps = leaps = 0
+
+    while True:
+        # Step boundary of the tau path
+        if rt is None:
+            xt = [v if v > 0 else 0 for v in xt]
+            tt, rt = t, _stopped(stop, xt, index)
+            if rt is None and t >= t_end:
+                tt, rt = t_end, REACHED_T_END
+            if rt is None and leaps >= max_leaps:
+                rt = REACHED_MAX_STEPS
+        if re is None and t >= t_end:
+            te, re, ae = t_end, REACHED_T_END, zero
+        if re is not None:
+            if rt is None:
+                x, dt, rt = tau_path(model, xt, h, pool.rng, props, caps, S, t_end - t, stop, max_leaps - leaps)
+                xt, tt = x.tolist(), t + dt
+            return (xe, te, re), (xt, tt, rt)
+
+        ac = [prop(j, xt) for j in range(M)] if rt is None else zero
+        if rt is None and not any(ac):
+            rt = NO_REACTIONS
+        left = None
+        if rt is None:
+            leaps += 1
+            left = caps(np.array(xt, dtype=np.int64)).tolist()  # tau firings left this step
+            ac = [a if n > 0 else 0.0 for a, n in zip(ac, left)]
+        boundary = min(t + h, t_end)
+
+        while True:
+            w = [a if a > c else c for a, c in zip(ae, ac)]
+            a0 = sum(w)
+            if a0 <= 0.0:  # neither path can change again this step
+                if re is None:
+                    te, re = t, NO_REACTIONS
+                t = boundary
+                break
+            e, u = draw()
+            dt = e / a0
+            if t + dt > boundary:
+                t = boundary
+                break
+            t += dt
+
+            r = u * a0
+            for j in range(M):
+                if r < w[j]:
+                    break
+                r -= w[j]
+            # r is uniform on [0, max(a_e, a_c)): [0, min) fires both paths
+            if r < ac[j]:
+                left[j] -= 1
+                if not left[j]:
+                    ac[j] = 0.0
+                for i, v in delta[j]:
+                    xt[i] += v
+            if r < ae[j]:
+                for i, v in delta[j]:
+                    xe[i] += v
+                for k in depends[j]:
+                    ae[k] = prop(k, xe)
+                steps += 1
+                reason = _stopped(stop, xe, index)
+                if reason is None and steps >= max_steps:
+                    reason = REACHED_MAX_STEPS
+                if reason is None and not any(ae):
+                    reason = NO_REACTIONS
+                if reason is not None:
+                    te, re, ae = t, reason, zero
+                    if rt is None:  # the tau firings for the rest of this step, in one leap
+                        k = np.minimum(pool.rng.poisson(np.array(ac) * (boundary - t)), left)
+                        xt = (np.array(xt, dtype=np.int64) + S @ k).tolist()
+                    t = boundary
+                    break
+
+
+def _level_sampler(model, init, output, h0, refine, levels, exact, t_end, stop, max_steps, seed):
+    # One callable per level: sample() -> (f_fine - f_coarse, seconds)
+    x0 = model.state(init)
+    S = model.stoich_matrix()
+    props = _propensities(model)
+    caps = _caps(model)
+    # Leap budget in steps of the finest tau step h_L. A path of step h_l gets
+    # max_leaps / refine**(levels - l) leaps, so every tau path (both of a pair,
+    # every level) is cut at the same time max_leaps * h_L and the telescoping
+    # sum stays consistent. A leap can fire no events, so this only bounds the
+    # work as max_steps does for the exact path
+    unit = refine ** levels
+    max_leaps = max(max_steps // unit, 1) * unit if max_steps < sys.maxsize else sys.maxsize
+
+    def f(path):
+        x, t, reason = path
+        return float(output(Result(model.counts([int(v) for v in x]), t, 0, reason)))
+
+    samplers = []
+    for l in range(levels + 1):
+        rng = np.random.default_rng([seed, l])
+        h = h0 / refine ** l
+        if l == 0:
+            def sample(rng=rng, h=h, n=max_leaps // refine ** (levels - l)):
+                return f(tau_path(model, x0, h, rng, props, caps, S, t_end, stop, n))
+            samplers.append((f"tau h={h:.4g}", h, sample))
+        else:
+            def sample(rng=rng, h=h, n=max_leaps // refine ** (levels - l)):
+                fine, coarse = tau_pair(model, x0, h, refine, rng, props, caps, S, t_end, stop, n)
+                return f(fine) - f(coarse)
+            samplers.append((f"tau h={h:.4g} - h={h * refine:.4g}", h, sample))
+    if exact:
+        h = h0 / refine ** levels
+        pool = RandomPool([seed, levels + 1])
+
+        def sample(pool=pool, h=h):
+            ex, tau = exact_pair(model, x0, h, pool, props, caps, S, t_end, stop, max_steps, max_leaps)
+            return f(ex) - f(tau)
+        samplers.append((f"exact - tau h={h:.4g}", h, sample))
+    return samplers
+
+
+def mlmc(
+    model: Model,
+    init: dict,
+    output: OutputFn,
+    rmse: float,
+    h0: float,
+    levels: int = 2,
+    refine: int = 4,
+    exact: bool = True,
+    t_end: float = math.inf,
+    stop: StopFn | None = None,
+    max_steps: int = sys.maxsize,
+    seed: int = 0,
+    n_init: int = N_INIT,
+    compare: int = N_INIT,
+    max_samples: int = 1_000_000,
+) -> MLMCResult:
+    """
+    MLMC estimate of E[output] with sampling error rmse; see the module docstring.
+
+    h0       : tau-leap step of level 0; level l uses h0 / refine**l
+    levels   : number of tau-leap corrections on top of level 0
+    exact    : add the exact-SSA level (unbiased); otherwise the result has
+               the bias of step h0 / refine**levels, estimated in .bias
+    t_end    : needed (finite) unless stop always ends the run
+    compare  : plain direct-method runs timed for the savings report (0 = skip)
+    """
+    if rmse <= 0 or h0 <= 0 or refine < 2 or levels < 0 or n_init < 2:
+        raise ValueError("need rmse > 0, h0 > 0, refine >= 2, levels >= 0 and n_init >= 2")
+    samplers = _level_sampler(model, init, output, h0, refine, levels, exact, t_end, stop, max_steps, seed)
+    L = len(samplers)
+    stats = [Welford() for _ in range(L)]
+    seconds = [0.0] * L
+    todo = [n_init] * L
+    notes = []
+
+    for _ in range(MAX_ROUNDS):
+        for l, (_, _, sample) in enumerate(samplers):
+            for _ in range(todo[l]):
+                t0 = time.perf_counter()
+                y = sample()
+                seconds[l] += time.perf_counter() - t0
+                stats[l].add(y)
+        V = [w.variance(1) for w in stats]
+        C = [s / w.n for s, w in zip(seconds, stats)]
+        total = sum(math.sqrt(v * c) for v, c in zip(V, C))
+        want = [math.ceil(2.0 / rmse ** 2 * math.sqrt(v / c) * total) if v > 0 else 0 for v, c in zip(V, C)]
+        want = [min(n, max_samples) for n in want]
+        todo = [max(0, n - w.n) for n, w in zip(want, stats)]
+        if not any(todo):
+            break
+    else:
+        notes.append(f"stopped after {MAX_ROUNDS} allocation rounds")
+    if any(w.n >= max_samples for w in stats):
+        notes.append(f"a level hit max_samples={max_samples}; the error target may be missed")
+
+    result = MLMCResult(
+        estimate=sum(w.mean for w in stats),
+        std_error=math.sqrt(sum(w.variance(1) / w.n for w in stats)),
+        rmse=rmse,
+        levels=[LevelStats(name, h, w.n, w.mean, w.variance(1), s)
+                for (name, h, _), w, s in zip(samplers, stats, seconds)],
+        seconds=sum(seconds),
+        exact=exact,
+        notes=notes,
+    )
+    if not exact and levels:
+        result.bias = abs(stats[-1].mean) / (refine - 1)
+
+    if compare:
+        sim = Simulator(model, engine="direct")
+        plain = Welford()
+        t0 = time.perf_counter()
+        for i in range(compare):
+            sim.seed([seed, L + 1, i])
+            plain.add(float(output(sim.run(init, t_end=t_end, max_steps=max_steps, stop=stop))))
+        result.ssa_cost = (time.perf_counter() - t0) / compare
+        result.ssa_variance = plain.variance(1)
+    return result
+
+
+def main(argv=None) -> int:
+    from .workloads import experiment
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workload", required=True, choices=("lambda", "log_multiply", "fibonacci"))
+    ap.add_argument("--species", required=True, help="estimate the mean final count of this species")
+    ap.add_argument("--rmse", type=float, required=True, help="target RMS sampling error")
+    ap.add_argument("--h0", type=float, required=True, help="tau-leap step of level 0")
+    ap.add_argument("--levels", type=int, default=2)
+    ap.add_argument("--refine", type=int, default=4)
+    ap.add_argument("--no-exact", action="store_true", help="leave out the exact SSA level (biased)")
+    ap.add_argument("--t-end", type=float, default=None, help="override the script's time limit")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--compare", type=int, default=N_INIT, help="plain SSA runs timed for the savings report")
+    args = ap.parse_args(argv)
+
+    ex = experiment(args.workload)
+    if args.species not in ex.model.index:
+        ap.error(f"unknown species {args.species!r}")
+    res = mlmc(ex.model, ex.init, lambda r: r.counts[args.species], args.rmse, args.h0, args.levels,
+               args.refine, exact=not args.no_exact, t_end=ex.t_end if args.t_end is None else args.t_end,
+               stop=ex.stop, max_steps=ex.max_steps, seed=args.seed, compare=args.compare)
+    print(f"E[{args.species}] for {args.workload}")
+    for line in res.lines():
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
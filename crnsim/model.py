@@ -0,0 +1,254 @@
+"""
+Reaction network loading and compilation.
+
+A Model turns (reactants, products, rate) triples into index form: species
+are numbered, stoichiometry becomes (species_index, count) tuples and every
+reaction knows which propensities change when it fires (dependency graph).
+Engines work on a plain list of counts in model.species order.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+Stoich = Dict[str, int]
+Rate = Union[float, str]  # number, or name of an entry in Model.params
+Reaction = Tuple[Stoich, Stoich, Rate]  # (reactants, products, rate)
+
+
+def nCk(n: int, k: int) -> int:
+    """Compute binomial coefficient C(n,k) for integers n>=0."""
+    if k < 0 or k > n:
+        return 0
+    if k == 0 or k == n:
+        return 1
+    k = min(k, n - k)
+    out = 1
+    for i in range(1, k + 1):
+        out = out * (n - (k - i)) // i
+    return out
+
+
+def parse_stoich(side: str) -> Stoich:
+    """Parse one side of a reaction line ("A 1 B 2") into {species: count}."""
+    side = side.strip()
+    if not side:
+        return {}
+
+    toks = side.split()
+    if len(toks) % 2 != 0:
+        raise ValueError(f"Bad stoichiometry side (odd token count): {side!r}")
+
+    d: Stoich = {}
+    for i in range(0, len(toks), 2):
+        sp = toks[i]
+        try:
+            m = int(toks[i + 1])
+        except ValueError:
+            raise ValueError(f"Bad count {toks[i + 1]!r} for {sp!r} in {side!r}") from None
+        if m < 0:
+            raise ValueError(f"Negative count {m} for {sp!r} in {side!r}")
+        d[sp] = d.get(sp, 0) + m
+    return d
+
+
+def load_reactions(path: Path) -> List[Reaction]:
+    """Read a "reactants : products : rate" file."""
+    rxns: List[Reaction] = []
+    with Path(path).open("r", encoding="utf-8", errors="replace") as f:
+        for lineno, raw in enumerate(f, 1):
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+
+            parts = [p.strip() for p in line.split(":")]
+            if len(parts) != 3:
+                raise ValueError(f"{path}:{lineno}: Bad reaction line (need 2 colons): {line}")
+
+            try:
+                reactants = parse_stoich(parts[0])
+                products = parse_stoich(parts[1])
+                rate = float(parts[2])
+            except ValueError as e:
+                raise ValueError(f"{path}:{lineno}: {e}") from None
+            if not rate >= 0.0:  # also rejects nan
+                raise ValueError(f"{path}:{lineno}: Bad rate {parts[2]!r}")
+            rxns.append((reactants, products, rate))
+
+    if not rxns:
+        raise ValueError(f"No reactions loaded from {path}")
+    return rxns
+
+
+def load_initial_counts(path: Path) -> Dict[str, int]:
+    """Read a "Species  Value  ..." file."""
+    counts: Dict[str, int] = {}
+    with Path(path).open("r", encoding="utf-8", errors="replace") as f:
+        for raw in f:
+            line = raw.strip()
+            if not line or line.startswith("#"):
+                continue
+            toks = line.split()
+            if len(toks) < 2:
+                continue
+            counts[toks[0]] = int(toks[1])
+
+    if not counts:
+        raise ValueError(f"No initial values loaded from {path}")
+    return counts
+
+
+class Model:
+    """
+    Compiled reaction network.
+
+    reactions : (reactants, products, rate) triples; rate is a number or a key of params
+    species   : species order for the state vector (reaction species not listed are appended)
+    params    : named rate constants
+    names     : optional reaction names (default "R0", "R1", ...)
+    """
+
+    def __init__(
+        self,
+        reactions: Sequence[Reaction],
+        species: Sequence[str] | None = None,
+        params: Dict[str, float] | None = None,
+        names: Sequence[str] | None = None,
+    ):
+        self.reactions = [(dict(R), dict(P), rate) for R, P, rate in reactions]
+        self.params = dict(params or {})
+        self.names = list(names) if names is not None else [f"R{j}" for j in range(len(self.reactions))]
+        if len(self.names) != len(self.reactions):
+            raise ValueError(f"{len(self.names)} names for {len(self.reactions)} reactions")
+
+        self.species: List[str] = list(dict.fromkeys(species or []))
+        seen = set(self.species)
+        for R, P, _ in self.reactions:
+            for sp in list(R) + list(P):
+                if sp not in seen:
+                    seen.add(sp)
+                    self.species.append(sp)
+        self.index: Dict[str, int] = {sp: i for i, sp in enumerate(self.species)}
+
+        self._compile()
+
+    @classmethod
+    def from_arrays(
+        cls,
+        species: Sequence[str],
+        reactants: Sequence[Sequence[Tuple[int, int]]],
+        products: Sequence[Sequence[Tuple[int, int]]],
+        rates: Sequence[Rate],
+        params: Dict[str, float] | None = None,
+        names: Sequence[str] | None = None,
+    ) -> "Model":
+        """
+        Model straight from index form, for generated networks.
+
+        reactants[j] / products[j] are ((species_index, count), ...) with
+        count > 0; rates[j] is a number or a key of params. Skips the
+        species discovery and dict lookups of the normal constructor.
+        """
+        if not len(reactants) == len(products) == len(rates):
+            raise ValueError("reactants, products and rates must have the same length")
+        self = cls.__new__(cls)
+        self.species = list(species)
+        self.index = {sp: i for i, sp in enumerate(self.species)}
+        self.params = dict(params or {})
+        self.names = list(names) if names is not None else [f"R{j}" for j in range(len(rates))]
+        if len(self.names) != len(rates):
+            raise ValueError(f"{len(self.names)} names for {len(rates)} reactions")
+        sp = self.species
+        self.reactants = [tuple(R) for R in reactants]
+        self.products = [tuple(P) for P in products]
+        self.reactions = [({sp[i]: m for i, m in R}, {sp[i]: m for i, m in P}, rate)
+                          for R, P, rate in zip(self.reactants, self.products, rates)]
+        self.rates = [self._rate(rate) for rate in rates]
+        self._compile_index()
+        return self
+
+    def _compile(self) -> None:
+        idx = self.index
+        self.rates: List[float] = [self._rate(rate) for _, _, rate in self.reactions]
+        self.reactants = [tuple((idx[sp], m) for sp, m in R.items() if m > 0) for R, _, _ in self.reactions]
+        self.products = [tuple((idx[sp], m) for sp, m in P.items() if m > 0) for _, P, _ in self.reactions]
+        self._compile_index()
+
+    def _compile_index(self) -> None:
+        # Net change per reaction, zero entries dropped
+        self.delta = []
+        for R, P in zip(self.reactants, self.products):
+            net: Dict[int, int] = {}
+            for i, m in R:
+                net[i] = net.get(i, 0) - m
+            for i, m in P:
+                net[i] = net.get(i, 0) + m
+            self.delta.append(tuple((i, d) for i, d in net.items() if d != 0))
+
+        # depends[j]: reactions whose propensity can change when reaction j fires
+        readers: Dict[int, List[int]] = {}
+        for j, R in enumerate(self.reactants):
+            for i, _ in R:
+                readers.setdefault(i, []).append(j)
+        self.depends = []
+        for d in self.delta:
+            dep = sorted({k for i, _ in d for k in readers.get(i, ())})
+            self.depends.append(tuple(dep))
+
+    def _rate(self, rate: Rate) -> float:
+        if isinstance(rate, str):
+            if rate not in self.params:
+                raise KeyError(f"Rate parameter {rate!r} not in params")
+            return float(self.params[rate])
+        return float(rate)
+
+    @property
+    def n_species(self) -> int:
+        return len(self.species)
+
+    @property
+    def n_reactions(self) -> int:
+        return len(self.reactions)
+
+    def with_params(self, **params: float) -> "Model":
+        """Copy of the model with some named rate constants replaced."""
+        unknown = set(params) - set(self.params)
+        if unknown:
+            raise KeyError(f"Unknown rate parameters: {sorted(unknown)}")
+        return Model(self.reactions, self.species, {**self.params, **params}, self.names)
+
+    def propensity(self, j: int, x: Sequence[int]) -> float:
+        """Gillespie propensity of reaction j in state x."""
+        a = self.rates[j]
+        for i, m in self.reactants[j]:
+            n = x[i]
+            if n < m:
+                return 0.0
+            a *= n if m == 1 else nCk(n, m)
+        return float(a)
+
+    def describe(self, j: int) -> str:
+        """Reaction j as text, e.g. "2 c -> c"."""
+        def side(d: Stoich) -> str:
+            return " + ".join(sp if m == 1 else f"{m} {sp}" for sp, m in d.items() if m > 0) or "0"
+        R, P, _ = self.reactions[j]
+        return f"{side(R)} -> {side(P)}"
+
+    def state(self, counts: Dict[str, int]) -> List[int]:
+        """State vector from a {species: count} dict (missing species are 0, unknown ones ignored)."""
+        return [counts.get(sp, 0) for sp in self.species]
+
+    def counts(self, x: Sequence[int]) -> Dict[str, int]:
+        """{species: count} dict from a state vector."""
+        return dict(zip(self.species, x))
+
+    def stoich_matrix(self) -> np.ndarray:
+        """Net stoichiometry, shape (n_species, n_reactions)."""
+        S = np.zeros((self.n_species, self.n_reactions), dtype=np.int64)
+        for j, d in enumerate(self.delta):
+            for i, v in d:
+                S[i, j] = v
+        return S
@@ -0,0 +1,75 @@
+"""
+Opt-in instrumentation for the direct-method SSA loop.
+
+Pass a Profile to Simulator.run(..., profile=p) (direct engine only). The
+engine then switches to an instrumented copy of its loop; without a
+profile the normal loop runs untouched, so disabled profiling costs nothing.
+One Profile can accumulate over many runs and is exported with to_json().
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from .model import Model
+
+BINS_PER_DECADE = 4
+
+
+class Profile:
+    """
+    Per-reaction firing counts, time split between the SSA phases and a
+    sampled histogram of a0 (log10 bins, BINS_PER_DECADE per decade).
+
+    sample_every : record a0 once every this many steps
+    """
+
+    def __init__(self, model: Model, sample_every: int = 100):
+        if sample_every < 1:
+            raise ValueError(f"sample_every must be >= 1, got {sample_every}")
+        self.labels = [f"{model.names[j]}: {model.describe(j)}" for j in range(model.n_reactions)]
+        self.sample_every = sample_every
+        self.firings = [0] * model.n_reactions
+        self.steps = 0
+        self.runs = 0
+        self.time_propensity = 0.0  # initial propensities + dependent updates
+        self.time_selection = 0.0   # a0 sum, random draw, picking the reaction
+        self.time_update = 0.0      # applying stoichiometry
+        self.time_events = 0.0      # stop() checks
+        self.a0_bins: Dict[int, int] = {}
+
+    def sample_a0(self, a0: float) -> None:
+        b = math.floor(math.log10(a0) * BINS_PER_DECADE) if a0 > 0.0 else -10**9
+        self.a0_bins[b] = self.a0_bins.get(b, 0) + 1
+
+    def top(self, n: int = 10) -> List[Tuple[str, int, float]]:
+        """n most-fired reactions as (label, firings, share of all firings)."""
+        total = sum(self.firings) or 1
+        order = sorted(range(len(self.firings)), key=lambda j: -self.firings[j])
+        return [(self.labels[j], self.firings[j], self.firings[j] / total) for j in order[:n]]
+
+    def to_dict(self) -> dict:
+        hist = []
+        for b in sorted(self.a0_bins):
+            lo = 0.0 if b == -10**9 else 10 ** (b / BINS_PER_DECADE)
+            hi = 0.0 if b == -10**9 else 10 ** ((b + 1) / BINS_PER_DECADE)
+            hist.append({"a0_lo": lo, "a0_hi": hi, "count": self.a0_bins[b]})
+        return {
+            "runs": self.runs,
+            "steps": self.steps,
+            "seconds": {
+                "propensity": self.time_propensity,
+                "selection": self.time_selection,
+                "update": self.time_update,
+                "events": self.time_events,
+            },
+            "firings": dict(zip(self.labels, self.firings)),
+            "a0_sample_every": self.sample_every,
+            "a0_histogram": hist,
+        }
+
+    def to_json(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n")
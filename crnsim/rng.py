@@ -0,0 +1,74 @@
+"""
+Block-buffered random numbers for the SSA loops.
+
+Every SSA event needs one Exp(1) variate (waiting time, dt = e / a0) and one
+U(0,1) variate (which reaction fires, r = u * a0). RandomPool draws both in
+NumPy blocks and hands them out one pair at a time, so the hot loop does no
+per-event RNG or log() calls.
+"""
+
+import numpy as np
+
+BLOCK_SIZE = 100_000
+
+
+class RandomPool:
+    """
+    Buffered (Exp(1), U(0,1)) pairs from a seeded NumPy Generator.
+
+    seed       : same meaning as the scripts' SEED (int -> reproducible, None -> fresh entropy)
+    block_size : pairs drawn per refill
+    """
+
+    def __init__(self, seed=None, block_size=BLOCK_SIZE):
+        if block_size < 1:
+            raise ValueError(f"block_size must be >= 1, got {block_size}")
+        self.block_size = block_size
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Reseed and drop whatever is left in the buffer."""
+        self.rng = np.random.default_rng(seed)
+        self._exp = []
+        self._uni = []
+        self._pos = 0
+        self._block_state = None  # generator state the current block was drawn from
+
+    def get_state(self):
+        """
+        Compact snapshot for checkpoints: generator state and buffer position.
+
+        The buffer itself is not saved; set_state() redraws it from the
+        generator state it came from. Only valid while the buffer is the
+        sole consumer of self.rng (true for the direct engine).
+        """
+        if self._block_state is None:
+            return {"rng": self.rng.bit_generator.state, "block_size": self.block_size, "pos": None}
+        return {"rng": self._block_state, "block_size": self.block_size, "pos": self._pos}
+
+    def set_state(self, state):
+        """Restore a get_state() snapshot; later draws match the original pool exactly."""
+        self.block_size = state["block_size"]
+        self.rng = np.random.default_rng()
+        self.rng.bit_generator.state = state["rng"]
+        self._exp, self._uni, self._pos, self._block_state = [], [], 0, None
+        if state["pos"] is not None:
+            self._refill()
+            self._pos = state["pos"]
+
+    def _refill(self):
+        # .tolist() once per block: indexing a Python list is much cheaper than
+        # indexing a NumPy array element by element in the event loop.
+        self._block_state = self.rng.bit_generator.state
+        self._exp = self.rng.standard_exponential(self.block_size).tolist()
+        self._uni = self.rng.random(self.block_size).tolist()
+        self._pos = 0
+
+    def pair(self):
+        """Next (Exp(1), U(0,1)) pair."""
+        i = self._pos
+        if i >= len(self._exp):
+            self._refill()
+            i = 0
+        self._pos = i + 1
+        return self._exp[i], self._uni[i]
@@ -0,0 +1,380 @@
+"""
+Local job server for sweeps over the homework workloads.
+
+One server owns one process pool, so several people (or terminals) can
+queue sweeps on a shared machine without oversubscribing its cores. Jobs
+are split into single trials, and free workers always take the next
+trial of the highest-priority job (ties go to the older job). Cancelling
+a job drops its queued trials. As trials complete, each job's per-point
+statistics (crnsim.stats.Aggregate) are streamed to its watchers, at
+most every --interval seconds plus once at the end.
+
+The protocol is one JSON object per line over a Unix socket (or
+localhost TCP with --port). Requests:
+
+    {"op": "submit", "workload": "log_multiply", "points": [{"r7": 6000}, {"r7": 18000}],
+     "trials": 100, "seed": 0, "priority": 0, "species": ["z", "w"]}  -> {"job": 1}
+    {"op": "watch", "job": 1}    -> progress events until the job ends
+    {"op": "cancel", "job": 1}
+    {"op": "status"}             -> every job with its state and progress
+
+    python -m crnsim.server serve --workers 8
+    python -m crnsim.server submit --workload log_multiply --grid r7=6000,18000 --trials 200 --species z --watch
+    python -m crnsim.server status
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import math
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Deque, Dict, List, Set, Tuple
+
+from .simulator import Simulator
+from .stats import Aggregate
+from .sweep import apply_point, grid, _parse_axis
+
+SOCKET = Path.home() / ".crnsim.sock"
+INTERVAL = 0.5   # seconds between progress events of one job
+WORKLOADS = ("lambda", "log_multiply", "fibonacci")
+
+
+@lru_cache(maxsize=None)
+def _cache(path: str):
+    from .cache import ResultCache
+
+    return ResultCache(path)
+
+
+def _run_trial(workload: str, point: dict, seed: int, t_end, max_steps, engine, cache) -> Tuple[dict, str]:
+    # Runs in a pool worker; experiment() is cached per process
+    from .workloads import experiment
+
+    ex = experiment(workload)
+    model, init = apply_point(ex.model, ex.init, point)
+    sim = Simulator(model, engine=engine or ex.engine)
+    t_end = ex.t_end if t_end is None else t_end
+    max_steps = ex.max_steps if max_steps is None else max_steps
+    if cache:
+        res = _cache(cache).run(sim, init, seed, t_end=t_end, max_steps=max_steps, stop=ex.stop)
+    else:
+        sim.seed(seed)
+        res = sim.run(init, t_end=t_end, max_steps=max_steps, stop=ex.stop)
+    return {**res.counts, "steps": res.steps, "t": res.t}, res.reason
+
+
+def _number(v: float) -> float | None:
+    return None if math.isnan(v) else v  # NaN is not JSON
+
+
+class Job:
+    def __init__(self, jid: int, spec: dict):
+        self.id = jid
+        self.spec = spec
+        self.priority = int(spec.get("priority", 0))
+        self.points: List[dict] = spec["points"]
+        self.species: List[str] = spec["species"]
+        self.aggs = [Aggregate() for _ in self.points]
+        trials = int(spec["trials"])
+        # Trial-major order: every point gets early results, so estimates converge together
+        self.pending: Deque[Tuple[int, int]] = collections.deque(
+            (k, i) for i in range(trials) for k in range(len(self.points)))
+        self.total = len(self.pending)
+        self.done = 0
+        self.in_flight = 0
+        self.state = "queued"
+        self.error = None
+        self.watchers: Set[asyncio.Queue] = set()
+        self.last_event = 0.0
+        self.started = time.monotonic()
+
+    @property
+    def finished(self) -> bool:
+        return self.state in ("done", "cancelled", "failed")
+
+    def event(self) -> dict:
+        points = []
+        for p, agg in zip(self.points, self.aggs):
+            points.append({
+                "point": p,
+                "n": agg.n,
+                "mean": {sp: _number(agg.mean(sp)) if agg.n else None for sp in self.species},
+                "std": {sp: _number(agg.std(sp, ddof=1)) if agg.n > 1 else None for sp in self.species},
+                "reasons": agg.reasons,
+            })
+        ev = {"event": "progress", "job": self.id, "state": self.state, "done": self.done,
+              "total": self.total, "seconds": round(time.monotonic() - self.started, 3), "points": points}
+        if self.error:
+            ev["failure"] = self.error
+        return ev
+
+    def summary(self) -> dict:
+        return {"job": self.id, "workload": self.spec["workload"], "state": self.state,
+                "priority": self.priority, "done": self.done, "total": self.total}
+
+
+class JobServer:
+    """Queues jobs, feeds their trials to one process pool and publishes progress."""
+
+    def __init__(self, workers: int | None = None, interval: float = INTERVAL):
+        self.workers = workers or os.cpu_count() or 1
+        self.interval = interval
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.jobs: Dict[int, Job] = {}
+        self._ids = itertools.count(1)
+        self._in_flight = 0
+
+    # ---- scheduling ----
+
+    def submit(self, spec: dict) -> Job:
+        from .workloads import experiment
+
+        if spec.get("workload") not in WORKLOADS:
+            raise ValueError(f"workload must be one of {WORKLOADS}")
+        if int(spec.get("trials", 0)) < 1:
+            raise ValueError("trials must be >= 1")
+        ex = experiment(spec["workload"])
+        spec = {"points": [{}], "seed": 0, "species": [], **spec}
+        for p in spec["points"]:
+            apply_point(ex.model, ex.init, p)  # fail on bad names now, not in a worker
+        unknown = [sp for sp in spec["species"] if sp not in ex.model.index and sp not in ("steps", "t")]
+        if unknown:
+            raise ValueError(f"Unknown species: {unknown}")
+        job = Job(next(self._ids), spec)
+        self.jobs[job.id] = job
+        self._fill()
+        return job
+
+    def cancel(self, jid: int) -> Job:
+        job = self.jobs[jid]
+        if not job.finished:
+            job.pending.clear()
+            job.state = "cancelled"
+            self._publish(job, force=True)
+        return job
+
+    def _next_job(self) -> Job | None:
+        ready = [j for j in self.jobs.values() if j.pending and not j.finished]
+        return max(ready, key=lambda j: (j.priority, -j.id), default=None)
+
+    def _fill(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._in_flight < self.workers:
+            job = self._next_job()
+            if job is None:
+                return
+            k, i = job.pending.popleft()
+            s = job.spec
+            fut = loop.run_in_executor(self.pool, _run_trial, s["workload"], job.points[k], s["seed"] + i,
+                                       s.get("t_end"), s.get("max_steps"), s.get("engine"), s.get("cache"))
+            job.state = "running"
+            job.in_flight += 1
+            self._in_flight += 1
+            fut.add_done_callback(lambda f, job=job, k=k: self._finished(job, k, f))
+
+    def _finished(self, job: Job, k: int, fut: asyncio.Future) -> None:
+        self._in_flight -= 1
+        job.in_flight -= 1
+        if not job.finished:
+            if fut.cancelled() or fut.exception() is not None:
+                job.state = "failed"
+                job.error = repr(fut.exception()) if not fut.cancelled() else "cancelled by the pool"
+                job.pending.clear()
+            else:
+                metrics, reason = fut.result()
+                job.aggs[k].add({sp: metrics.get(sp, 0) for sp in job.species}, reason)
+                job.done += 1
+                if job.done == job.total:
+                    job.state = "done"
+            self._publish(job, force=job.finished)
+        self._fill()
+
+    # ---- progress ----
+
+    def _publish(self, job: Job, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - job.last_event < self.interval:
+            return
+        job.last_event = now
+        ev = job.event()
+        for q in job.watchers:
+            q.put_nowait(ev)
+
+    # ---- protocol ----
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def send(obj):
+            writer.write((json.dumps(obj) + "\n").encode())
+            await writer.drain()
+
+        try:
+            while line := await reader.readline():
+                try:
+                    req = json.loads(line)
+                    op = req.get("op")
+                    if op == "submit":
+                        await send({"job": self.submit(req).id})
+                    elif op == "cancel":
+                        await send(self.cancel(int(req["job"])).summary())
+                    elif op == "status":
+                        await send({"workers": self.workers, "busy": self._in_flight,
+                                    "jobs": [j.summary() for j in self.jobs.values()]})
+                    elif op == "watch":
+                        await self._watch(self.jobs[int(req["job"])], send)
+                    else:
+                        raise ValueError(f"unknown op {op!r}")
+                except (ValueError, KeyError, TypeError) as exc:
+                    await send({"error": str(exc)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _watch(self, job: Job, send) -> None:
+        q: asyncio.Queue = asyncio.Queue()
+        job.watchers.add(q)
+        try:
+            ev = job.event()
+            await send(ev)
+            while ev["state"] not in ("done", "cancelled", "failed"):
+                ev = await q.get()
+                while not q.empty():  # a slow client only gets the newest state
+                    ev = q.get_nowait()
+                await send(ev)
+        finally:
+            job.watchers.discard(q)
+
+
+async def serve(socket: Path | None, port: int | None, workers: int | None, interval: float) -> None:
+    server = JobServer(workers, interval)
+    if port is not None:
+        srv = await asyncio.start_server(server.handle, "127.0.0.1", port)
+        where = f"127.0.0.1:{port}"
+    else:
+        socket.unlink(missing_ok=True)
+        srv = await asyncio.start_unix_server(server.handle, str(socket))
+        where = str(socket)
+    print(f"crnsim job server on {where} with {server.workers} workers", flush=True)
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    try:
+        async with srv:
+            await stop.wait()
+    finally:
+        server.pool.shutdown(cancel_futures=True)
+        if port is None:
+            socket.unlink(missing_ok=True)
+
+
+# ---- client ----
+
+async def _connect(args):
+    if args.port is not None:
+        return await asyncio.open_connection("127.0.0.1", args.port)
+    return await asyncio.open_unix_connection(str(args.socket))
+
+
+async def request(args, req: dict, stream: bool = False):
+    """Send one request; yields every reply line (just one unless stream)."""
+    reader, writer = await _connect(args)
+    try:
+        writer.write((json.dumps(req) + "\n").encode())
+        await writer.drain()
+        while line := await reader.readline():
+            reply = json.loads(line)
+            yield reply
+            if not stream or "error" in reply or reply.get("state") in ("done", "cancelled", "failed"):
+                break
+    finally:
+        writer.close()
+
+
+def _print_progress(ev: dict) -> None:
+    print(f"[job {ev['job']}] {ev['state']} {ev['done']}/{ev['total']} trials, {ev['seconds']:.1f} s")
+    for p in ev["points"]:
+        cells = [f"{sp}={m:.6g}" + (f" +/- {s / math.sqrt(p['n']):.2g}" if s is not None else "")
+                 for sp, m, s in ((sp, p["mean"][sp], p["std"][sp]) for sp in p["mean"]) if m is not None]
+        print(f"    {json.dumps(p['point'])}  n={p['n']}  " + "  ".join(cells))
+    if "failure" in ev:
+        print(f"    failed: {ev['failure']}")
+
+
+async def _client(args) -> int:
+    if args.cmd == "status":
+        async for r in request(args, {"op": "status"}):
+            print(json.dumps(r, indent=1))
+        return 0
+    if args.cmd == "cancel":
+        async for r in request(args, {"op": "cancel", "job": args.job}):
+            print(json.dumps(r))
+        return 0
+    if args.cmd == "submit":
+        points = grid(**{n: [float(v) for v in vals.split(",")] for n, vals in args.grid}) if args.grid else [{}]
+        spec = {"op": "submit", "workload": args.workload, "points": points, "trials": args.trials,
+                "seed": args.seed, "priority": args.priority, "species": args.species,
+                "t_end": args.t_end, "max_steps": args.max_steps, "engine": args.engine,
+                "cache": str(args.cache.resolve()) if args.cache else None}
+        async for r in request(args, spec):
+            if "error" in r:
+                print(f"error: {r['error']}")
+                return 1
+            print(f"submitted job {r['job']}")
+            args.job = r["job"]
+        if not args.watch:
+            return 0
+    async for ev in request(args, {"op": "watch", "job": args.job}, stream=True):
+        if "error" in ev:
+            print(f"error: {ev['error']}")
+            return 1
+        _print_progress(ev)
+    return 0
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--socket", type=Path, default=SOCKET, help="Unix socket path")
+    ap.add_argument("--port", type=int, default=None, help="use localhost TCP on this port instead")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sp = sub.add_parser("serve")
+    sp.add_argument("--workers", type=int, default=None, help="pool size (default: every core)")
+    sp.add_argument("--interval", type=float, default=INTERVAL, help="seconds between progress events")
+
+    sp = sub.add_parser("submit")
+    sp.add_argument("--workload", required=True, choices=WORKLOADS)
+    sp.add_argument("--grid", type=_parse_axis, action="append", default=[], metavar="NAME=V1,V2,...")
+    sp.add_argument("--trials", type=int, default=10)
+    sp.add_argument("--seed", type=int, default=0, help="trial i uses seed SEED+i at every point")
+    sp.add_argument("--priority", type=int, default=0, help="higher runs first")
+    sp.add_argument("--species", nargs="+", default=["steps"], help="species (or steps, t) to aggregate")
+    sp.add_argument("--t-end", type=float, default=None)
+    sp.add_argument("--max-steps", type=int, default=None)
+    sp.add_argument("--engine", default=None)
+    sp.add_argument("--cache", type=Path, default=None, help="ResultCache file shared by the workers")
+    sp.add_argument("--watch", action="store_true", help="stream progress until the job ends")
+
+    for name in ("watch", "cancel"):
+        sp = sub.add_parser(name)
+        sp.add_argument("job", type=int)
+    sub.add_parser("status")
+
+    args = ap.parse_args(argv)
+    if args.cmd == "serve":
+        asyncio.run(serve(args.socket, args.port, args.workers, args.interval))
+        return 0
+    return asyncio.run(_client(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+"""
+Simulator: a Model, an engine and a random pool behind one run() call.
+"""
+
+from __future__ import annotations
+
+import math
+import sys
+from dataclasses import dataclass
+from typing import Callable, Dict
+
+from .engines import ENGINES, StopFn
+from .model import Model
+from .profile import Profile
+from .rng import BLOCK_SIZE, RandomPool
+
+
+@dataclass
+class Result:
+    counts: Dict[str, int]  # final state
+    t: float                # final time
+    steps: int              # events fired
+    reason: str             # stop reason (engines.* constant or stop() return value)
+
+
+class Simulator:
+    """
+    model  : compiled Model
+    engine : "direct", "nrm", "tau-leap", "ode", or an engine function
+    seed   : seed for a new RandomPool (ignored when pool is given)
+    pool   : share one RandomPool between several simulators
+    engine_opts : extra keyword arguments for the engine (e.g. epsilon for tau-leap)
+    """
+
+    def __init__(
+        self,
+        model: Model,
+        engine: str | Callable = "direct",
+        seed: int | None = None,
+        pool: RandomPool | None = None,
+        block_size: int = BLOCK_SIZE,
+        **engine_opts,
+    ):
+        if isinstance(engine, str):
+            if engine not in ENGINES:
+                raise ValueError(f"Unknown engine {engine!r}; choose from {sorted(ENGINES)}")
+            self.engine_name, engine = engine, ENGINES[engine]
+            allowed = getattr(model, "engines", None)  # e.g. a ReducedModel: direct and nrm only
+            if allowed is not None and self.engine_name not in allowed:
+                raise ValueError(f"{type(model).__name__} works with the {' and '.join(allowed)} engines, "
+                                 f"not {self.engine_name!r}")
+        else:
+            self.engine_name = getattr(engine, "__name__", "custom")
+        self.model = model
+        self.engine = engine
+        self.engine_opts = engine_opts
+        self.pool = pool if pool is not None else RandomPool(seed, block_size)
+
+    def seed(self, seed: int | None) -> None:
+        self.pool.seed(seed)
+
+    def run(
+        self,
+        init: Dict[str, int],
+        t_end: float = math.inf,
+        max_steps: int = sys.maxsize,
+        stop: StopFn | None = None,
+        profile: Profile | None = None,
+    ) -> Result:
+        """
+        Run one trajectory from init (a {species: count} dict).
+
+        profile : crnsim.profile.Profile to accumulate into (direct engine only)
+        """
+        x = self.model.state(init)
+        opts = dict(self.engine_opts)
+        if profile is not None:
+            if self.engine_name != "direct":
+                raise ValueError(f"Profiling is only available for the direct engine, not {self.engine_name!r}")
+            opts["profile"] = profile
+        t, steps, reason = self.engine(
+            self.model, x, self.pool, t_end=t_end, max_steps=max_steps, stop=stop, **opts
+        )
+        return Result(self.model.counts(x), t, steps, reason)
@@ -0,0 +1,196 @@
+"""
+Streaming statistics over trial results.
+
+Memory does not grow with the number of trials: each species keeps a
+running mean/variance (Welford) and, optionally, a histogram of the values
+it has seen. Aggregates from different workers merge exactly (Chan et al.
+for the moments, bin-wise sums for the histograms), so a pool can return
+one partial Aggregate per worker instead of every final state.
+
+    agg = Aggregate(histograms=True)
+    for res in results:
+        agg.add(res.counts, res.reason)
+    agg.mean("z"), agg.std("z", ddof=1), agg.quantile("z", 0.9)
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict, Iterable, List, Mapping, Tuple
+
+
+class Welford:
+    """Running count, mean and sum of squared deviations."""
+
+    __slots__ = ("n", "mean", "m2")
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        d = x - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (x - self.mean)
+
+    def merge(self, other: "Welford") -> None:
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+
+    def variance(self, ddof: int = 0) -> float:
+        return self.m2 / (self.n - ddof) if self.n > ddof else math.nan
+
+    def std(self, ddof: int = 0) -> float:
+        return math.sqrt(self.variance(ddof))
+
+    def __getstate__(self):
+        return self.n, self.mean, self.m2
+
+    def __setstate__(self, state):
+        self.n, self.mean, self.m2 = state
+
+
+class Histogram:
+    """
+    Counts per bin; mergeable, and its quantiles are exact for integer data.
+
+    bin_width : None keeps every distinct value (integer counts), otherwise
+                values are binned to floor(x / bin_width) and quantiles are
+                reported at the bin's lower edge
+    """
+
+    def __init__(self, bin_width: float | None = None):
+        self.bin_width = bin_width
+        self.bins: Dict[float, int] = {}
+        self.n = 0
+
+    def add(self, x: float, count: int = 1) -> None:
+        key = x if self.bin_width is None else math.floor(x / self.bin_width) * self.bin_width
+        self.bins[key] = self.bins.get(key, 0) + count
+        self.n += count
+
+    def merge(self, other: "Histogram") -> None:
+        if other.bin_width != self.bin_width:
+            raise ValueError(f"Cannot merge histograms with bin widths {self.bin_width} and {other.bin_width}")
+        for key, c in other.bins.items():
+            self.bins[key] = self.bins.get(key, 0) + c
+        self.n += other.n
+
+    def quantile(self, q: float) -> float:
+        """Smallest value v with at least a fraction q of the data <= v."""
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"q must be in [0, 1], got {q}")
+        if self.n == 0:
+            return math.nan
+        need = max(1, math.ceil(q * self.n))
+        seen = 0
+        for key in sorted(self.bins):
+            seen += self.bins[key]
+            if seen >= need:
+                return key
+        return key
+
+    def items(self) -> List[Tuple[float, int]]:
+        """(value or bin edge, count) pairs in increasing order."""
+        return sorted(self.bins.items())
+
+
+class Aggregate:
+    """
+    Per-species streaming statistics of final states, plus stop-reason counts.
+
+    histograms : also keep a Histogram per species (for quantiles and plots)
+    bin_width  : Histogram bin width (None = exact integer values)
+    """
+
+    def __init__(self, histograms: bool = False, bin_width: float | None = None):
+        self.histograms = histograms
+        self.bin_width = bin_width
+        self.n = 0
+        self.moments: Dict[str, Welford] = {}
+        self.hists: Dict[str, Histogram] = {}
+        self.reasons: Dict[str, int] = {}
+
+    def add(self, counts: Mapping[str, float], reason: str | None = None) -> None:
+        """Fold in one final state. Species missing from earlier states count as 0 there."""
+        for sp in counts:
+            if sp not in self.moments:
+                self._new_species(sp)
+        for sp, w in self.moments.items():
+            v = counts.get(sp, 0)
+            w.add(v)
+            if self.histograms:
+                self.hists[sp].add(v)
+        self.n += 1
+        if reason is not None:
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    def _new_species(self, sp: str) -> None:
+        # Earlier trials did not report sp: they contribute n zeros
+        w = Welford()
+        w.n = self.n
+        self.moments[sp] = w
+        if self.histograms:
+            h = self.hists[sp] = Histogram(self.bin_width)
+            if self.n:
+                h.add(0, self.n)
+
+    def merge(self, other: "Aggregate") -> "Aggregate":
+        """Fold another Aggregate (e.g. from a worker) into this one; returns self."""
+        if other.histograms != self.histograms:
+            raise ValueError("Cannot merge aggregates with and without histograms")
+        for sp in other.moments:
+            if sp not in self.moments:
+                self._new_species(sp)
+        for sp, w in self.moments.items():
+            if sp in other.moments:
+                w.merge(other.moments[sp])
+                if self.histograms:
+                    self.hists[sp].merge(other.hists[sp])
+            else:
+                zeros = Welford()
+                zeros.n = other.n
+                w.merge(zeros)
+                if self.histograms and other.n:
+                    self.hists[sp].add(0, other.n)
+        self.n += other.n
+        for r, c in other.reasons.items():
+            self.reasons[r] = self.reasons.get(r, 0) + c
+        return self
+
+    @classmethod
+    def merged(cls, parts: Iterable["Aggregate"]) -> "Aggregate":
+        out = None
+        for p in parts:
+            out = p if out is None else out.merge(p)
+        return out if out is not None else cls()
+
+    @property
+    def species(self) -> List[str]:
+        return list(self.moments)
+
+    def mean(self, sp: str) -> float:
+        return self.moments[sp].mean if sp in self.moments else 0.0
+
+    def variance(self, sp: str, ddof: int = 0) -> float:
+        return self.moments[sp].variance(ddof) if sp in self.moments else 0.0
+
+    def std(self, sp: str, ddof: int = 0) -> float:
+        return math.sqrt(self.variance(sp, ddof))
+
+    def quantile(self, sp: str, q: float) -> float:
+        if not self.histograms:
+            raise ValueError("Quantiles need Aggregate(histograms=True)")
+        return self.hists[sp].quantile(q) if sp in self.hists else 0.0
+
+    def histogram(self, sp: str) -> List[Tuple[float, int]]:
+        if not self.histograms:
+            raise ValueError("Histograms need Aggregate(histograms=True)")
+        return self.hists[sp].items() if sp in self.hists else [(0, self.n)]
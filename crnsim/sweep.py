@@ -0,0 +1,318 @@
+"""
+Parameter sweeps over rate constants and initial counts.
+
+A point is a {name: value} dict. A name is either a rate parameter of the
+model (model.params) or a species, whose initial count it sets. Every point
+runs the same trials, and trial i uses seed base_seed + i at every point
+(common random numbers), so differences between points are not swamped by
+trial-to-trial noise. Points are spread over worker processes and the
+results come back as one columnar table:
+
+    {"point": [...], "trial": [...], "seed": [...], <point names>..., <metrics>...}
+
+    python -m crnsim.sweep --workload log_multiply --grid r7=1000,6000,18000 --trials 20 --out r7.csv
+    python -m crnsim.sweep --workload fibonacci --lhs K_INIT=0.1:10 --samples 8 --log --out k.csv
+    python -m crnsim.sweep --workload biquad --grid K_FAST=10,100,1000 --trials 4 --report y1 y2 y3
+
+With --cache runs.sqlite (cache= in Python) every trial is stored in a
+crnsim.cache.ResultCache, and a rerun only simulates the points that changed.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import math
+import multiprocessing as mp
+import statistics
+import sys
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+from .cache import ResultCache
+from .engines import StopFn
+from .model import Model
+from .simulator import Result, Simulator
+
+Point = Dict[str, float]
+MetricsFn = Callable[[Result], Dict[str, object]]
+Table = Dict[str, list]
+
+
+def grid(**axes: Iterable[float]) -> List[Point]:
+    """Cartesian product of the given values, e.g. grid(r7=[1e3, 1e4], x=[100, 200])."""
+    names = list(axes)
+    return [dict(zip(names, values)) for values in itertools.product(*(list(axes[n]) for n in names))]
+
+
+def latin_hypercube(bounds: Dict[str, Tuple[float, float]], n: int, seed: int | None = None,
+                    log: bool = False) -> List[Point]:
+    """
+    n points, one in each of n equal slices of every axis.
+
+    bounds : {name: (lo, hi)}
+    log    : slice log10(value) instead of value (for rates spanning decades)
+    """
+    if n < 1:
+        raise ValueError("n must be >= 1")
+    rng = np.random.default_rng(seed)
+    cols = {}
+    for name, (lo, hi) in bounds.items():
+        if log and (lo <= 0 or hi <= 0):
+            raise ValueError(f"log sampling needs positive bounds for {name!r}")
+        a, b = (math.log10(lo), math.log10(hi)) if log else (lo, hi)
+        u = (rng.permutation(n) + rng.random(n)) / n
+        v = a + u * (b - a)
+        cols[name] = 10.0 ** v if log else v
+    return [{name: float(cols[name][k]) for name in bounds} for k in range(n)]
+
+
+def apply_point(model: Model, init: Dict[str, int], point: Point) -> Tuple[Model, Dict[str, int]]:
+    """Model with the point's rates and initial counts with the point's species set."""
+    rates, counts = {}, dict(init)
+    for name, value in point.items():
+        is_rate, is_species = name in model.params, name in model.index
+        if is_rate and is_species:
+            raise ValueError(f"{name!r} is both a rate parameter and a species")
+        if is_rate:
+            rates[name] = value
+        elif is_species:
+            counts[name] = int(round(value))
+        else:
+            raise KeyError(f"{name!r} is neither a rate parameter nor a species")
+    return (model.with_params(**rates) if rates else model), counts
+
+
+def final_state(res: Result) -> Dict[str, object]:
+    """Default metrics: every final count plus t, steps and reason."""
+    return {**res.counts, "t": res.t, "steps": res.steps, "reason": res.reason}
+
+
+# Worker state, set once per process by _init_worker
+_job: dict = {}
+
+
+def _init_worker(job: dict) -> None:
+    if job.get("workload") == "biquad":
+        from .workloads import biquad_model
+
+        job = {**job, "model": biquad_model(), "init": {}, "stop": None}
+    elif "workload" in job:
+        from .workloads import experiment
+
+        ex = experiment(job["workload"])
+        job = {**job, "model": ex.model, "init": ex.init, "stop": ex.stop,
+               "t_end": ex.t_end if job["t_end"] is None else job["t_end"],
+               "max_steps": ex.max_steps if job["max_steps"] is None else job["max_steps"],
+               "engine": job["engine"] or ex.engine}
+    if job.get("cache") is not None:
+        job = {**job, "cache": ResultCache(job["cache"])}
+    _job.clear()
+    _job.update(job)
+
+
+def _run_point(k: int, point: Point) -> List[Tuple[int, int, int, Dict[str, object]]]:
+    j = _job
+    model, init = apply_point(j["model"], j["init"], point)
+    rows = []
+    for trial in range(j["trials"]):
+        seed = j["base_seed"] + trial
+        if j.get("workload") == "biquad":
+            from .workloads import run_biquad
+
+            # Three phase models in sequence; None limits and engine come from the script
+            res = run_biquad(seed, model.params, init, t_end=j["t_end"], max_steps=j["max_steps"],
+                             engine=j["engine"])
+            rows.append((k, trial, seed, j["metrics"](res)))
+            continue
+        sim = Simulator(model, engine=j["engine"], seed=seed)
+        if j.get("cache") is not None:
+            res = j["cache"].run(sim, init, seed, t_end=j["t_end"], max_steps=j["max_steps"], stop=j["stop"])
+        else:
+            res = sim.run(init, t_end=j["t_end"], max_steps=j["max_steps"], stop=j["stop"])
+        rows.append((k, trial, seed, j["metrics"](res)))
+    return rows
+
+
+def _fan_out(job: dict, points: Sequence[Point], processes: int | None) -> Table:
+    tasks = list(enumerate(points))
+    if processes == 1:
+        _init_worker(job)
+        chunks = [_run_point(k, p) for k, p in tasks]
+    else:
+        with mp.Pool(processes, initializer=_init_worker, initargs=(job,)) as pool:
+            chunks = pool.starmap(_run_point, tasks, chunksize=1)
+
+    names = list(dict.fromkeys(n for p in points for n in p))
+    rows = [r for chunk in chunks for r in chunk]
+    metric_names = list(dict.fromkeys(m for *_, metrics in rows for m in metrics))
+    clash = set(metric_names) & {"point", "trial", "seed"}
+    if clash:
+        raise ValueError(f"Metric names clash with table columns: {sorted(clash)}")
+    # A swept species is both an input and a final count: the count becomes "<name>_final"
+    columns = {m: f"{m}_final" if m in names else m for m in metric_names}
+
+    table: Table = {"point": [], "trial": [], "seed": []}
+    table.update({n: [] for n in names + list(columns.values())})
+    for k, trial, seed, metrics in rows:
+        table["point"].append(k)
+        table["trial"].append(trial)
+        table["seed"].append(seed)
+        for n in names:
+            table[n].append(points[k].get(n))
+        for m, col in columns.items():
+            table[col].append(metrics.get(m))
+    return table
+
+
+def sweep(
+    model: Model,
+    init: Dict[str, int],
+    points: Sequence[Point],
+    trials: int = 10,
+    base_seed: int = 0,
+    t_end: float = math.inf,
+    max_steps: int = sys.maxsize,
+    stop: StopFn | None = None,
+    metrics: MetricsFn = final_state,
+    engine: str = "direct",
+    processes: int | None = None,
+    cache: str | Path | None = None,
+) -> Table:
+    """
+    Run trials trajectories at every point; returns the columnar table.
+
+    stop and metrics must be picklable (top-level functions) unless
+    processes=1. processes=None uses every core. cache is a
+    crnsim.cache.ResultCache file: trials already run with the same model,
+    point and seed are read from it instead of simulated.
+    """
+    if trials < 1:
+        raise ValueError("trials must be >= 1")
+    for p in points:
+        apply_point(model, init, p)  # fail on bad names before starting workers
+    job = dict(model=model, init=dict(init), stop=stop, t_end=t_end, max_steps=max_steps,
+               engine=engine, trials=trials, base_seed=base_seed, metrics=metrics, cache=cache)
+    return _fan_out(job, points, processes)
+
+
+def sweep_workload(
+    name: str,
+    points: Sequence[Point],
+    trials: int = 10,
+    base_seed: int = 0,
+    t_end: float | None = None,
+    max_steps: int | None = None,
+    metrics: MetricsFn = final_state,
+    engine: str | None = None,
+    processes: int | None = None,
+    cache: str | Path | None = None,
+) -> Table:
+    """
+    sweep() over a crnsim.workloads experiment; None settings come from its script.
+
+    "biquad" runs crnsim.workloads.run_biquad() per trial (its rates K_SLOW
+    and K_FAST apply to every phase; t_end and max_steps limit each phase)
+    and cannot use a cache.
+    """
+    from .workloads import biquad_model, experiment
+
+    if name == "biquad":
+        if cache is not None:
+            raise ValueError("The biquad workload runs three phase models per trial and is not cached")
+        model, init = biquad_model(), {}
+    else:
+        ex = experiment(name)
+        model, init = ex.model, ex.init
+    if trials < 1:
+        raise ValueError("trials must be >= 1")
+    for p in points:
+        apply_point(model, init, p)
+    # Workers rebuild the experiment themselves: script-level stop functions do not pickle
+    job = dict(workload=name, t_end=t_end, max_steps=max_steps, engine=engine,
+               trials=trials, base_seed=base_seed, metrics=metrics, cache=cache)
+    return _fan_out(job, points, processes)
+
+
+def write_csv(table: Table, path: Path) -> None:
+    cols = list(table)
+    with Path(path).open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(cols)
+        w.writerows(zip(*(table[c] for c in cols)))
+
+
+def _parse_axis(text: str) -> Tuple[str, str]:
+    name, sep, values = text.partition("=")
+    if not sep or not name or not values:
+        raise argparse.ArgumentTypeError(f"expected name=values, got {text!r}")
+    return name, values
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workload", required=True, choices=("lambda", "log_multiply", "fibonacci", "biquad"))
+    ap.add_argument("--grid", type=_parse_axis, action="append", default=[], metavar="NAME=V1,V2,...")
+    ap.add_argument("--lhs", type=_parse_axis, action="append", default=[], metavar="NAME=LO:HI")
+    ap.add_argument("--samples", type=int, default=10, help="Latin hypercube points")
+    ap.add_argument("--log", action="store_true", help="sample --lhs axes in log10")
+    ap.add_argument("--trials", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=0, help="trial i uses seed SEED+i at every point")
+    ap.add_argument("--max-steps", type=int, default=None)
+    ap.add_argument("--t-end", type=float, default=None)
+    ap.add_argument("--engine", default=None, help="override the script's ENGINE")
+    ap.add_argument("--processes", type=int, default=None)
+    ap.add_argument("--report", nargs="+", default=["steps"],
+                    help="outputs to average per point (a swept species reports its final count)")
+    ap.add_argument("--out", type=Path, help="write the table as CSV")
+    ap.add_argument("--cache", type=Path, help="ResultCache file: reuse trials already run")
+    args = ap.parse_args(argv)
+    if not args.grid and not args.lhs:
+        ap.error("give at least one --grid or --lhs axis")
+
+    points = [{}]
+    if args.grid:
+        points = grid(**{n: [float(v) for v in vals.split(",")] for n, vals in args.grid})
+    if args.lhs:
+        bounds = {}
+        for n, rng in args.lhs:
+            lo, _, hi = rng.partition(":")
+            bounds[n] = (float(lo), float(hi))
+        lhs = latin_hypercube(bounds, args.samples, seed=args.seed, log=args.log)
+        points = [{**g, **h} for g in points for h in lhs]
+
+    table = sweep_workload(args.workload, points, trials=args.trials, base_seed=args.seed,
+                           t_end=args.t_end, max_steps=args.max_steps, engine=args.engine,
+                           processes=args.processes, cache=args.cache)
+
+    names = list(points[0])
+    # Report outputs only: a swept species' final count is its "<name>_final" column
+    outputs = [c for c in table if c not in ("point", "trial", "seed") and c not in names]
+    report = []
+    for m in args.report:
+        col = f"{m}_final" if m in names and f"{m}_final" in table else m
+        if col not in outputs:
+            ap.error(f"--report {m}: not an output of this sweep; choose from {', '.join(outputs)}")
+        report.append(col)
+
+    print("  ".join(f"{n:>12}" for n in names + [f"mean {m}" for m in report]))
+    for k, p in enumerate(points):
+        rows = [i for i, pk in enumerate(table["point"]) if pk == k]
+        means = []
+        for m in report:
+            col = table[m]
+            vals = [col[i] for i in rows if isinstance(col[i], (int, float))]
+            means.append(statistics.fmean(vals) if vals else math.nan)
+        print("  ".join(f"{v:>12.6g}" for v in [p[n] for n in names] + means))
+
+    if args.out:
+        write_csv(table, args.out)
+        print(f"\nWrote {len(table['point'])} rows to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
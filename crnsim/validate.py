@@ -0,0 +1,150 @@
+"""
+Validation and normalization of reaction lists before they are compiled.
+
+validate() returns a cleaned copy of the reactions plus a report:
+  - zero stoichiometry entries ({"X11": 0}) are removed
+  - reactions with the same reactants and products are merged into one
+    whose rate is the sum (numeric rates only; named rates are reported)
+  - reactions that can never fire from init are dropped: a reactant must be
+    present initially in the needed amount or produced by a reaction that
+    can fire (a conservative fixed point, so nothing that can fire is lost)
+  - species missing from init, species in init that no reaction uses and
+    reactions that change nothing are reported
+
+Negative stoichiometry or rates raise ValueError.
+
+    rxns, names, report = validate(load_reactions(path), init)
+    for line in report.lines():
+        print(line)
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence, Tuple
+
+from .model import Reaction
+
+
+@dataclass
+class ValidationReport:
+    zero_entries: List[Tuple[str, str]] = field(default_factory=list)     # (reaction, species)
+    merged: List[Tuple[str, List[str]]] = field(default_factory=list)     # (kept, merged into it)
+    unmerged: List[List[str]] = field(default_factory=list)               # duplicates with named rates
+    dead: List[str] = field(default_factory=list)                         # reactions that can never fire
+    null: List[str] = field(default_factory=list)                         # reactants == products
+    unknown_species: List[str] = field(default_factory=list)              # in reactions, not in init
+    unused_species: List[str] = field(default_factory=list)               # in init, not in reactions
+
+    @property
+    def changed(self) -> bool:
+        """True when validate() altered the reaction list."""
+        return bool(self.zero_entries or self.merged or self.dead)
+
+    def lines(self) -> List[str]:
+        """One line per finding, empty when there is nothing to say."""
+        out = []
+        if self.zero_entries:
+            out.append("removed zero stoichiometry: " + ", ".join(f"{sp} in {r}" for r, sp in self.zero_entries))
+        for kept, others in self.merged:
+            out.append(f"merged duplicates of {kept}: {', '.join(others)} (rates summed)")
+        for group in self.unmerged:
+            out.append(f"duplicate reactions with named rates, not merged: {', '.join(group)}")
+        if self.dead:
+            out.append(f"dropped {len(self.dead)} reactions that can never fire: {', '.join(self.dead)}")
+        if self.null:
+            out.append(f"reactions that change nothing: {', '.join(self.null)}")
+        if self.unknown_species:
+            out.append(f"species not in the initial counts (start at 0): {', '.join(self.unknown_species)}")
+        if self.unused_species:
+            out.append(f"initial species no reaction uses: {', '.join(self.unused_species)}")
+        return out
+
+
+def _key(side: Dict[str, int]) -> Tuple[Tuple[str, int], ...]:
+    return tuple(sorted(side.items()))
+
+
+def validate(
+    reactions: Sequence[Reaction],
+    init: Dict[str, int] | None = None,
+    names: Sequence[str] | None = None,
+    drop_dead: bool = True,
+) -> Tuple[List[Reaction], List[str], ValidationReport]:
+    """
+    Cleaned (reactions, names, report); see the module docstring.
+
+    init      : initial counts; without it no dead or unknown-species checks are made
+    names     : reaction names (default "R0", "R1", ... in the given order)
+    drop_dead : set False when the reactions will be started from other states
+                than init (e.g. the phases of a multi-phase CRN)
+    """
+    names = list(names) if names is not None else [f"R{j}" for j in range(len(reactions))]
+    if len(names) != len(reactions):
+        raise ValueError(f"{len(names)} names for {len(reactions)} reactions")
+    report = ValidationReport()
+
+    # Zero entries and sign checks
+    clean: List[Reaction] = []
+    for name, (R, P, rate) in zip(names, reactions):
+        if not isinstance(rate, str) and rate < 0:
+            raise ValueError(f"Reaction {name} has a negative rate {rate}")
+        sides = []
+        for side in (R, P):
+            out = {}
+            for sp, m in side.items():
+                if m < 0:
+                    raise ValueError(f"Reaction {name} has negative stoichiometry {m} for {sp}")
+                if m == 0:
+                    report.zero_entries.append((name, sp))
+                else:
+                    out[sp] = m
+            sides.append(out)
+        clean.append((sides[0], sides[1], rate))
+        if sides[0] == sides[1]:
+            report.null.append(name)
+
+    # Duplicates: same reactants and products
+    groups: Dict[tuple, List[int]] = {}
+    for j, (R, P, _) in enumerate(clean):
+        groups.setdefault((_key(R), _key(P)), []).append(j)
+    keep = []
+    for js in groups.values():
+        if len(js) == 1:
+            keep.append(js[0])
+        elif any(isinstance(clean[j][2], str) for j in js):
+            report.unmerged.append([names[j] for j in js])
+            keep.extend(js)
+        else:
+            j0 = js[0]
+            R, P, _ = clean[j0]
+            clean[j0] = (R, P, float(sum(clean[j][2] for j in js)))
+            report.merged.append((names[j0], [names[j] for j in js[1:]]))
+            keep.append(j0)
+    keep.sort()
+
+    if init is not None:
+        # Fixed point of "can fire": reactants available initially or producible
+        live = set()
+        produced = set()
+        changed = True
+        while changed:
+            changed = False
+            for j in keep:
+                if j in live:
+                    continue
+                R, P, _ = clean[j]
+                if all(sp in produced or init.get(sp, 0) >= m for sp, m in R.items()):
+                    live.add(j)
+                    produced.update(P)
+                    changed = True
+        if drop_dead:
+            report.dead = [names[j] for j in keep if j not in live]
+            keep = [j for j in keep if j in live]
+
+        used = list(dict.fromkeys(sp for j in keep for side in clean[j][:2] for sp in side))
+        report.unknown_species = [sp for sp in used if sp not in init]
+        used_set = set(used)
+        report.unused_species = [sp for sp in init if sp not in used_set]
+
+    return [clean[j] for j in keep], [names[j] for j in keep], report
@@ -0,0 +1,183 @@
+"""
+The homework experiments as named, repeatable trials.
+
+Each workload loads its script from disk (main() is not run), so it always
+uses the script's current model and settings. A trial is
+
+    run_trial(name, seed, max_steps=None, engine=None) -> events
+
+which runs one trajectory of that experiment and returns the number of
+events it fired. Everything here is a top-level function so trials can be
+shipped to worker processes.
+
+A script with ENGINE = "auto" picks its engine from pilot timings when it
+runs on its own. Timings differ between processes and hosts, while every
+worker of a sweep or cluster job must simulate the same runs. So here
+"auto" means the exact direct method unless an engine is passed.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import Callable, Dict
+
+from .autoselect import AUTO
+from .engines import StopFn
+from .model import Model, load_initial_counts, load_reactions
+from .simulator import Result, Simulator
+from .validate import validate
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+
+SCRIPTS = {
+    "lambda": "HW1/HW1Final/EE5393_HW1_P2.py",
+    "log_multiply": "HW1/HW1Final/EE5393_HW1_P3A.py",
+    "sequenced": "HW1/HW1Final/EE5393_HW1_P3B.py",
+    "fibonacci": "HW2/EE5393_HW2_1.py",
+    "biquad": "HW2/EE5393_HW2_2.py",
+}
+
+LAMBDA_MOI = 1           # lambda trials run at a single MOI
+SEQUENCED_X = 100_000    # input for the sequenced CRN (P3B's 1234567 takes ~2.5M rounds)
+
+
+def script_engine(mod: ModuleType) -> str:
+    """The script's ENGINE, with "auto" as "direct" (see the module docstring)."""
+    return "direct" if mod.ENGINE == AUTO else mod.ENGINE
+
+
+@lru_cache(maxsize=None)
+def load_script(name: str) -> ModuleType:
+    """Import one of SCRIPTS by workload name."""
+    path = REPO_ROOT / SCRIPTS[name]
+    spec = importlib.util.spec_from_file_location(f"_ee5393_{name}", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@dataclass(frozen=True)
+class Experiment:
+    """One single-model experiment as its script sets it up."""
+    model: Model
+    init: Dict[str, int]
+    t_end: float
+    max_steps: int
+    stop: StopFn | None
+    engine: str
+
+
+@lru_cache(maxsize=None)
+def experiment(name: str) -> Experiment:
+    """Model, initial state, limits and stop rule of a single-model workload."""
+    mod = load_script(name)
+    if name == "lambda":
+        here = (REPO_ROOT / SCRIPTS[name]).parent
+        init = load_initial_counts(here / mod.INIT_FILENAME)
+        # MOI and swept species are set after this, so reactions dead from the file's counts stay
+        rxns, names, _ = validate(load_reactions(here / mod.REACTIONS_FILENAME), init, drop_dead=False)
+        model = Model(rxns, species=list(init), names=names)
+        init["MOI"] = LAMBDA_MOI
+        return Experiment(model, init, mod.MAX_TIME, mod.MAX_STEPS, mod.stop_on_fate, script_engine(mod))
+    if name == "log_multiply":
+        return Experiment(mod.MODEL, dict(mod.INIT), mod.T_END, mod.MAX_STEPS, mod.done_state, script_engine(mod))
+    if name == "fibonacci":
+        model, counts = mod.build_fibonacci_model()
+        return Experiment(model, counts, mod.MAX_TIME, mod.MAX_STEPS, None, script_engine(mod))
+    raise ValueError(f"{name!r} is not a single-model experiment")
+
+
+def _trial(name, seed, max_steps, engine):
+    ex = experiment(name)
+    sim = Simulator(ex.model, engine=engine or ex.engine, seed=seed)
+    return sim.run(ex.init, t_end=ex.t_end, max_steps=max_steps or ex.max_steps, stop=ex.stop).steps
+
+
+def trial_lambda(seed, max_steps=None, engine=None):
+    return _trial("lambda", seed, max_steps, engine)
+
+
+def trial_log_multiply(seed, max_steps=None, engine=None):
+    return _trial("log_multiply", seed, max_steps, engine)
+
+
+def trial_fibonacci(seed, max_steps=None, engine=None):
+    return _trial("fibonacci", seed, max_steps, engine)
+
+
+def biquad_model() -> Model:
+    """
+    The biquad script's blue_red phase. Its three phases share their species
+    (INIT_COUNTS) and rate parameters (PARAMS: K_SLOW, K_FAST), so this model
+    is what sweep points over the biquad are checked against.
+    """
+    return load_script("biquad").PHASES["blue_red"]
+
+
+def run_biquad(seed, params=None, init=None, t_end=None, max_steps=None, engine=None) -> Result:
+    """
+    The biquad script's INPUT_SEQUENCE through its three phases, as one trial.
+
+    params sets rate parameters of every phase and init overrides
+    INIT_COUNTS; t_end and max_steps limit each phase (None: the script's
+    MAX_TIME_PER_PHASE / MAX_STEPS_PER_PHASE). Returns the final counts
+    plus y1, y2, ... (the Y recorded in each cycle), the summed time and
+    events, and the reason the last phase stopped.
+    """
+    from .rng import RandomPool
+
+    mod = load_script("biquad")
+    phases = {n: (m.with_params(**params) if params else m) for n, m in mod.PHASES.items()}
+    pool = RandomPool(seed)
+    counts = {**mod.INIT_COUNTS, **(init or {})}
+    recorded = {}
+    t, events, reason = 0.0, 0, ""
+    for i, xval in enumerate(mod.INPUT_SEQUENCE, start=1):
+        counts["Y"] = 0
+        counts["X"] = xval
+        for phase in ("blue_red", "red_green", "green_blue"):
+            sim = Simulator(phases[phase], engine=engine or script_engine(mod), pool=pool)
+            res = sim.run(counts, t_end=mod.MAX_TIME_PER_PHASE if t_end is None else t_end,
+                          max_steps=max_steps or mod.MAX_STEPS_PER_PHASE)
+            counts.update(res.counts)
+            t += res.t
+            events += res.steps
+            reason = res.reason
+            if phase == "blue_red":
+                recorded[f"y{i}"] = counts["Y"]
+            if phase == "red_green":
+                counts["Y"] = 0
+    return Result({**counts, **recorded}, t, events, reason)
+
+
+def trial_biquad(seed, max_steps=None, engine=None):
+    return run_biquad(seed, max_steps=max_steps, engine=engine).steps
+
+
+def trial_sequenced(seed, max_steps=None, engine=None):
+    # Deterministic and always run to its target: seed, max_steps and engine do not apply
+    mod = load_script("sequenced")
+    s = dict(mod.species)
+    s["x"] = SEQUENCED_X
+    _, steps = mod.simulate_crn(s)
+    return steps
+
+
+WORKLOADS: Dict[str, Callable[..., int]] = {
+    "lambda": trial_lambda,
+    "log_multiply": trial_log_multiply,
+    "fibonacci": trial_fibonacci,
+    "biquad": trial_biquad,
+    "sequenced": trial_sequenced,
+}
+
+
+def run_trial(name: str, seed: int | None, max_steps: int | None = None, engine: str | None = None) -> int:
+    """Run one trial of workload name; returns events fired."""
+    if name not in WORKLOADS:
+        raise ValueError(f"Unknown workload {name!r}; choose from {sorted(WORKLOADS)}")
+    return WORKLOADS[name](seed, max_steps, engine)